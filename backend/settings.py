@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.QueryProfilerMiddleware",  # 仅在 QUERY_PROFILER_ENABLED 时生效
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -105,6 +107,92 @@ DATABASES = {
 # }
 
 
+# Cache
+# 默认使用进程内缓存；多 worker 部署时可通过环境变量切换为共享缓存 (如 Redis/Memcached)
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "16lily-default"),
+    }
+}
+# 进程级快照 (模型配置、提示词模板) 检查数据库表版本的间隔 (秒)，见 core/services/table_version.py；
+# 默认缓存为进程内缓存时，其他 worker 最迟在该时间后看到配置变更
+TABLE_VERSION_TTL = float(os.environ.get("TABLE_VERSION_TTL", "5"))
+# 人员 / 客户名称索引最长使用时间 (秒)，见 core/services/name_index.py；用户改名不改变用户表的版本，其他 worker 最迟在该时间后重建
+NAME_INDEX_MAX_AGE = float(os.environ.get("NAME_INDEX_MAX_AGE", "300"))
+
+# 数据看板统计快照有效期 (秒)，大屏轮询在有效期内直接命中缓存
+DASHBOARD_STATS_TTL = int(os.environ.get("DASHBOARD_STATS_TTL", "10"))
+
+# 后台任务 (core/services/background.py)：由 run_background_worker 管理命令执行 (docker-compose 中的 job_worker)，
+# 状态保存在数据库；BACKGROUND_JOB_WORKERS 为每个 worker 进程的并发数，心跳超过 BACKGROUND_JOB_TIMEOUT 秒未刷新的任务重新入队
+BACKGROUND_JOB_WORKERS = int(os.environ.get("BACKGROUND_JOB_WORKERS", "2"))
+BACKGROUND_JOB_TIMEOUT = int(os.environ.get("BACKGROUND_JOB_TIMEOUT", "600"))
+# 数据备份流式导出每批读取的记录数 (core/services/backup.py)、恢复时每批写入的记录数 (core/services/restore.py)
+BACKUP_CHUNK_SIZE = int(os.environ.get("BACKUP_CHUNK_SIZE", "2000"))
+RESTORE_BATCH_SIZE = int(os.environ.get("RESTORE_BATCH_SIZE", "1000"))
+# 待恢复的上传文件目录，须为 web 与 job_worker 共享的卷 (docker-compose.prod.yml 中的 restore_uploads)
+BACKUP_UPLOAD_DIR = os.environ.get("BACKUP_UPLOAD_DIR", str(BASE_DIR / "archives" / "restore_uploads"))
+# 增量备份按水位导出时向前多取的秒数，覆盖上次导出时尚未提交的事务
+BACKUP_WATERMARK_OVERLAP = int(os.environ.get("BACKUP_WATERMARK_OVERLAP", "300"))
+# 表格流式导出 (日志导出、后台导出动作) 每批读取的行数 (core/services/export.py)
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "2000"))
+# 统一动态归档 (core/services/activity_log_store.py)：保留天数、归档文件目录、每批处理条数、PostgreSQL 分区预建月数
+ACTIVITY_LOG_RETENTION_DAYS = int(os.environ.get("ACTIVITY_LOG_RETENTION_DAYS", "365"))
+ACTIVITY_LOG_ARCHIVE_DIR = os.environ.get("ACTIVITY_LOG_ARCHIVE_DIR", str(BASE_DIR / "archives" / "activity_logs"))
+ACTIVITY_LOG_ARCHIVE_BATCH_SIZE = int(os.environ.get("ACTIVITY_LOG_ARCHIVE_BATCH_SIZE", "5000"))
+ACTIVITY_LOG_PARTITION_MONTHS_AHEAD = int(os.environ.get("ACTIVITY_LOG_PARTITION_MONTHS_AHEAD", "3"))
+# 通知接收人达到该数量时转入后台下发
+NOTIFICATION_ASYNC_THRESHOLD = int(os.environ.get("NOTIFICATION_ASYNC_THRESHOLD", "2000"))
+# 个人通知摘要 (未读数) 缓存时间 (秒)，须短于前端顶栏的轮询间隔 (30 秒)，见 core/services/notification_summary.py
+NOTIFICATION_SUMMARY_TTL = int(os.environ.get("NOTIFICATION_SUMMARY_TTL", "10"))
+
+# LLM 客户端 (core/services/llm_clients.py)：超时 (秒)、SDK 自身的重试次数 (故障转移见下方 LLM_FAILOVER)、单个服务的长连接池大小
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "0"))
+LLM_POOL_MAXSIZE = int(os.environ.get("LLM_POOL_MAXSIZE", "10"))
+# LLM 服务路由 (core/services/llm_router.py)：失败时转移到同一所属用户的其他配置 (LLM_FAILOVER_TO_SYSTEM 开启时
+# 用户私有配置也转移到系统级配置)；连续失败次数达到阈值后熔断 (秒)；
+# 请求超过 LLM_HEDGE_AFTER 秒未返回时向备用服务发出对冲请求 (默认 0 关闭，对冲会重复消耗 Token)
+LLM_FAILOVER = os.environ.get("LLM_FAILOVER", "True").lower() == "true"
+LLM_FAILOVER_TO_SYSTEM = os.environ.get("LLM_FAILOVER_TO_SYSTEM", "False").lower() == "true"
+LLM_CIRCUIT_FAILURES = int(os.environ.get("LLM_CIRCUIT_FAILURES", "3"))
+LLM_CIRCUIT_COOLDOWN = float(os.environ.get("LLM_CIRCUIT_COOLDOWN", "30"))
+LLM_HEDGE_AFTER = float(os.environ.get("LLM_HEDGE_AFTER", "0"))
+LLM_ROUTER_WORKERS = int(os.environ.get("LLM_ROUTER_WORKERS", "16"))
+# 模型单价 (元 / 千 Token)，用于 SubmissionLog 费用估算 (core/services/llm_telemetry.py)；
+# JSON 格式：{"deepseek-chat": [0.002, 0.008]}，未配置的模型不计费用
+LLM_PRICING = json.loads(os.environ.get("LLM_PRICING", "{}"))
+# LLM 响应缓存 (core/services/llm_cache.py)：memory / db / off，有效期 (秒) 与最大条目数
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "1000"))
+# Agent 路由并发抽取线程数 (core/services/agent_router.py)
+AGENT_ROUTER_WORKERS = int(os.environ.get("AGENT_ROUTER_WORKERS", "4"))
+# AI 补全任务队列 (core/services/ai_enrichment.py，由 run_ai_worker 执行)：
+# 最大尝试次数、全局同时执行上限、执行超时 (秒，超时视为 worker 异常退出并重新入队)
+AI_ENRICHMENT_MAX_ATTEMPTS = int(os.environ.get("AI_ENRICHMENT_MAX_ATTEMPTS", "3"))
+AI_ENRICHMENT_MAX_RUNNING = int(os.environ.get("AI_ENRICHMENT_MAX_RUNNING", "4"))
+AI_ENRICHMENT_JOB_TIMEOUT = int(os.environ.get("AI_ENRICHMENT_JOB_TIMEOUT", "300"))
+# 批量 AI 解析 (core/services/ai_batch.py)：单次条数上限、并发数、合并解析的每组条数与单条长度上限
+AI_BATCH_MAX_ITEMS = int(os.environ.get("AI_BATCH_MAX_ITEMS", "500"))
+AI_BATCH_CONCURRENCY = int(os.environ.get("AI_BATCH_CONCURRENCY", "4"))
+AI_BATCH_PACK_SIZE = int(os.environ.get("AI_BATCH_PACK_SIZE", "5"))
+AI_BATCH_PACK_MAX_CHARS = int(os.environ.get("AI_BATCH_PACK_MAX_CHARS", "300"))
+# 本地规则抽取置信度达到该值时跳过模型调用 (大于 1 即关闭)
+AI_LOCAL_EXTRACT_MIN_CONFIDENCE = float(os.environ.get("AI_LOCAL_EXTRACT_MIN_CONFIDENCE", "0.8"))
+
+# 接口 SQL 画像 (core.middleware.QueryProfilerMiddleware)，默认关闭
+QUERY_PROFILER_ENABLED = os.environ.get("QUERY_PROFILER_ENABLED", "False").lower() == "true"
+# 单次请求查询数预算：按 URL 名称配置，未配置的接口使用 default；超出时记录告警日志
+QUERY_BUDGETS = {
+    "default": int(os.environ.get("QUERY_BUDGET_DEFAULT", "50")),
+    "opportunities-list": 10,
+    "dashboard-get-stats": 10,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -1,12 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.html import format_html
 from django import forms
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse
 from django.db.models import Sum
-import csv
 import re
 import json
 from datetime import datetime
@@ -14,35 +13,24 @@ from .models import (
     UserProfile, Opportunity, OpportunityLog, PerformanceTarget, OpportunityTeamMember, 
     Customer, Contact, Competition, MarketActivity, Announcement, TodoTask, SocialMediaStats,
     DepartmentModel, AIConfiguration, PromptTemplate, SocialMediaAccount, CustomerTag, ExternalIdMap, CustomerCohort, SubmissionLog,
-    Project, ProjectCard, ProjectChangeLog, DailyReport, ApprovalRequest, ApprovalStatus, SystemRelease
+    Project, ProjectCard, ProjectChangeLog, DailyReport, ApprovalRequest, ApprovalStatus, SystemRelease, QueryProfile,
+    LLMResponseCache, AIEnrichmentJob, BackgroundJob, BackupRecord,
 )
+from .services import export as export_service
 
 # --- Common Export Action ---
+def _export(modeladmin, queryset, fmt):
+    # 流式导出 (见 services/export)：按 values_list 分批读取，外键名称在同一条 SQL 中取出
+    opts = modeladmin.model._meta
+    return export_service.response(queryset, export_service.model_columns(modeladmin.model), opts.verbose_name, fmt)
+
 @admin.action(description='导出选中数据为CSV')
 def export_as_csv(modeladmin, request, queryset):
-    opts = modeladmin.model._meta
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename={opts.verbose_name}.csv'
-    response.write(u'\ufeff'.encode('utf8'))
-    writer = csv.writer(response)
-    
-    # Get field names
-    fields = [field for field in opts.get_fields() if not field.many_to_many and not field.one_to_many]
-    # Write header
-    writer.writerow([field.verbose_name for field in fields])
-    
-    # Write data
-    for obj in queryset:
-        row = []
-        for field in fields:
-            value = getattr(obj, field.name)
-            if hasattr(value, 'strftime'):
-                value = value.strftime('%Y-%m-%d %H:%M:%S')
-            elif hasattr(value, '__call__'):
-                value = value()
-            row.append(str(value))
-        writer.writerow(row)
-    return response
+    return _export(modeladmin, queryset, export_service.CSV)
+
+@admin.action(description='导出选中数据为Excel')
+def export_as_xlsx(modeladmin, request, queryset):
+    return _export(modeladmin, queryset, export_service.XLSX)
 
 # --- Workflow & Activity Actions ---
 
@@ -86,6 +74,112 @@ class SystemReleaseAdmin(admin.ModelAdmin):
     search_fields = ('version', 'title', 'content')
     ordering = ('-release_date',)
 
+@admin.register(QueryProfile)
+class QueryProfileAdmin(admin.ModelAdmin):
+    """
+    接口SQL画像 (只读)，数据由 QueryProfilerMiddleware 写入
+    """
+    list_display = ('url_name', 'method', 'requests', 'avg_queries', 'max_queries', 'last_queries', 'budget', 'budget_violations', 'duplicate_queries', 'avg_time_ms', 'last_seen')
+    list_filter = ('method',)
+    search_fields = ('url_name', 'top_duplicate')
+    ordering = ('-max_queries',)
+    readonly_fields = [f.name for f in QueryProfile._meta.fields]
+    actions = ['reset_profiles']
+
+    @admin.display(description='平均查询数')
+    def avg_queries(self, obj):
+        return obj.avg_queries
+
+    @admin.display(description='平均SQL耗时(ms)')
+    def avg_time_ms(self, obj):
+        return obj.avg_time_ms
+
+    @admin.action(description='清空选中画像 (重新统计)')
+    def reset_profiles(self, request, queryset):
+        queryset.delete()
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    """
+    AI响应缓存 (只读)，LLM_CACHE_BACKEND=db 时由 AIService 写入
+    """
+    list_display = ('key', 'model_name', 'config_id', 'hits', 'created_at', 'last_used_at', 'expires_at')
+    list_filter = ('model_name',)
+    search_fields = ('key', 'raw_response')
+    readonly_fields = [f.name for f in LLMResponseCache._meta.fields]
+    actions = ['clear_cache']
+
+    @admin.action(description='删除选中缓存')
+    def clear_cache(self, request, queryset):
+        queryset.delete()
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(SubmissionLog)
+class SubmissionLogAdmin(admin.ModelAdmin):
+    """
+    AI提交日志：列表页顶部显示最近 7 天按 意图 / 实体 / 服务提供商 分组的耗时百分位 (见 llm_telemetry)
+    """
+    change_list_template = 'admin/core/submissionlog/change_list.html'
+    list_display = ('id', 'user', 'intent', 'entity', 'status', 'provider', 'model_name', 'cache_status',
+                    'latency_ms', 'attempts', 'prompt_tokens', 'completion_tokens', 'cost', 'created_at')
+    list_filter = ('status', 'cache_status', 'provider', 'entity', 'intent')
+    search_fields = ('text_input', 'error_message')
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+
+    def changelist_view(self, request, extra_context=None):
+        from datetime import timedelta
+        from .services import llm_telemetry
+
+        extra_context = extra_context or {}
+        recent = SubmissionLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=7))
+        extra_context['telemetry'] = llm_telemetry.summarize(recent)[:20]
+        return super().changelist_view(request, extra_context=extra_context)
+
+@admin.register(AIEnrichmentJob)
+class AIEnrichmentJobAdmin(admin.ModelAdmin):
+    """
+    AI补全任务队列，由 run_ai_worker 管理命令执行
+    """
+    list_display = ('id', 'kind', 'object_id', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('text', 'last_error')
+    readonly_fields = [f.name for f in AIEnrichmentJob._meta.fields]
+    actions = ['retry_jobs', 'cancel_jobs']
+
+    @admin.action(description='重新执行选中任务')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status=AIEnrichmentJob.Status.RUNNING).update(
+            status=AIEnrichmentJob.Status.PENDING, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'已重新入队 {count} 个任务')
+
+    @admin.action(description='取消选中的等待任务')
+    def cancel_jobs(self, request, queryset):
+        count = queryset.filter(status=AIEnrichmentJob.Status.PENDING).update(status=AIEnrichmentJob.Status.CANCELLED)
+        self.message_user(request, f'已取消 {count} 个任务')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """
+    后台任务，由 run_background_worker 管理命令执行
+    """
+    list_display = ('id', 'name', 'status', 'done', 'total', 'attempts', 'user', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('id', 'error')
+    readonly_fields = [f.name for f in BackgroundJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(PromptTemplate)
 class PromptTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'scene', 'is_active', 'updated_at')
@@ -142,7 +236,7 @@ class CustomerAdmin(admin.ModelAdmin):
     list_display = ('name', 'industry', 'region', 'owner', 'created_at')
     list_filter = ('industry', 'region')
     search_fields = ('name', 'industry')
-    actions = [export_as_csv]
+    actions = [export_as_csv, export_as_xlsx]
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -156,7 +250,7 @@ class OpportunityAdmin(AIEnabledAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'customer', 'amount', 'stage', 'sales_manager', 'created_at')
     list_filter = ('stage', 'created_at')
     search_fields = ('name', 'customer__name')
-    actions = [export_as_csv]
+    actions = [export_as_csv, export_as_xlsx]
 
 @admin.register(Competition)
 class CompetitionAdmin(AIEnabledAdminMixin, admin.ModelAdmin):
@@ -215,11 +309,17 @@ class ApprovalRequestAdmin(admin.ModelAdmin):
     
     @admin.action(description='批量通过')
     def approve_requests(self, request, queryset):
-        queryset.update(status=ApprovalStatus.APPROVED)
+        queryset.update(status=ApprovalStatus.APPROVED, updated_at=timezone.now())
         
     @admin.action(description='批量驳回')
     def reject_requests(self, request, queryset):
-        queryset.update(status=ApprovalStatus.REJECTED)
+        queryset.update(status=ApprovalStatus.REJECTED, updated_at=timezone.now())
+
+@admin.register(BackupRecord)
+class BackupRecordAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'parent', 'status', 'records', 'tombstones', 'created_by', 'started_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('watermarks',)
 
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
@@ -234,7 +334,6 @@ admin.site.register(OpportunityTeamMember)
 admin.site.register(CustomerTag)
 admin.site.register(ExternalIdMap)
 admin.site.register(CustomerCohort)
-admin.site.register(SubmissionLog)
 admin.site.register(Project)
 admin.site.register(ProjectCard)
 admin.site.register(ProjectChangeLog)
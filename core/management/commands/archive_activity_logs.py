@@ -0,0 +1,28 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.services import activity_log_store
+
+
+class Command(BaseCommand):
+    help = '归档统一动态：补齐按天汇总，将超过保留天数的日志写入 jsonl.gz 文件后删除，可通过 cron 每天执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_LOG_RETENTION_DAYS, help='保留最近多少天的日志')
+        parser.add_argument('--output', default=settings.ACTIVITY_LOG_ARCHIVE_DIR, help='归档文件目录')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批写入 / 删除的条数')
+
+    def handle(self, *args, **options):
+        added = activity_log_store.refresh_rollups()
+        self.stdout.write(f'按天汇总：新增 {added} 行')
+        if activity_log_store.is_partitioned():
+            activity_log_store.ensure_partitions()
+
+        before = activity_log_store.day_start(timezone.localdate() - datetime.timedelta(days=max(options['days'], 1)))
+        path, count = activity_log_store.archive(before, options['output'], batch_size=options['batch_size'])
+        if not count:
+            self.stdout.write(self.style.SUCCESS(f'{before:%Y-%m-%d} 之前没有需要归档的日志。'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'已归档 {before:%Y-%m-%d} 之前的 {count} 条日志：{path}'))
@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import BackupRecord
+from core.services import backup as backup_service
+
+
+class Command(BaseCommand):
+    help = '导出数据备份 (全量或基于上一次备份的增量)，可配合 cron 定期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='只导出上一次成功备份之后的变更')
+        parser.add_argument('--format', choices=sorted(backup_service.FORMATS), default=backup_service.DEFAULT_FORMAT)
+        parser.add_argument('--output', default='.', help='备份文件所在目录')
+
+    def handle(self, *args, **options):
+        kind = BackupRecord.Kind.INCREMENTAL if options['incremental'] else BackupRecord.Kind.FULL
+        record = backup_service.start(kind)
+        if record is None:
+            raise CommandError('没有成功的备份记录，请先执行一次全量备份')
+
+        fmt = options['format']
+        os.makedirs(options['output'], exist_ok=True)
+        path = os.path.join(options['output'], backup_service.filename(fmt, record=record))
+        with open(path, 'wb') as f:
+            for chunk in backup_service.stream(fmt, record=record):
+                f.write(chunk)
+        record.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f'{record.get_kind_display()} #{record.pk}: {path} ({record.records} 条记录，{record.tombstones} 个删除标记)'
+        ))
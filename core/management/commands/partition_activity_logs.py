@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.services import activity_log_store
+
+
+class Command(BaseCommand):
+    help = '(PostgreSQL) 将统一动态表转换为按月分区表并预建后续月份的分区；已分区时只预建分区'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None, help='预建当前月份之后多少个月的分区')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('按月分区仅支持 PostgreSQL')
+        if not activity_log_store.is_partitioned():
+            self.stdout.write('正在转换为分区表 (复制全部数据，期间锁表)...')
+            activity_log_store.convert_to_partitioned()
+        names = activity_log_store.ensure_partitions(options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f"分区已就绪：{', '.join(names)}"))
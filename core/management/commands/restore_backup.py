@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services import restore as restore_service
+
+
+class Command(BaseCommand):
+    help = '按顺序恢复备份链：一个全量备份 + 之后的若干增量备份 (在同一事务中执行)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='备份文件，第一个为全量备份，其余为按时间顺序的增量备份')
+        parser.add_argument('--full-id', type=int, help='全量备份的 ID (文件被改名、无法从文件名识别时指定)')
+
+    def handle(self, *args, **options):
+        try:
+            results = restore_service.restore_chain(options['files'], full_id=options['full_id'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        for result in results:
+            self.stdout.write(f"{result['file']}: 恢复 {result['records']} 条记录，删除 {result['deleted']} 条")
+        self.stdout.write(self.style.SUCCESS(f'已恢复 {len(results)} 个备份文件'))
@@ -0,0 +1,47 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from core.services import ai_enrichment
+
+
+def _run_in_thread(job):
+    try:
+        return ai_enrichment.run_job(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = '执行 AI 补全任务队列 (TodoTask / Opportunity 保存后入队的解析任务)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='本进程同时执行的任务数')
+        parser.add_argument('--sleep', type=float, default=2.0, help='队列为空时的轮询间隔 (秒)')
+        parser.add_argument('--once', action='store_true', help='处理完当前到期任务后退出')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker = ai_enrichment.worker_id()
+        self._stop = False
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        self.stdout.write(f'AI 补全 worker 已启动 ({worker}, 并发 {concurrency})')
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-worker') as executor:
+            while not self._stop:
+                close_old_connections()
+                ai_enrichment.requeue_stale()
+                jobs = ai_enrichment.claim(concurrency, worker)
+                for job in executor.map(_run_in_thread, jobs):
+                    self.stdout.write(f'{job} 尝试 {job.attempts}/{job.max_attempts}')
+                if options['once'] and not jobs:
+                    break
+                if not jobs:
+                    time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS('AI 补全 worker 已退出'))
+
+    def _handle_stop(self, signum, frame):
+        self._stop = True
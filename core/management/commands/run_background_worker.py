@@ -0,0 +1,49 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from core.services import background
+
+
+def _run_in_thread(job):
+    try:
+        return background.run_job(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = '执行后台任务队列 (批量通知下发、数据恢复等)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'BACKGROUND_JOB_WORKERS', 2),
+                            help='本进程同时执行的任务数')
+        parser.add_argument('--sleep', type=float, default=1.0, help='队列为空时的轮询间隔 (秒)')
+        parser.add_argument('--once', action='store_true', help='处理完当前等待中的任务后退出')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker = background.worker_id()
+        self._stop = False
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        self.stdout.write(f'后台任务 worker 已启动 ({worker}, 并发 {concurrency})')
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='background-job') as executor:
+            while not self._stop:
+                close_old_connections()
+                background.requeue_stale()
+                jobs = background.claim(concurrency, worker)
+                for job in executor.map(_run_in_thread, jobs):
+                    self.stdout.write(f'{job.name} {job.pk} 尝试 {job.attempts}/{job.max_attempts}')
+                if options['once'] and not jobs:
+                    break
+                if not jobs:
+                    time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS('后台任务 worker 已退出'))
+
+    def _handle_stop(self, signum, frame):
+        self._stop = True
@@ -0,0 +1,134 @@
+"""
+接口 SQL 画像中间件 (可选启用)
+
+启用方式：环境变量 QUERY_PROFILER_ENABLED=true
+- 记录每个请求的查询数、SQL 总耗时、重复查询 (按 SQL 模板指纹判定)
+- 通过响应头 X-Query-Count / X-Query-Time-Ms / X-Query-Duplicates 返回
+- 按 URL 名称 + 请求方法累计到 QueryProfile 表 (后台 "接口SQL画像" 查看)
+- 查询数超过 QUERY_BUDGETS 中的预算时记录告警日志
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    SQL 模板指纹：参数已是占位符，仅需折叠 IN 列表长度与空白
+    """
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql)).strip()
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper 钩子：统计查询数、耗时与指纹
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time_ms += (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.fingerprints.values() if n > 1)
+
+    @property
+    def top_duplicate(self):
+        if not self.duplicates:
+            return ''
+        return self.fingerprints.most_common(1)[0][0]
+
+
+def get_budget(url_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(url_name, budgets.get('default', 0))
+
+
+def record_profile(url_name, method, recorder, budget):
+    """
+    累计到 QueryProfile (单条 UPDATE，首次出现时 INSERT)
+    """
+    from .models import QueryProfile
+
+    over_budget = bool(budget) and recorder.count > budget
+    updates = {
+        'requests': F('requests') + 1,
+        'total_queries': F('total_queries') + recorder.count,
+        'max_queries': Greatest(F('max_queries'), recorder.count),
+        'last_queries': recorder.count,
+        'total_time_ms': F('total_time_ms') + recorder.time_ms,
+        'duplicate_queries': F('duplicate_queries') + recorder.duplicates,
+        'budget': budget,
+        'budget_violations': F('budget_violations') + int(over_budget),
+    }
+    if recorder.top_duplicate:
+        updates['top_duplicate'] = recorder.top_duplicate
+
+    if QueryProfile.objects.filter(url_name=url_name, method=method).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            QueryProfile.objects.create(
+                url_name=url_name, method=method, requests=1,
+                total_queries=recorder.count, max_queries=recorder.count, last_queries=recorder.count,
+                total_time_ms=recorder.time_ms, duplicate_queries=recorder.duplicates,
+                budget=budget, budget_violations=int(over_budget), top_duplicate=recorder.top_duplicate,
+            )
+    except IntegrityError:
+        # 并发请求已创建该行，回退为累加
+        QueryProfile.objects.filter(url_name=url_name, method=method).update(**updates)
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time-Ms'] = f'{recorder.time_ms:.1f}'
+        response['X-Query-Duplicates'] = str(recorder.duplicates)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else None
+        if not url_name:
+            return response
+
+        budget = get_budget(url_name)
+        if budget and recorder.count > budget:
+            logger.warning(
+                '查询数超出预算: %s %s queries=%s budget=%s duplicates=%s top_duplicate=%s',
+                request.method, url_name, recorder.count, budget, recorder.duplicates, recorder.top_duplicate
+            )
+        try:
+            record_profile(url_name, request.method, recorder, budget)
+        except Exception:
+            logger.exception('记录接口SQL画像失败: %s', url_name)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0078_systemrelease_announcement_priority_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(max_length=200, verbose_name='URL名称')),
+                ('method', models.CharField(max_length=10, verbose_name='请求方法')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='请求次数')),
+                ('total_queries', models.PositiveBigIntegerField(default=0, verbose_name='累计查询数')),
+                ('max_queries', models.PositiveIntegerField(default=0, verbose_name='单次最大查询数')),
+                ('last_queries', models.PositiveIntegerField(default=0, verbose_name='最近查询数')),
+                ('total_time_ms', models.FloatField(default=0, verbose_name='累计SQL耗时(ms)')),
+                ('duplicate_queries', models.PositiveBigIntegerField(default=0, verbose_name='累计重复查询数')),
+                ('budget', models.PositiveIntegerField(default=0, verbose_name='查询预算')),
+                ('budget_violations', models.PositiveIntegerField(default=0, verbose_name='超出预算次数')),
+                ('top_duplicate', models.TextField(blank=True, default='', verbose_name='重复最多的SQL')),
+                ('last_seen', models.DateTimeField(auto_now=True, verbose_name='最近请求时间')),
+            ],
+            options={
+                'verbose_name': '接口SQL画像',
+                'verbose_name_plural': '接口SQL画像',
+                'ordering': ['-max_queries'],
+                'unique_together': {('url_name', 'method')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0080_notification_recipient_read_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='缓存键')),
+                ('config_id', models.IntegerField(blank=True, null=True, verbose_name='模型配置ID')),
+                ('model_name', models.CharField(blank=True, max_length=100, verbose_name='模型名称')),
+                ('raw_response', models.TextField(blank=True, verbose_name='AI原始返回')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='解析结果')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='命中次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_used_at', models.DateTimeField(db_index=True, verbose_name='最近使用时间')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+            ],
+            options={
+                'verbose_name': 'AI响应缓存',
+                'verbose_name_plural': 'AI响应缓存',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+    ]
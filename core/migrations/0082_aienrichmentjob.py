@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0081_llmresponsecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIEnrichmentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TODO', '待办解析'), ('OPPORTUNITY', '商机解析')], max_length=20, verbose_name='任务类型')),
+                ('object_id', models.PositiveIntegerField(verbose_name='对象ID')),
+                ('text', models.TextField(verbose_name='待解析文本')),
+                ('status', models.CharField(choices=[('PENDING', '等待中'), ('RUNNING', '执行中'), ('SUCCESS', '已完成'), ('FAILED', '失败'), ('CANCELLED', '已取消')], default='PENDING', max_length=20, verbose_name='状态')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='最大尝试次数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='最早执行时间')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='执行进程')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='开始执行时间')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最近错误')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='解析结果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': 'AI补全任务',
+                'verbose_name_plural': 'AI补全任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='core_aijob_status_run_idx'), models.Index(fields=['kind', 'object_id'], name='core_aijob_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0082_aienrichmentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissionlog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='含故障转移 / 对冲请求', verbose_name='调用次数'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='cache_status',
+            field=models.CharField(blank=True, choices=[('MISS', '调用模型'), ('HIT', '命中缓存'), ('PREFILLED', '批量合并'), ('LOCAL', '本地抽取')], max_length=10, verbose_name='缓存状态'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='completion_tokens',
+            field=models.IntegerField(blank=True, null=True, verbose_name='输出Token'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='config_id',
+            field=models.IntegerField(blank=True, null=True, verbose_name='模型配置ID'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True, verbose_name='费用(元)'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='latency_ms',
+            field=models.IntegerField(blank=True, null=True, verbose_name='耗时(毫秒)'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='model_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='模型名称'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True, verbose_name='输入Token'),
+        ),
+        migrations.AddField(
+            model_name='submissionlog',
+            name='provider',
+            field=models.CharField(blank=True, max_length=20, verbose_name='服务提供商'),
+        ),
+        migrations.AddIndex(
+            model_name='submissionlog',
+            index=models.Index(fields=['created_at'], name='submissionlog_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0083_submissionlog_telemetry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('FULL', '全量备份'), ('INCREMENTAL', '增量备份')], max_length=20, verbose_name='备份类型')),
+                ('status', models.CharField(choices=[('RUNNING', '导出中'), ('SUCCESS', '已完成'), ('FAILED', '失败')], default='RUNNING', max_length=20, verbose_name='状态')),
+                ('watermarks', models.JSONField(blank=True, default=dict, verbose_name='各模型水位')),
+                ('records', models.PositiveIntegerField(default=0, verbose_name='导出记录数')),
+                ('tombstones', models.PositiveIntegerField(default=0, verbose_name='删除标记数')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='操作人')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='core.backuprecord', verbose_name='上一次备份')),
+            ],
+            options={
+                'verbose_name': '数据备份记录',
+                'verbose_name_plural': '数据备份记录',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0084_backuprecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('type', models.CharField(choices=[('OPPORTUNITY', '商机'), ('CUSTOMER', '客户'), ('CONTACT', '联系人'), ('ACTIVITY', '活动'), ('COMPETITION', '赛事'), ('PROJECT', '项目'), ('DAILY_REPORT', '日报'), ('SYSTEM', '系统'), ('USER', '用户')], max_length=20, verbose_name='类型')),
+                ('department', models.CharField(blank=True, max_length=100, verbose_name='部门')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='条数')),
+            ],
+            options={
+                'verbose_name': '统一动态日汇总',
+                'verbose_name_plural': '统一动态日汇总',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['created_at', 'type'], name='core_actlog_created_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['actor', 'created_at'], name='core_actlog_actor_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitylogdailystat',
+            constraint=models.UniqueConstraint(fields=('date', 'type', 'department'), name='core_actlog_daily_unique'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0085_activitylog_indexes_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='任务ID')),
+                ('name', models.CharField(max_length=50, verbose_name='任务名称')),
+                ('status', models.CharField(choices=[('PENDING', '等待中'), ('RUNNING', '执行中'), ('SUCCESS', '已完成'), ('FAILED', '失败'), ('CANCELLED', '已取消')], default='PENDING', max_length=20, verbose_name='状态')),
+                ('func', models.CharField(blank=True, default='', max_length=200, verbose_name='执行函数')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='位置参数')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='关键字参数')),
+                ('done', models.PositiveBigIntegerField(default=0, verbose_name='已完成数量')),
+                ('total', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='总数')),
+                ('extra', models.JSONField(blank=True, default=dict, verbose_name='其他进度信息')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='结果')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='最大尝试次数')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='执行进程')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_bgjob_status_idx')],
+            },
+        ),
+    ]
@@ -48,7 +48,7 @@ class AIConfiguration(models.Model):
     def save(self, *args, **kwargs):
         # Ensure only one config is active
         if self.is_active:
-            AIConfiguration.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+            AIConfiguration.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False, updated_at=timezone.now())
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -154,6 +154,10 @@ class Notification(models.Model):
         verbose_name = '系统通知'
         verbose_name_plural = '系统通知'
         ordering = ['-created_at']
+        indexes = [
+            # 未读计数与通知流：按接收人 + 已读状态，按时间倒序
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='core_notif_recip_read_idx'),
+        ]
 
 # --- CRM Core Models ---
 
@@ -812,6 +816,28 @@ class ActivityLog(models.Model):
         verbose_name = '统一动态'
         verbose_name_plural = '统一动态'
         ordering = ['-created_at']
+        indexes = [
+            # 日志查询：按时间范围 (+ 类型) 筛选、按时间倒序分页；按操作人查看其动态
+            models.Index(fields=['created_at', 'type'], name='core_actlog_created_type_idx'),
+            models.Index(fields=['actor', 'created_at'], name='core_actlog_actor_created_idx'),
+        ]
+
+class ActivityLogDailyStat(models.Model):
+    """
+    统一动态按天汇总 (日期 + 类型 + 部门 -> 条数)，供日志统计接口读取，见 services/activity_log_store
+    已归档 (删除) 的日志仍保留在汇总中
+    """
+    date = models.DateField(verbose_name='日期')
+    type = models.CharField(max_length=20, choices=ActivityLog.Type.choices, verbose_name='类型')
+    department = models.CharField(max_length=100, blank=True, verbose_name='部门')
+    count = models.PositiveIntegerField(default=0, verbose_name='条数')
+
+    class Meta:
+        verbose_name = '统一动态日汇总'
+        verbose_name_plural = '统一动态日汇总'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'type', 'department'], name='core_actlog_daily_unique'),
+        ]
 
 class SubmissionLog(models.Model):
     """
@@ -837,11 +863,30 @@ class SubmissionLog(models.Model):
     fields = models.JSONField(default=dict, blank=True, verbose_name='表单字段')
     filters = models.JSONField(default=dict, blank=True, verbose_name='筛选条件')
     result_payload = models.JSONField(default=dict, blank=True, verbose_name='执行结果')
+
+    # 模型调用遥测 (见 services/llm_telemetry)
+    class CacheStatus(models.TextChoices):
+        MISS = 'MISS', '调用模型'
+        HIT = 'HIT', '命中缓存'
+        PREFILLED = 'PREFILLED', '批量合并'
+        LOCAL = 'LOCAL', '本地抽取'
+    provider = models.CharField(max_length=20, blank=True, verbose_name='服务提供商')
+    model_name = models.CharField(max_length=100, blank=True, verbose_name='模型名称')
+    config_id = models.IntegerField(null=True, blank=True, verbose_name='模型配置ID')
+    cache_status = models.CharField(max_length=10, choices=CacheStatus.choices, blank=True, verbose_name='缓存状态')
+    latency_ms = models.IntegerField(null=True, blank=True, verbose_name='耗时(毫秒)')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='调用次数', help_text='含故障转移 / 对冲请求')
+    prompt_tokens = models.IntegerField(null=True, blank=True, verbose_name='输入Token')
+    completion_tokens = models.IntegerField(null=True, blank=True, verbose_name='输出Token')
+    cost = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True, verbose_name='费用(元)')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     class Meta:
         verbose_name = 'AI提交日志'
         verbose_name_plural = 'AI提交日志'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='submissionlog_created_idx'),
+        ]
 
 class CustomerCohort(models.Model):
     name = models.CharField(max_length=100)
@@ -1125,3 +1170,179 @@ class SystemRelease(models.Model):
 
     def __str__(self):
         return f"{self.version} - {self.title}"
+
+class QueryProfile(models.Model):
+    """
+    接口 SQL 画像：由 QueryProfilerMiddleware 按 URL 名称 + 请求方法汇总
+    """
+    url_name = models.CharField(max_length=200, verbose_name='URL名称')
+    method = models.CharField(max_length=10, verbose_name='请求方法')
+    requests = models.PositiveIntegerField(default=0, verbose_name='请求次数')
+    total_queries = models.PositiveBigIntegerField(default=0, verbose_name='累计查询数')
+    max_queries = models.PositiveIntegerField(default=0, verbose_name='单次最大查询数')
+    last_queries = models.PositiveIntegerField(default=0, verbose_name='最近查询数')
+    total_time_ms = models.FloatField(default=0, verbose_name='累计SQL耗时(ms)')
+    duplicate_queries = models.PositiveBigIntegerField(default=0, verbose_name='累计重复查询数')
+    budget = models.PositiveIntegerField(default=0, verbose_name='查询预算')
+    budget_violations = models.PositiveIntegerField(default=0, verbose_name='超出预算次数')
+    top_duplicate = models.TextField(blank=True, default='', verbose_name='重复最多的SQL')
+    last_seen = models.DateTimeField(auto_now=True, verbose_name='最近请求时间')
+
+    class Meta:
+        verbose_name = '接口SQL画像'
+        verbose_name_plural = '接口SQL画像'
+        unique_together = ['url_name', 'method']
+        ordering = ['-max_queries']
+
+    def __str__(self):
+        return f"{self.method} {self.url_name}"
+
+    @property
+    def avg_queries(self):
+        return round(self.total_queries / self.requests, 1) if self.requests else 0
+
+    @property
+    def avg_time_ms(self):
+        return round(self.total_time_ms / self.requests, 1) if self.requests else 0
+
+
+class LLMResponseCache(models.Model):
+    """
+    LLM 解析结果缓存 (LLM_CACHE_BACKEND=db 时使用)：按 (配置, 模型, Prompt, 输入, 温度) 的哈希寻址
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name='缓存键')
+    config_id = models.IntegerField(null=True, blank=True, verbose_name='模型配置ID')
+    model_name = models.CharField(max_length=100, blank=True, verbose_name='模型名称')
+    raw_response = models.TextField(blank=True, verbose_name='AI原始返回')
+    result = models.JSONField(default=dict, blank=True, verbose_name='解析结果')
+    hits = models.PositiveIntegerField(default=0, verbose_name='命中次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    last_used_at = models.DateTimeField(db_index=True, verbose_name='最近使用时间')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='过期时间')
+
+    class Meta:
+        verbose_name = 'AI响应缓存'
+        verbose_name_plural = 'AI响应缓存'
+        ordering = ['-last_used_at']
+
+    def __str__(self):
+        return f"{self.model_name} {self.key[:12]}"
+
+
+class AIEnrichmentJob(models.Model):
+    """
+    AI 补全任务队列：TodoTask / Opportunity 保存时入队，由 run_ai_worker 管理命令异步解析并回写字段
+    """
+    class Kind(models.TextChoices):
+        TODO = 'TODO', '待办解析'
+        OPPORTUNITY = 'OPPORTUNITY', '商机解析'
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', '等待中'
+        RUNNING = 'RUNNING', '执行中'
+        SUCCESS = 'SUCCESS', '已完成'
+        FAILED = 'FAILED', '失败'
+        CANCELLED = 'CANCELLED', '已取消'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name='任务类型')
+    object_id = models.PositiveIntegerField(verbose_name='对象ID')
+    text = models.TextField(verbose_name='待解析文本')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name='状态')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='最大尝试次数')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='最早执行时间')
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name='执行进程')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='开始执行时间')
+    last_error = models.TextField(blank=True, default='', verbose_name='最近错误')
+    result = models.JSONField(default=dict, blank=True, verbose_name='解析结果')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        verbose_name = 'AI补全任务'
+        verbose_name_plural = 'AI补全任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='core_aijob_status_run_idx'),
+            models.Index(fields=['kind', 'object_id'], name='core_aijob_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.get_status_display()})"
+
+
+class BackgroundJob(models.Model):
+    """
+    后台任务 (批量通知下发、数据恢复等)：状态与进度保存在数据库，由 run_background_worker 管理命令领取执行；
+    func 为空的记录是请求内执行、只登记进度的任务 (如流式备份导出)
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', '等待中'
+        RUNNING = 'RUNNING', '执行中'
+        SUCCESS = 'SUCCESS', '已完成'
+        FAILED = 'FAILED', '失败'
+        CANCELLED = 'CANCELLED', '已取消'
+
+    id = models.CharField(max_length=32, primary_key=True, verbose_name='任务ID')
+    name = models.CharField(max_length=50, verbose_name='任务名称')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name='状态')
+    func = models.CharField(max_length=200, blank=True, default='', verbose_name='执行函数')
+    args = models.JSONField(default=list, blank=True, verbose_name='位置参数')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='关键字参数')
+    done = models.PositiveBigIntegerField(default=0, verbose_name='已完成数量')
+    total = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='总数')
+    extra = models.JSONField(default=dict, blank=True, verbose_name='其他进度信息')
+    result = models.JSONField(null=True, blank=True, verbose_name='结果')
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='提交人')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='最大尝试次数')
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name='执行进程')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    # 执行中的任务定期刷新 (心跳)，长时间未刷新说明执行进程已退出
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='core_bgjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.pk} ({self.get_status_display()})"
+
+
+class BackupRecord(models.Model):
+    """
+    数据备份记录：保存每次备份导出时各模型的水位 (导出开始时间)，增量备份只导出上次水位之后变更的记录
+    """
+    class Kind(models.TextChoices):
+        FULL = 'FULL', '全量备份'
+        INCREMENTAL = 'INCREMENTAL', '增量备份'
+
+    class Status(models.TextChoices):
+        RUNNING = 'RUNNING', '导出中'
+        SUCCESS = 'SUCCESS', '已完成'
+        FAILED = 'FAILED', '失败'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name='备份类型')
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children', verbose_name='上一次备份')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.RUNNING, verbose_name='状态')
+    watermarks = models.JSONField(default=dict, blank=True, verbose_name='各模型水位')
+    records = models.PositiveIntegerField(default=0, verbose_name='导出记录数')
+    tombstones = models.PositiveIntegerField(default=0, verbose_name='删除标记数')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='操作人')
+    started_at = models.DateTimeField(default=timezone.now, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        verbose_name = '数据备份记录'
+        verbose_name_plural = '数据备份记录'
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
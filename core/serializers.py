@@ -1,8 +1,13 @@
+import logging
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from .models import UserProfile, Opportunity, OpportunityLog, PerformanceTarget, Competition, MarketActivity, Customer, Contact, ActivityLog, CustomerTag, OpportunityTeamMember, ExternalIdMap, CustomerCohort, DepartmentModel, JobTitle
 from .models import ApprovalRequest, SocialMediaStats, SocialMediaAccount, DailyReport
+from .services import name_index
+
+logger = logging.getLogger(__name__)
 
 class DepartmentSerializer(serializers.ModelSerializer):
     parent_name = serializers.CharField(source='parent.name', read_only=True)
@@ -446,17 +451,13 @@ class OpportunitySerializer(serializers.ModelSerializer):
                 data.pop('sales_manager')
             elif isinstance(val, str) and not val.isdigit() and val.strip():
                 # 尝试根据名字查找用户
-                user = User.objects.filter(
-                    Q(first_name__icontains=val) | 
-                    Q(last_name__icontains=val) | 
-                    Q(username__icontains=val)
-                ).first()
-                if user:
-                    print(f"DEBUG: Found user {user.username} for sales_manager {val}")
-                    data['sales_manager'] = user.id
+                user_id = name_index.resolve(name_index.USER, val, name_index.LOOSE)
+                if user_id:
+                    logger.debug('Found user %s for sales_manager %s', user_id, val)
+                    data['sales_manager'] = user_id
                 else:
                     # 如果找不到，移除该字段，避免校验错误
-                    print(f"DEBUG: User not found for sales_manager {val}, popping field")
+                    logger.debug('User not found for sales_manager %s, popping field', val)
                     data.pop('sales_manager')
             elif val == '':
                  # 空字符串也移除
@@ -470,13 +471,13 @@ class OpportunitySerializer(serializers.ModelSerializer):
                 data.pop('customer')
             elif isinstance(val, str) and not val.isdigit() and val.strip():
                 # 尝试查找客户
-                cust = Customer.objects.filter(name__icontains=val).first()
-                if cust:
-                    print(f"DEBUG: Found customer {cust.name} for customer {val}")
-                    data['customer'] = cust.id
+                cust_id = name_index.resolve(name_index.CUSTOMER, val, name_index.LOOSE)
+                if cust_id:
+                    logger.debug('Found customer %s for customer %s', cust_id, val)
+                    data['customer'] = cust_id
                 else:
                     # 如果找不到，赋值给 customer_company 字段，并移除 customer 字段
-                    print(f"DEBUG: Customer not found for {val}, using customer_company")
+                    logger.debug('Customer not found for %s, using customer_company', val)
                     data['customer_company'] = val
                     data.pop('customer')
             elif val == '':
@@ -518,6 +519,35 @@ class OpportunitySerializer(serializers.ModelSerializer):
         name = f"{obj.sales_manager.last_name}{obj.sales_manager.first_name}".strip()
         return name if name else obj.sales_manager.username
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        预加载序列化所需的关联对象 (负责人、客户、团队成员、跟进日志)，避免逐行查询
+        """
+        return queryset.select_related('creator', 'sales_manager', 'customer').prefetch_related(
+            'team_members',
+            Prefetch('logs', queryset=OpportunityLog.objects.select_related('operator')),
+        )
+
+class OpportunityListSerializer(OpportunitySerializer):
+    """
+    商机列表模式：跟进日志仅返回最近 LOG_LIMIT 条，详情接口仍使用 OpportunitySerializer 完整嵌套
+    需配合 setup_eager_loading 构建的查询集使用
+    """
+    LOG_LIMIT = 3
+    logs = OpportunityLogSerializer(source='recent_logs', many=True, read_only=True)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return queryset.select_related('creator', 'sales_manager', 'customer').prefetch_related(
+            'team_members',
+            Prefetch(
+                'logs',
+                queryset=OpportunityLog.objects.select_related('operator')[:cls.LOG_LIMIT],
+                to_attr='recent_logs',
+            ),
+        )
+
 class UserSimpleSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     class Meta:
@@ -606,7 +636,8 @@ class SubmissionLogSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
     class Meta:
         model = SubmissionLog
-        fields = ['id','status','text_input','intent','entity','fields','filters','result_payload','user','user_name','created_at']
+        fields = ['id','status','text_input','intent','entity','fields','filters','result_payload','user','user_name',
+                  'provider','model_name','cache_status','latency_ms','attempts','prompt_tokens','completion_tokens','cost','created_at']
         read_only_fields = ['created_at']
     def get_user_name(self, obj):
         return obj.user.username if obj.user else ''
@@ -730,6 +761,14 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         name = f"{obj.creator.last_name}{obj.creator.first_name}".strip()
         return name if name else obj.creator.username
 
+class NotificationFeedSerializer(serializers.ModelSerializer):
+    """
+    通知流轻量序列化：仅列表展示所需字段，不解析关联对象
+    """
+    class Meta:
+        model = Notification
+        fields = ['id', 'title', 'content', 'type', 'is_read', 'created_at', 'content_type', 'object_id']
+
 class NotificationSerializer(serializers.ModelSerializer):
     sender_name = serializers.SerializerMethodField()
     
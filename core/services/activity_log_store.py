@@ -0,0 +1,272 @@
+"""
+统一动态 (ActivityLog) 存储：按天汇总、归档与 PostgreSQL 按月分区
+
+ActivityLog 在登录 / 登出、联系人 / 项目保存、日报、新媒体数据更新时都会写入，原先只有主键索引，
+统计接口每次对全表 GROUP BY。这里：
+- 索引 (见模型 Meta)：(created_at, type) 用于时间范围 + 类型筛选与按时间倒序分页，(actor, created_at) 用于按操作人查询；
+  日志列表的日期筛选改为 created_at 范围条件 (原 created_at__date 无法使用索引)
+- 按天汇总：已结束的自然日按 日期 + 类型 + 部门 汇总到 ActivityLogDailyStat，统计接口读取汇总表，
+  当天数据按索引范围实时统计；统计接口与归档命令按需补齐汇总 (只计算最后一次汇总之后的日期)
+- 归档：archive_activity_logs 命令将超过 ACTIVITY_LOG_RETENTION_DAYS 天的日志按主键分批写入 jsonl.gz 文件
+  (loaddata 格式，可通过数据恢复导入) 后删除，汇总保留
+- 分区 (可选，仅 PostgreSQL)：partition_activity_logs 命令在维护窗口将表转换为按 created_at 的月度范围分区表，
+  并预建后续月份的分区；已分区时归档对整月过期的分区直接 DROP，不再逐行 DELETE
+"""
+import datetime
+import gzip
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.models import ActivityLog, ActivityLogDailyStat
+
+logger = logging.getLogger(__name__)
+
+TABLE = ActivityLog._meta.db_table
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def day_start(date):
+    """
+    本地时区某天 0 点 (aware datetime)
+    """
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def _as_date(value):
+    if not value or isinstance(value, datetime.date):
+        return value
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def filter_dates(queryset, start_date=None, end_date=None):
+    """
+    按日期 (含首尾，date 或 YYYY-MM-DD) 筛选，转换为 created_at 范围条件以使用索引
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    if start_date:
+        queryset = queryset.filter(created_at__gte=day_start(start_date))
+    if end_date:
+        queryset = queryset.filter(created_at__lt=day_start(end_date + datetime.timedelta(days=1)))
+    return queryset
+
+
+def _daily_counts(queryset):
+    # 部门优先取日志上的冗余字段，为空时取操作人当前部门 (兼容旧数据)
+    return queryset.annotate(
+        day=TruncDate('created_at'),
+        dept=Coalesce(NullIf('department', Value('')), 'actor__profile__department_link__name', Value('')),
+    ).values_list('day', 'type', 'dept').annotate(count=Count('id')).order_by()
+
+
+def refresh_rollups(until=None):
+    """
+    补齐 until (默认今天，不含) 之前各自然日的汇总，返回新增的汇总行数
+    """
+    until = until or timezone.localdate()
+    last = ActivityLogDailyStat.objects.aggregate(last=Max('date'))['last']
+    if last is not None:
+        start = last + datetime.timedelta(days=1)
+    else:
+        first = ActivityLog.objects.aggregate(first=Min('created_at'))['first']
+        if first is None:
+            return 0
+        start = timezone.localdate(first)
+    if start >= until:
+        return 0
+    rows = _daily_counts(ActivityLog.objects.filter(created_at__gte=day_start(start), created_at__lt=day_start(until)))
+    stats = [ActivityLogDailyStat(date=day, type=type_, department=dept, count=count) for day, type_, dept, count in rows]
+    # 并发补齐时结果相同，忽略重复
+    ActivityLogDailyStat.objects.bulk_create(stats, batch_size=1000, ignore_conflicts=True)
+    return len(stats)
+
+
+def stats():
+    """
+    全部日志按类型、部门的条数：历史日期读汇总表，当天实时统计
+    """
+    refresh_rollups()
+    by_type, by_dept = {}, {}
+    for type_, count in ActivityLogDailyStat.objects.values_list('type').annotate(total=Sum('count')).order_by():
+        by_type[type_] = by_type.get(type_, 0) + count
+    for dept, count in ActivityLogDailyStat.objects.values_list('department').annotate(total=Sum('count')).order_by():
+        by_dept[dept] = by_dept.get(dept, 0) + count
+    for _, type_, dept, count in _daily_counts(ActivityLog.objects.filter(created_at__gte=day_start(timezone.localdate()))):
+        by_type[type_] = by_type.get(type_, 0) + count
+        by_dept[dept] = by_dept.get(dept, 0) + count
+    return {
+        'type_stats': [{'type': t, 'count': c} for t, c in sorted(by_type.items(), key=lambda item: -item[1])],
+        'dept_stats': [{'department': d, 'count': c} for d, c in sorted(by_dept.items(), key=lambda item: -item[1]) if d],
+    }
+
+
+# --- 归档 ---
+
+def archive(before, directory, batch_size=None):
+    """
+    将 created_at 早于 before 的日志写入 directory 下的 jsonl.gz 文件后删除，返回 (文件路径, 条数)；没有需要归档的日志时返回 (None, 0)
+    """
+    batch_size = batch_size or _setting('ACTIVITY_LOG_ARCHIVE_BATCH_SIZE', 5000)
+    refresh_rollups()
+    queryset = ActivityLog.objects.filter(created_at__lt=before)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        f"activity_logs_before_{timezone.localtime(before):%Y%m%d}_{timezone.localtime():%Y%m%d_%H%M%S}.jsonl.gz",
+    )
+    serializer = serializers.get_serializer('python')()
+    last_pk, count = 0, 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        while True:
+            # 按主键分页 (DISABLE_SERVER_SIDE_CURSORS 下 iterator() 仍会一次取回全部结果)
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for record in serializer.serialize(batch):
+                f.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+            last_pk = batch[-1].pk
+            count += len(batch)
+    if not count:
+        os.remove(path)
+        return None, 0
+
+    # 文件写完后再删除：整月过期的分区直接删除，其余逐批删除
+    if is_partitioned():
+        drop_partitions(before)
+    remaining = queryset.filter(pk__lte=last_pk)
+    while True:
+        pks = list(remaining.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        ActivityLog.objects.filter(pk__in=pks).delete()
+    logger.info('统一动态归档完成：%d 条 -> %s', count, path)
+    return path, count
+
+
+# --- PostgreSQL 按月分区 ---
+
+def _month(date, offset=0):
+    index = date.year * 12 + date.month - 1 + offset
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)", [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def _create_partition(cursor, month):
+    quote = connections[DEFAULT_DB_ALIAS].ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} PARTITION OF {quote(TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [day_start(month), day_start(_month(month, 1))],
+    )
+
+
+def ensure_partitions(months_ahead=None, using=DEFAULT_DB_ALIAS):
+    """
+    预建当前月份及之后 months_ahead 个月的分区，返回分区名称列表
+    """
+    months_ahead = _setting('ACTIVITY_LOG_PARTITION_MONTHS_AHEAD', 3) if months_ahead is None else months_ahead
+    current = _month(timezone.localdate())
+    months = [_month(current, i) for i in range(months_ahead + 1)]
+    with connections[using].cursor() as cursor:
+        for month in months:
+            _create_partition(cursor, month)
+    return [partition_name(month) for month in months]
+
+
+def convert_to_partitioned(using=DEFAULT_DB_ALIAS):
+    """
+    将普通表转换为按 created_at 的月度范围分区表 (复制全部数据，期间锁表，需在维护窗口执行)
+    主键变为 (id, created_at)；索引与外键按原名称重建，id 序列从原最大值继续
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    legacy = f"{TABLE}_unpartitioned"
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+            [TABLE, TABLE],
+        )
+        index_sql = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0), MIN(created_at) FROM {quote(TABLE)}")
+        max_id, first = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+        )
+        month = _month(timezone.localdate(first) if first else timezone.localdate())
+        while month <= _month(timezone.localdate()):
+            _create_partition(cursor, month)
+            month = _month(month, 1)
+        # 兜底分区：未预建分区的月份写入这里，避免插入失败
+        cursor.execute(f"CREATE TABLE {quote(TABLE + '_default')} PARTITION OF {quote(TABLE)} DEFAULT")
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}")
+        cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+        sequence = f"{TABLE}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(TABLE)}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, max_id + 1])
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [sequence])
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + '_pkey')} PRIMARY KEY (id, created_at)")
+        for sql in index_sql:
+            cursor.execute(sql)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+    ensure_partitions(using=using)
+
+
+def drop_partitions(before, using=DEFAULT_DB_ALIAS):
+    """
+    删除整月都早于 before 的月度分区 (数据需已归档)，返回删除的分区名称
+    """
+    quote = connections[using].ops.quote_name
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass", [TABLE],
+        )
+        names = {row[0] for row in cursor.fetchall()}
+        dropped = []
+        month = _month(timezone.localdate(before), -1)
+        while partition_name(month) in names:
+            cursor.execute(f"DROP TABLE {quote(partition_name(month))}")
+            dropped.append(partition_name(month))
+            month = _month(month, -1)
+    return dropped
@@ -0,0 +1,172 @@
+"""
+Agent 任务路由
+
+原先每次请求串行执行：意图识别 (parse_task) -> 实体抽取 (parse_xxx)，意图识别失败时还会再走一次正则兜底，
+一次请求需要 2~3 次模型调用的延迟。这里改为流水线：
+- 本地预分类：复用 parse_task / AgentRouterView 中的关键词正则
+  * 动词与实体紧邻 (如“新建客户”) 视为高置信度，跳过意图识别调用，直接抽取实体
+  * 仅宽松匹配 (如“新建一个华东区的客户”) 或命中多个实体时视为不确定
+- 不确定时意图识别与候选实体的抽取在线程池中并发执行，意图确认后采用对应的抽取结果；
+  模型给出的意图不在候选中时才补一次抽取调用。预抽取使用 service 的浅拷贝并把 SubmissionLog 收集到
+  各自的 log_sink 中，只写入被采用的那一次，未采用的抽取不会留下提交日志
+- 只有整句是一个查询 (以查询动词开头、单个分句、不含其他动作) 时才直接返回空意图，其余交给意图识别
+"""
+import copy
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+HIGH_CONFIDENCE = 0.9
+LOW_CONFIDENCE = 0.6
+
+_VERB = r'(?:新建|创建|新增|录入)'
+
+# (实体, AIService 抽取方法, 意图识别返回的 intent, 紧邻匹配, 宽松匹配)；宽松匹配按列表顺序兜底
+ENTITIES = [
+    ('competition', 'parse_competition', None,
+     _VERB + r'(?:一个|一场|一条)?(?:赛事|比赛)', _VERB + r'.*(?:赛事|比赛)'),
+    ('activity', 'parse_market_activity', None,
+     _VERB + r'(?:一个|一场|一条)?(?:市场)?活动', _VERB + r'.*(?:活动)'),
+    ('customer', 'parse_customer', 'create_customer',
+     _VERB + r'(?:一个|一条)?(?:客户|公司|企业)', _VERB + r'.*(?:客户|公司|企业)'),
+    ('opportunity', 'parse_opportunity', 'create_opportunity',
+     _VERB + r'(?:一个|一条)?(?:商机|机会|销售机会)', _VERB + r'.*(?:商机|机会)'),
+    ('todo', 'parse_todo_task', 'create_todo',
+     _VERB + r'(?:一个|一条)?(?:待办|任务)', None),
+]
+# 查询类任务暂无执行动作：整句只是一个查询时直接返回空意图
+QUERY_PATTERN = re.compile(r'^\s*(?:请|帮我)?(?:查询|查找|搜索|找一下)[^，,。;；\n]*$')
+# 句中出现这些动作时不视为单纯的查询
+_ACTION = re.compile(_VERB + r'|安排|提醒|记录|添加|修改|删除')
+
+_COMPILED = [
+    (entity, parser, intent, re.compile(strict), re.compile(loose) if loose else None)
+    for entity, parser, intent, strict, loose in ENTITIES
+]
+PARSERS = {entity: parser for entity, parser, _, _, _ in ENTITIES}
+INTENT_ENTITY = {intent: entity for entity, _, intent, _, _ in ENTITIES if intent}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AGENT_ROUTER_WORKERS', 4),
+                thread_name_prefix='agent-router',
+            )
+        return _executor
+
+
+def classify(text):
+    """
+    本地预分类，返回 [(实体, 置信度), ...]，按置信度降序
+    """
+    text = text or ''
+    strict = [entity for entity, _, _, pattern, _ in _COMPILED if pattern.search(text)]
+    if strict:
+        confidence = HIGH_CONFIDENCE if len(strict) == 1 else LOW_CONFIDENCE
+        return [(entity, confidence) for entity in strict]
+    return [(entity, LOW_CONFIDENCE) for entity, _, _, _, loose in _COMPILED if loose and loose.search(text)]
+
+
+def _in_worker(func, *args, **kwargs):
+    # 线程池中的线程不经过 request_finished，需自行释放数据库连接
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def is_query(text):
+    """
+    整句是否只是一个查询
+    """
+    text = text or ''
+    return bool(QUERY_PATTERN.search(text)) and not _ACTION.search(text)
+
+
+def _speculate(service, parser, task, user):
+    """
+    在线程池中预抽取：使用 service 的浅拷贝 (不修改共享实例)，SubmissionLog 先收集起来，返回 (结果, 日志)
+    """
+    spec = copy.copy(service)
+    spec.log_sink = []
+    return _in_worker(getattr(spec, parser), task, user=user), spec.log_sink
+
+
+def _write_logs(service, logs):
+    if not logs:
+        return
+    if getattr(service, 'log_sink', None) is not None:
+        for log in logs:
+            service.log_sink.append(log)
+        return
+    from core.models import SubmissionLog
+    try:
+        SubmissionLog.objects.bulk_create(logs)
+    except Exception as e:
+        logger.warning('写入 SubmissionLog 失败: %s', e)
+
+
+def _response(entity=None, fields=None, source=''):
+    return {
+        'intent': 'create' if entity else '',
+        'entity': entity or '',
+        'fields': fields if entity else {},
+        'filters': {},
+        'alternatives': [],
+        'warnings': [],
+        'intent_source': source,
+    }
+
+
+def route(service, task, user=None):
+    """
+    识别任务意图并抽取实体字段，返回 AgentRouterView 的响应结构
+    """
+    candidates = classify(task)
+    if not candidates and is_query(task):
+        return _response(source='local')
+    if len(candidates) == 1 and candidates[0][1] >= HIGH_CONFIDENCE:
+        entity = candidates[0][0]
+        return _response(entity, getattr(service, PARSERS[entity])(task, user=user), 'local')
+
+    # 意图不确定：候选实体的抽取与意图识别并发执行
+    speculative = {
+        entity: _get_executor().submit(_speculate, service, PARSERS[entity], task, user)
+        for entity, _ in candidates
+    }
+    try:
+        analysis = service.parse_task(task, user=user) or {}
+        intent_raw = analysis.get('intent', 'other')
+    except Exception as e:
+        logger.warning('Agent 意图识别失败: %s', e)
+        intent_raw = 'other'
+
+    entity = INTENT_ENTITY.get(intent_raw)
+    source = 'llm'
+    if entity is None and candidates:
+        # 模型未给出可执行意图时沿用正则兜底
+        entity, source = candidates[0][0], 'fallback'
+
+    for other, future in speculative.items():
+        if other != entity:
+            future.cancel()
+    if entity is None:
+        return _response(source='llm')
+    if entity in speculative:
+        fields, logs = speculative[entity].result()
+        _write_logs(service, logs)
+    else:
+        fields = getattr(service, PARSERS[entity])(task, user=user)
+    return _response(entity, fields, source)
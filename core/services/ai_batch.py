@@ -0,0 +1,173 @@
+"""
+批量 AI 解析 (表格导入等场景)
+
+逐条调用时导入 500 条线索需要串行等待 500 次模型调用。这里：
+- 同一实体类型的文本在线程池中并发解析，并发数受 AI_BATCH_CONCURRENCY 限制
+- pack=True 时把较短的文本 (不超过 AI_BATCH_PACK_MAX_CHARS) 每 AI_BATCH_PACK_SIZE 条合并为一次调用，
+  Prompt 取自 AIService 的 *_prompt 方法，模型按顺序返回 {"items": [...]}；各条结果按组内位置预置给
+  对应条目的解析 (AIService.prefill)，条数不符或调用失败时该组退回逐条解析；
+  本地规则即可抽取的文本 (商机、客户，见 local_extractor) 不参与合并，单独走本地快速路径
+- 结果按完成顺序产出，由视图以 NDJSON 流式返回
+- SubmissionLog 先收集在内存中，按批 bulk_create
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+
+from core.models import SubmissionLog
+from core.services import local_extractor
+from core.services.ai_service import AIService
+
+# 实体 -> AIService 解析方法
+PARSERS = {
+    'opportunity': 'parse_opportunity',
+    'customer': 'parse_customer',
+    'contact': 'parse_contact',
+    'todo': 'parse_todo_task',
+    'competition': 'parse_competition',
+    'activity': 'parse_market_activity',
+}
+# 实体 -> AIService 中解析方法使用的 Prompt
+PROMPTS = {
+    'opportunity': 'opportunity_prompt',
+    'customer': 'customer_prompt',
+    'contact': 'contact_prompt',
+    'todo': 'todo_prompt',
+    'competition': 'competition_prompt',
+    'activity': 'market_activity_prompt',
+}
+# 实体 -> 解析方法中先行尝试的本地规则抽取
+LOCAL_EXTRACTORS = {
+    'opportunity': local_extractor.extract_opportunity,
+    'customer': local_extractor.extract_customer,
+}
+# Prompt 含精确到秒的当前时间 (相对截止时间的计算依据)，合并解析时同样不使用响应缓存
+UNCACHED = {'todo'}
+
+LOG_FLUSH_SIZE = 100
+
+PACK_INSTRUCTION = """
+The input contains {count} independent records, each starting with a line "### <number>".
+Apply the extraction rules above to every record separately.
+Output JSON: {{"items": [<result of record 1>, <result of record 2>, ...]}} with exactly {count} objects in input order.
+"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LogSink:
+    """
+    线程安全的 SubmissionLog 收集器
+    """
+
+    def __init__(self):
+        self._items = []
+        self._lock = threading.Lock()
+
+    def append(self, log):
+        with self._lock:
+            self._items.append(log)
+
+    def flush(self, min_size=0):
+        with self._lock:
+            if len(self._items) < max(min_size, 1):
+                return 0
+            items, self._items = self._items, []
+        SubmissionLog.objects.bulk_create(items, batch_size=LOG_FLUSH_SIZE)
+        return len(items)
+
+
+def _handled_locally(entity, text):
+    extract = LOCAL_EXTRACTORS.get(entity)
+    return extract is not None and AIService.is_confident(extract(text))
+
+
+def _groups(texts, pack, entity=None):
+    """
+    拆分为任务组 [(索引列表, 是否合并)]；本地规则可抽取的文本单独成组，不占用合并调用的名额
+    """
+    if not pack:
+        return [([i], False) for i in range(len(texts))]
+    size = _setting('AI_BATCH_PACK_SIZE', 5)
+    max_chars = _setting('AI_BATCH_PACK_MAX_CHARS', 300)
+    groups, short = [], []
+    for i, text in enumerate(texts):
+        if len(text) <= max_chars and not _handled_locally(entity, text):
+            short.append(i)
+            if len(short) == size:
+                groups.append((short, True))
+                short = []
+        else:
+            groups.append(([i], False))
+    if short:
+        groups.append((short, len(short) > 1))
+    return groups
+
+
+def _run_group(indexes, packed, texts, entity, user, config_id, use_cache, sink):
+    service = AIService(config_id=config_id, use_cache=use_cache, log_sink=sink)
+    parser = getattr(service, PARSERS[entity])
+    prefilled = {}
+    if packed:
+        group_texts = [texts[i] for i in indexes]
+        prompt = getattr(service, PROMPTS[entity])()
+        packed_text = '\n'.join(f'### {n}\n{text}' for n, text in enumerate(group_texts, 1))
+        data = service._call_llm_json(
+            prompt + PACK_INSTRUCTION.format(count=len(group_texts)), packed_text, use_cache=entity not in UNCACHED,
+        )
+        items = data.get('items') if isinstance(data, dict) else None
+        if isinstance(items, list) and len(items) == len(group_texts) and all(isinstance(x, dict) for x in items):
+            prefilled = dict(zip(indexes, items))
+    results = []
+    for i in indexes:
+        # 按条目位置预置，文本重复的条目各自使用自己的结果
+        service.prefill(texts[i], prefilled.get(i))
+        try:
+            results.append((i, parser(texts[i], user=user)))
+        except Exception as e:
+            results.append((i, {'error': str(e)}))
+        finally:
+            service.prefill(texts[i], None)
+    return results
+
+
+def _in_worker(*args):
+    # 线程池中的线程不经过 request_finished，需自行释放数据库连接
+    try:
+        return _run_group(*args)
+    finally:
+        connections.close_all()
+
+
+def parse_many(entity, texts, user=None, config_id=None, pack=False, use_cache=True):
+    """
+    批量解析，按完成顺序产出 (索引, 结果)；结束时写入剩余 SubmissionLog
+    """
+    sink = LogSink()
+    groups = _groups(texts, pack, entity)
+    concurrency = min(_setting('AI_BATCH_CONCURRENCY', 4), len(groups))
+    try:
+        if concurrency <= 1:
+            for indexes, packed in groups:
+                yield from _run_group(indexes, packed, texts, entity, user, config_id, use_cache, sink)
+                sink.flush(LOG_FLUSH_SIZE)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-batch')
+        try:
+            futures = [
+                executor.submit(_in_worker, indexes, packed, texts, entity, user, config_id, use_cache, sink)
+                for indexes, packed in groups
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+                sink.flush(LOG_FLUSH_SIZE)
+        finally:
+            # 客户端中途断开时取消尚未开始的任务
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        sink.flush()
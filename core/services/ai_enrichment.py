@@ -0,0 +1,217 @@
+"""
+AI 补全任务队列 (数据库实现，无需外部消息中间件)
+
+原先 TodoTask / 占位名称 Opportunity 在 pre_save 中同步调用模型，保存 (包括后台编辑、批量导入)
+会阻塞最长 60 秒且事务一直未提交。现在：
+- signals 在保存时判断是否需要补全，事务提交后写入 AIEnrichmentJob 并立即返回
+- run_ai_worker 管理命令领取任务、调用模型并回写字段；失败按指数退避重试，超过 max_attempts 标记失败
+- 领取采用条件 UPDATE (status=PENDING -> RUNNING)，多个 worker 并发时同一任务只会被一个领取；
+  AI_ENRICHMENT_MAX_RUNNING 限制全局同时执行的任务数，避免打满模型服务
+"""
+import datetime
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import AIEnrichmentJob, Opportunity, TodoTask
+from core.services import name_index
+from core.services.ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+OPPORTUNITY_PLACEHOLDERS = ['新商机', 'New Opportunity', '商机', '未命名']
+RETRY_BASE_SECONDS = 30
+
+MODELS = {
+    AIEnrichmentJob.Kind.TODO: TodoTask,
+    AIEnrichmentJob.Kind.OPPORTUNITY: Opportunity,
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def safe_parse_date(date_str):
+    if not date_str: return None
+    try:
+        return datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+    except:
+        return None
+
+
+def safe_parse_datetime(date_str):
+    if not date_str: return None
+    try:
+        return datetime.datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
+    except:
+        try:
+            # Fallback to date only
+            d = datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            return d
+        except:
+            return None
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind, object_id, text):
+    """
+    入队；同一对象已有等待中的任务时只更新文本，不重复入队
+    """
+    pending = AIEnrichmentJob.objects.filter(kind=kind, object_id=object_id, status=AIEnrichmentJob.Status.PENDING)
+    if pending.update(text=text):
+        return None
+    return AIEnrichmentJob.objects.create(
+        kind=kind, object_id=object_id, text=text,
+        max_attempts=_setting('AI_ENRICHMENT_MAX_ATTEMPTS', 3),
+    )
+
+
+def requeue_stale(now=None):
+    """
+    worker 异常退出后遗留的 RUNNING 任务，超时后放回队列
+    """
+    now = now or timezone.now()
+    timeout = timedelta(seconds=_setting('AI_ENRICHMENT_JOB_TIMEOUT', 300))
+    return AIEnrichmentJob.objects.filter(
+        status=AIEnrichmentJob.Status.RUNNING, locked_at__lt=now - timeout,
+    ).update(status=AIEnrichmentJob.Status.PENDING, locked_by='', locked_at=None)
+
+
+def claim(limit, worker=None):
+    """
+    领取最多 limit 个到期任务 (受全局并发上限约束)，返回已领取的任务列表
+    """
+    now = timezone.now()
+    max_running = _setting('AI_ENRICHMENT_MAX_RUNNING', 4)
+    running = AIEnrichmentJob.objects.filter(status=AIEnrichmentJob.Status.RUNNING).count()
+    limit = min(limit, max_running - running)
+    if limit <= 0:
+        return []
+
+    candidates = list(
+        AIEnrichmentJob.objects.filter(status=AIEnrichmentJob.Status.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    worker = worker or worker_id()
+    claimed = []
+    for job_id in candidates:
+        if AIEnrichmentJob.objects.filter(pk=job_id, status=AIEnrichmentJob.Status.PENDING).update(
+            status=AIEnrichmentJob.Status.RUNNING, locked_by=worker, locked_at=now,
+        ):
+            claimed.append(job_id)
+    return list(AIEnrichmentJob.objects.filter(pk__in=claimed).order_by('run_after', 'id'))
+
+
+def apply_todo(task, data):
+    update_fields = ['source_type', 'updated_at']
+    if data.get('title'):
+        task.title = data['title'][:200]
+        update_fields.append('title')
+    if data.get('description'):
+        task.description = data['description']
+        update_fields.append('description')
+    parsed_dt = safe_parse_datetime(data.get('deadline'))
+    if parsed_dt:
+        task.deadline = timezone.make_aware(parsed_dt) if settings.USE_TZ else parsed_dt
+        update_fields.append('deadline')
+    task.source_type = TodoTask.SourceType.AI_GENERATED
+    return update_fields
+
+
+def apply_opportunity(opp, data):
+    # 用户在任务执行前已手动填写名称时不再覆盖
+    if opp.name not in OPPORTUNITY_PLACEHOLDERS:
+        return []
+    update_fields = []
+    if data.get('name'):
+        opp.name = data['name']
+        update_fields.append('name')
+    if data.get('amount'):
+        opp.amount = data['amount']
+        update_fields.append('amount')
+    if data.get('customer_name'):
+        opp.customer_company = data['customer_name'][:100]
+        update_fields.append('customer_company')
+        customer_id = name_index.resolve(name_index.CUSTOMER, data['customer_name'], name_index.LOOSE)
+        if customer_id:
+            opp.customer_id = customer_id
+            update_fields.append('customer')
+    if data.get('sales_manager'):
+        # parse_opportunity 返回的是用户 ID
+        opp.sales_manager_id = data['sales_manager']
+        update_fields.append('sales_manager')
+    expected = safe_parse_date(data.get('expected_sign_date'))
+    if expected:
+        opp.expected_sign_date = expected
+        update_fields.append('expected_sign_date')
+    if data.get('stage') in Opportunity.Stage.values:
+        opp.stage = data['stage']
+        update_fields.append('stage')
+    return update_fields
+
+
+def _parse(job):
+    service = AIService()
+    if job.kind == AIEnrichmentJob.Kind.TODO:
+        return service.parse_todo_task(job.text)
+    return service.parse_opportunity(job.text)
+
+
+def run_job(job):
+    """
+    执行单个已领取的任务
+    """
+    job.attempts += 1
+    model = MODELS[job.kind]
+    try:
+        data = _parse(job) or {}
+        if 'error' in data:
+            # 解析失败 (含最后一次尝试) 一律按失败处理，不回写记录
+            raise RuntimeError(data['error'])
+
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(pk=job.object_id).first()
+            if instance is not None:
+                apply = apply_todo if job.kind == AIEnrichmentJob.Kind.TODO else apply_opportunity
+                update_fields = apply(instance, data)
+                if update_fields:
+                    # 回写时跳过补全信号，避免再次入队
+                    instance._skip_ai_enrichment = True
+                    instance.save(update_fields=update_fields)
+        job.status = AIEnrichmentJob.Status.SUCCESS
+        job.result = data
+        job.last_error = ''
+        job.finished_at = timezone.now()
+    except Exception as e:
+        logger.warning('AI 补全任务 %s 第 %s 次执行失败: %s', job.pk, job.attempts, e)
+        job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = AIEnrichmentJob.Status.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = AIEnrichmentJob.Status.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+    return job
+
+
+def run_pending(limit=10, worker=None):
+    """
+    领取并依次执行到期任务，返回执行的任务数 (测试及 --once 使用)
+    """
+    requeue_stale()
+    jobs = claim(limit, worker)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
@@ -1,20 +1,71 @@
 import json
+import logging
+import time
 import urllib.request
 import urllib.error
 import datetime
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import User
 from core.models import AIConfiguration, Customer, PromptTemplate, SubmissionLog
+from core.services import llm_cache, llm_clients, llm_router, llm_telemetry, local_extractor, name_index, prompt_registry
+
+logger = logging.getLogger(__name__)
+
+# 本地规则抽取命中时 SubmissionLog.prompt 记录的标记
+LOCAL_EXTRACTOR_PROMPT = '[local_extractor]'
+
 
 class AIService:
-    def __init__(self, config_id=None):
-        if config_id:
-            try:
-                self.config = AIConfiguration.objects.get(pk=config_id)
-            except AIConfiguration.DoesNotExist:
-                self.config = AIConfiguration.objects.filter(is_active=True).first()
-        else:
-            self.config = AIConfiguration.objects.filter(is_active=True).first()
+    # 解析类调用统一使用低温度，保证同一输入结果稳定 (也是响应缓存键的一部分)
+    TEMPERATURE = 0.1
+    # 对话 / 文本生成温度
+    CHAT_TEMPERATURE = 0.3
+
+    # 商机解析内置提示词 (未配置模板或模板版本过旧时使用)
+    OPPORTUNITY_PROMPT = """
+        You are a smart data extraction assistant.
+        Extract Sales Opportunity info from the user's text and return strictly valid JSON.
+        
+        Required JSON keys:
+        - name: Opportunity Name (Summarize "Customer + Product/Service", in Simplified Chinese).
+        - amount: Estimated amount (number only, e.g. 150000).
+        - customer_name: Customer company name (in Simplified Chinese).
+        - customer_code: Customer code (e.g. "CUST-001", "XM-002").
+        - customer_contact_name: Contact person name.
+        - customer_phone: Contact phone number.
+        - customer_email: Contact email.
+        - sales_manager_name: Sales person name (e.g. "付磊").
+        - project_manager_name: Project manager name (e.g. "张三").
+        - expected_sign_date: YYYY-MM-DD.
+        - stage: One of [CONTACT, REQ_ANALYSIS, INITIATION, BIDDING, DELIVERY, AFTER_SALES, COMPLETED].
+        - win_rate: Integer 0-100 (Probability).
+        - competitors: String, comma separated.
+        - source: String (e.g. "Old Customer", "Tender").
+        - product_line: String (e.g. "Network Range", "City Safety").
+        - customer_industry: String (e.g. "Education", "Finance").
+        - customer_region: String (e.g. "Beijing", "North China").
+        - description: A detailed summary of the opportunity background and needs.
+        
+        Infer defaults if missing:
+        - stage: 'CONTACT'
+        - amount: 0
+        - expected_sign_date: End of current month (YYYY-MM-DD)
+
+        Example:
+        Input: "九号电动车商机，15万，销售员付磊"
+        Output: {"name": "九号电动车-商机", "amount": 150000, "customer_name": "九号电动车", "sales_manager_name": "付磊", "expected_sign_date": "2025-12-31", "stage": "CONTACT"}
+        """
+
+    def __init__(self, config_id=None, use_cache=True, log_sink=None):
+        # 配置与客户端由进程级注册表缓存复用，见 llm_clients
+        self.config = llm_clients.get_config(config_id)
+        # use_cache=False 时绕过响应缓存，强制重新调用模型 (见 llm_cache)
+        self.use_cache = use_cache
+        # 提供 log_sink (含 append 方法) 时 SubmissionLog 交由调用方批量写入，见 ai_batch
+        self.log_sink = log_sink
+        # 批量合并解析：为下一条解析预先得到的模型结果 (用户输入, 结果)，命中时不再调用模型，见 prefill
+        self._prefilled = None
         
     def _get_client(self):
         if not self.config:
@@ -26,17 +77,16 @@ class AIService:
         Retrieve the active prompt template for a specific scene.
         If not found, return the default content.
         """
-        template = PromptTemplate.objects.filter(scene=scene, is_active=True).order_by('-updated_at').first()
-        if template:
-            return template.template
-        return default_content
+        # 模板由进程级注册表缓存，见 prompt_registry
+        return prompt_registry.get(scene, default_content)
 
-    def _call_llm_json(self, prompt, user_text, user=None, intent=None, entity=None):
+    def _call_llm_json(self, prompt, user_text, user=None, intent=None, entity=None, use_cache=True):
         """
         调用LLM并期望返回JSON：
         - 自动适配 Ollama 原生API(`/api/chat`)与 OpenAI兼容API(`/v1/chat/completions`)
         - 对返回内容进行JSON清洗与解析
         - 记录原始返回到 SubmissionLog (如果提供了 user)
+        - use_cache=False 时本次调用不读写响应缓存 (结果依赖当前时间的解析)
         """
         if not user_text: return None
         if not self.config:
@@ -47,53 +97,150 @@ class AIService:
             {"role": "user", "content": user_text}
         ]
         
+        started = time.monotonic()
+        cache_key = None
+        cache_status = SubmissionLog.CacheStatus.MISS
+        if self._prefilled is not None and self._prefilled[0] == user_text:
+            prefilled = self._prefilled[1]
+            self._prefilled = None
+            cached = {'raw': json.dumps(prefilled, ensure_ascii=False), 'parsed': prefilled}
+            cache_status = SubmissionLog.CacheStatus.PREFILLED
+        else:
+            cache_key = llm_cache.make_key(self.config, prompt, user_text, self.TEMPERATURE) if self.use_cache and use_cache else None
+            cached = llm_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                cache_status = SubmissionLog.CacheStatus.HIT
+        if cached is not None:
+            raw_content, error_msg = cached['raw'], ""
+            telemetry = llm_telemetry.build(self.config, cache_status)
+        else:
+            # 路由结果只保存在局部变量中：同一实例可能被多个线程同时使用 (见 agent_router)
+            route = self._request_json(messages, user_text)
+            raw_content, error_msg = route.raw_content, route.error_msg
+            telemetry = llm_telemetry.build(route.config, cache_status, attempts=route.attempts, usage=route.usage)
+        telemetry['latency_ms'] = round((time.monotonic() - started) * 1000)
+
+        # Parse
+        parsed = {}
+        if cached is not None:
+             parsed = cached['parsed']
+        elif not error_msg:
+             parsed = self._clean_and_parse_json(raw_content)
+             if cache_key:
+                 llm_cache.set(cache_key, raw_content, parsed, config=route.config)
+        else:
+             parsed = {'error': error_msg}
+        
+        # Log to DB if user provided
+        if user:
+            self._log_submission(user, user_text, prompt, raw_content, parsed, error_msg, intent, entity, telemetry)
+                
+        return parsed
+
+    def _log_submission(self, user, user_text, prompt, raw_content, parsed, error_msg='', intent=None, entity=None, telemetry=None):
+        logger.debug('Attempting to log submission for user %s', user.username)
+        try:
+            status = SubmissionLog.Status.FAILED if ('error' in parsed) else SubmissionLog.Status.PARSED
+            err = parsed.get('error', '') if isinstance(parsed, dict) else ''
+            if error_msg: err += f" | {error_msg}"
+            
+            log = SubmissionLog(
+                user=user,
+                status=status,
+                text_input=user_text,
+                prompt=prompt,
+                raw_response=raw_content,
+                error_message=err,
+                intent=intent or '',
+                entity=entity or '',
+                result_payload=parsed,
+                **(telemetry or {})
+            )
+            if self.log_sink is not None:
+                self.log_sink.append(log)
+            else:
+                log.save()
+                logger.debug('SubmissionLog created successfully')
+        except Exception:
+            logger.exception('Failed to save SubmissionLog')
+
+    @staticmethod
+    def is_confident(extraction):
+        """
+        本地规则抽取的置信度是否达到 AI_LOCAL_EXTRACT_MIN_CONFIDENCE (达到时解析方法不调用模型)
+        """
+        return extraction.confidence >= getattr(settings, 'AI_LOCAL_EXTRACT_MIN_CONFIDENCE', 0.8)
+
+    def _local_result(self, extraction, text, user=None, entity=None):
+        """
+        本地规则抽取置信度足够时直接返回字段 (不调用模型)，否则返回 None，见 local_extractor
+        """
+        if not self.is_confident(extraction):
+            return None
+        data = dict(extraction.fields)
+        if user:
+            raw = json.dumps({'confidence': extraction.confidence, 'fields': data}, ensure_ascii=False)
+            telemetry = llm_telemetry.build(None, SubmissionLog.CacheStatus.LOCAL, latency_ms=0)
+            self._log_submission(user, text, LOCAL_EXTRACTOR_PROMPT, raw, data, intent='create', entity=entity, telemetry=telemetry)
+        return data
+
+    def prefill(self, text, result):
+        """
+        为紧接着的一次解析预置模型结果 (仍执行后处理与日志记录)；result 为 None 时清除。
+        只对下一次输入为 text 的调用生效，批量解析按条目逐个设置，重复的文本互不影响
+        """
+        self._prefilled = (text, result) if result is not None else None
+
+    def _request_json(self, messages, user_text):
+        """
+        调用模型 (失败时转移到其他系统级配置，慢请求对冲，见 llm_router)，返回 llm_router.RouteResult
+        (含实际响应的配置，发生故障转移时不同于 self.config)
+        """
+        return llm_router.call(self.config, lambda config: self._request_provider(config, messages, user_text))
+
+    def _request_provider(self, config, messages, user_text):
+        """
+        调用指定配置的模型，返回 (原始返回文本, 错误信息, Token 用量)
+        """
         raw_content = ""
         error_msg = ""
+        usage = None
         
         try:
             # --- 1. Ollama Call ---
-            if self.config.provider == AIConfiguration.Provider.OLLAMA:
+            if config.provider == AIConfiguration.Provider.OLLAMA:
                 import requests
                 
-                # 获取配置的基础地址
-                base_url = self.config.base_url or 'http://localhost:11434'
-                
-                # 自动处理 Docker 内部访问宿主机的问题
-                # 如果在 Docker 中运行，localhost 会指向容器自身，需要换成 host.docker.internal
-                import os
-                is_docker = os.path.exists('/.dockerenv')
-                if is_docker:
-                    base_url = base_url.replace('localhost', 'host.docker.internal').replace('127.0.0.1', 'host.docker.internal')
-                
-                # 选择API路径：如果base_url包含/v1则使用openai兼容接口，否则使用Ollama原生接口
-                use_openai_compat = '/v1' in base_url
-                api_url = f"{base_url}/chat/completions" if use_openai_compat else f"{base_url}/api/chat"
+                # 复用连接池客户端 (Docker 地址修正与 API 路径选择见 llm_clients.OllamaClient)
+                client = llm_clients.get_client(config)
+                use_openai_compat = client.use_openai_compat
+                api_url = client.api_url
                 
-                headers = {"Content-Type": "application/json"}
                 # 两种接口负载格式
                 if use_openai_compat:
                     payload = {
-                        "model": self.config.model_name,
+                        "model": config.model_name,
                         "messages": messages,
-                        "temperature": 0.1,
+                        "temperature": self.TEMPERATURE,
                         "stream": False,
                         "format": "json"
                     }
                 else:
                     payload = {
-                        "model": self.config.model_name,
+                        "model": config.model_name,
                         "messages": messages,
-                        "options": {"temperature": 0.1},
+                        "options": {"temperature": self.TEMPERATURE},
                         "stream": False,
                         "format": "json"
                     }
                 
-                print(f"DEBUG: Calling Ollama at {api_url} with model {self.config.model_name}")
+                print(f"DEBUG: Calling Ollama at {api_url} with model {config.model_name}")
                 
                 try:
-                    response = requests.post(api_url, json=payload, headers=headers, timeout=60)
+                    response = client.post(payload)
                     response.raise_for_status()
                     result = response.json()
+                    usage = llm_telemetry.usage_from_ollama(result)
                     # 解析两种返回结构
                     if use_openai_compat:
                         raw_content = result['choices'][0]['message']['content']
@@ -103,29 +250,27 @@ class AIService:
                 except requests.exceptions.ConnectionError:
                     error_msg = f"无法连接到 AI 服务 ({api_url})。请确认 Ollama 是否正在运行。如果在 Docker 中运行，请确保配置了 host.docker.internal。"
                     print(f"LLM Connection Error: {error_msg}")
-                    return {'error': error_msg}
                 except Exception as e:
                     error_msg = f"AI 服务调用出错: {str(e)}"
                     print(f"LLM Error: {error_msg}")
-                    return {'error': error_msg}
 
             # --- 2. OpenAI-Compatible Call (DeepSeek, Moonshot, OpenAI) ---
             else:
-                import openai
-                if not self.config.api_key and not self.config.base_url:
+                if not config.api_key and not config.base_url:
                     error_msg = 'API credentials missing for selected provider'
                 else:
-                    client = openai.OpenAI(api_key=self.config.api_key, base_url=self.config.base_url)
+                    client = llm_clients.get_client(config)
                     
                     try:
-                        print(f"DEBUG: Calling OpenAI-compatible API at {self.config.base_url} model={self.config.model_name}")
+                        print(f"DEBUG: Calling OpenAI-compatible API at {config.base_url} model={config.model_name}")
                         completion = client.chat.completions.create(
-                            model=self.config.model_name,
+                            model=config.model_name,
                             messages=messages,
-                            temperature=0.1,
+                            temperature=self.TEMPERATURE,
                             response_format={"type": "json_object"}  # Attempt strict JSON
                         )
                         raw_content = completion.choices[0].message.content
+                        usage = llm_telemetry.usage_from_openai(completion)
                         
                         # Check if it looks like JSON
                         if not raw_content.strip().startswith('{') and not raw_content.strip().startswith('```'):
@@ -135,12 +280,13 @@ class AIService:
                                 {"role": "user", "content": user_text}
                             ]
                             completion2 = client.chat.completions.create(
-                                model=self.config.model_name,
+                                model=config.model_name,
                                 messages=strict_messages,
                                 temperature=0.0,
                                 response_format={"type": "json_object"}
                             )
                             raw_content = completion2.choices[0].message.content
+                            usage = llm_telemetry.usage_from_openai(completion, completion2)
                     except Exception as e:
                         print(f"LLM API Error: {e}")
                         error_msg = f"API Error: {str(e)}"
@@ -149,39 +295,7 @@ class AIService:
              print(f"Global LLM Error: {global_e}")
              error_msg = f"Global Error: {str(global_e)}"
 
-        # Parse
-        parsed = {}
-        if not error_msg:
-             parsed = self._clean_and_parse_json(raw_content)
-        else:
-             parsed = {'error': error_msg}
-        
-        # Log to DB if user provided
-        if user:
-            print(f"DEBUG: Attempting to log submission for user {user.username}")
-            try:
-                status = SubmissionLog.Status.FAILED if ('error' in parsed) else SubmissionLog.Status.PARSED
-                err = parsed.get('error', '') if isinstance(parsed, dict) else ''
-                if error_msg: err += f" | {error_msg}"
-                
-                SubmissionLog.objects.create(
-                    user=user,
-                    status=status,
-                    text_input=user_text,
-                    prompt=prompt,
-                    raw_response=raw_content,
-                    error_message=err,
-                    intent=intent or '',
-                    entity=entity or '',
-                    result_payload=parsed
-                )
-                print("DEBUG: SubmissionLog created successfully")
-            except Exception as log_e:
-                print(f"Failed to save SubmissionLog: {log_e}")
-                import traceback
-                traceback.print_exc()
-                
-        return parsed
+        return raw_content, error_msg, usage
 
     def _clean_and_parse_json(self, content):
         # --- Enhanced JSON Cleaning ---
@@ -247,110 +361,117 @@ class AIService:
         return None
 
     def find_user_id(self, name_str):
+        # 用户名 / 中文全名 / 名 / 拼音精确匹配，见 name_index
         if not name_str: return None
-        user = User.objects.filter(username=name_str).first()
-        if user: return user.id
-        for u in User.objects.all():
-            full_name = f"{u.last_name}{u.first_name}"
-            if full_name == name_str: return u.id
-            if u.first_name == name_str: return u.id
-        return None
+        return name_index.resolve(name_index.USER, name_str, name_index.STRICT)
 
     def find_customer_id(self, name_str):
         if not name_str: return None
-        customer = Customer.objects.filter(name__icontains=name_str).first()
-        if customer: return customer.id
-        return None
+        return name_index.resolve(name_index.CUSTOMER, name_str, name_index.LOOSE)
 
-    # --- Specific Parsing Functions ---
+    # --- Prompt builders (批量合并解析直接复用，见 ai_batch) ---
 
-    def parse_opportunity(self, text, user=None):
+    def opportunity_prompt(self):
+        prompt = self._get_prompt(PromptTemplate.Scene.OPPORTUNITY, self.OPPORTUNITY_PROMPT)
+        # 旧版模板缺少 customer_code 等字段时使用内置模板 (不再在读路径上改写模板表)
+        if 'customer_code' not in prompt:
+            prompt = self.OPPORTUNITY_PROMPT
+        return prompt + f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
+
+    def todo_prompt(self):
         default_prompt = """
-        You are a smart data extraction assistant.
-        Extract Sales Opportunity info from the user's text and return strictly valid JSON.
-        
-        Required JSON keys:
-        - name: Opportunity Name (Summarize "Customer + Product/Service", in Simplified Chinese).
-        - amount: Estimated amount (number only, e.g. 150000).
-        - customer_name: Customer company name (in Simplified Chinese).
-        - customer_code: Customer code (e.g. "CUST-001", "XM-002").
-        - customer_contact_name: Contact person name.
-        - customer_phone: Contact phone number.
-        - customer_email: Contact email.
-        - sales_manager_name: Sales person name (e.g. "付磊").
-        - project_manager_name: Project manager name (e.g. "张三").
-        - expected_sign_date: YYYY-MM-DD.
-        - stage: One of [CONTACT, REQ_ANALYSIS, INITIATION, BIDDING, DELIVERY, AFTER_SALES, COMPLETED].
-        - win_rate: Integer 0-100 (Probability).
-        - competitors: String, comma separated.
-        - source: String (e.g. "Old Customer", "Tender").
-        - product_line: String (e.g. "Network Range", "City Safety").
-        - customer_industry: String (e.g. "Education", "Finance").
-        - customer_region: String (e.g. "Beijing", "North China").
-        - description: A detailed summary of the opportunity background and needs.
-        
-        Infer defaults if missing:
-        - stage: 'CONTACT'
-        - amount: 0
-        - expected_sign_date: End of current month (YYYY-MM-DD)
+        Analyze the user's text and extract a Todo Task.
+        Output JSON keys:
+        - title: A short, concise summary (max 10 words).
+        - description: The full detailed description.
+        - deadline: YYYY-MM-DD HH:MM:SS (Calculate based on current date/time if relative terms like "tomorrow" are used).
+        - assignee_name: The name of the person assigned to this task (if mentioned).
+        """
+        prompt = self._get_prompt(PromptTemplate.Scene.TODO, default_prompt)
+        # 相对时间 ("两小时后") 依赖精确的当前时间，因此待办解析不使用响应缓存 (见 parse_todo_task)
+        return prompt + f"\nCurrent Date/Time: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
-        Example:
-        Input: "九号电动车商机，15万，销售员付磊"
-        Output: {"name": "九号电动车-商机", "amount": 150000, "customer_name": "九号电动车", "sales_manager_name": "付磊", "expected_sign_date": "2025-12-31", "stage": "CONTACT"}
+    def competition_prompt(self):
+        default_prompt = """
+        Extract Competition info.
+        Output JSON keys:
+        - name: Competition Name.
+        - time: Start Date (YYYY-MM-DD).
+        - location: Location.
+        - type: Type of competition.
+        - owner_name: Person in charge.
         """
-        template = PromptTemplate.objects.filter(scene=PromptTemplate.Scene.OPPORTUNITY, is_active=True).order_by('-updated_at').first()
-        if template:
-            if 'customer_code' not in template.template:
-                template.template = default_prompt
-                template.save()
-            prompt = template.template
-        else:
-            PromptTemplate.objects.create(
-                name="Standard Opportunity Prompt V2",
-                scene=PromptTemplate.Scene.OPPORTUNITY,
-                template=default_prompt,
-                is_active=True
-            )
-            prompt = default_prompt
+        prompt = self._get_prompt(PromptTemplate.Scene.COMPETITION, default_prompt)
+        return prompt + f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
 
-        prompt += f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
-        
-        data = self._call_llm_json(prompt, text, user=user, intent='create', entity='opportunity')
+    def market_activity_prompt(self):
+        default_prompt = """
+        Extract Market Activity info.
+        Output JSON keys:
+        - name: Activity Name.
+        - time: Date (YYYY-MM-DD).
+        - location: Location.
+        - type: Type (e.g. Salon, Exhibition).
+        """
+        prompt = self._get_prompt(PromptTemplate.Scene.MARKET, default_prompt)
+        return prompt + f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
+
+    def customer_prompt(self):
+        default_prompt = """
+        Extract Customer Company info.
+        Output JSON keys:
+        - name: Company Name.
+        - industry: Industry.
+        - scale: One of [SMALL, MEDIUM, LARGE, ENTERPRISE, GOV].
+        - legal_representative: Legal Rep Name.
+        - website: URL.
+        - region: Region or City (e.g. "Beijing", "Shenyang").
+        - address: Full address if available.
+        - contact_name: Key contact person name.
+        - contact_title: Key contact person title.
+        """
+        return self._get_prompt(PromptTemplate.Scene.CUSTOMER, default_prompt)
+
+    def contact_prompt(self):
+        return """
+        Extract Contact Person info.
+        Output JSON keys:
+        - name: Name.
+        - title: Job Title.
+        - phone: Phone Number.
+        - email: Email.
+        - customer_name: Company Name they belong to.
+        """
+
+    # --- Specific Parsing Functions ---
+
+    def parse_opportunity(self, text, user=None):
+        prompt = self.opportunity_prompt()
+
+        # 模板化输入由本地规则直接抽取，其余交给模型
+        local = local_extractor.extract_opportunity(text)
+        data = self._local_result(local, text, user=user, entity='opportunity')
+        if data is not None:
+            data.setdefault('name', f"{data['customer_name']}-商机")
+            data.setdefault('description', text)
+        else:
+            data = self._call_llm_json(prompt, text, user=user, intent='create', entity='opportunity')
         
         if not data or ('error' in data):
             # Local fallback extraction
             t = text or ''
-            import re
-            cust = None
-            m = re.search(r'客户名称[:：]\s*([^\s，,。;；]+)', t) or re.search(r'新增(?:一个|一条|一项)?([^\s，,。;；]{2,40})的商机', t) or re.search(r'([^\s，,。;；]{2,40})商机', t)
-            if m: cust = m.group(1).strip()
-            amt = 0
-            m_amt = re.search(r'(预算|金额)\s*([0-9]+(?:\.[0-9]+)?)\s*(千|万|百万|亿)?', t)
-            if m_amt:
-                num = float(m_amt.group(2)); unit = (m_amt.group(3) or '')
-                unit_map = {'千': 1_000, '万': 10_000, '百万': 1_000_000, '亿': 100_000_000}
-                amt = int(num * unit_map.get(unit, 1))
-            exp = None
-            m_q = re.search(r'明年?\s*Q([1-4])', t, re.IGNORECASE) or re.search(r'Q([1-4])', t, re.IGNORECASE)
-            if m_q:
-                q = int(m_q.group(1)); now = timezone.now()
-                year = now.year + (1 if '明年' in t else 0)
-                middle_month = {1:2,2:5,3:8,4:11}[q]
-                exp = f"{year}-{middle_month:02d}-15"
-            stage = 'CONTACT'
-            if '演示' in t: stage = 'DEMO'
-            elif '方案' in t: stage = 'PROPOSAL'
-            elif '谈判' in t: stage = 'NEGOTIATION'
-            elif '临门' in t or '签约' in t: stage = 'CLOSING'
-            reg = None
-            m_reg = re.search(r'区域[:：]\s*([^\s，,]+)', t)
-            if m_reg: reg = m_reg.group(1).strip()
-            else:
-                m_loc = re.search(r'在([^\s，,]{1,10})', t)
-                if m_loc: reg = m_loc.group(1).strip()
-            sales_name = None
-            m_sales = re.search(r'销售([^\s，,]{2,10})', t)
-            if m_sales: sales_name = m_sales.group(1).strip()
+            fields = local.fields
+            cust = fields.get('customer_name')
+            amt = fields.get('amount', 0)
+            exp = fields.get('expected_sign_date')
+            stage = fields.get('stage') or 'CONTACT'
+            if 'stage' not in fields:
+                if '演示' in t: stage = 'DEMO'
+                elif '方案' in t: stage = 'PROPOSAL'
+                elif '谈判' in t: stage = 'NEGOTIATION'
+                elif '临门' in t or '签约' in t: stage = 'CLOSING'
+            reg = fields.get('customer_region')
+            sales_name = fields.get('sales_manager_name')
             sales_manager_id = self.find_user_id(sales_name)
             customer_id = self.find_customer_id(cust)
             name = f"{cust}-咨询比赛与演武场" if cust else "咨询比赛与演武场"
@@ -397,18 +518,9 @@ class AIService:
         }
 
     def parse_todo_task(self, text, user=None):
-        default_prompt = """
-        Analyze the user's text and extract a Todo Task.
-        Output JSON keys:
-        - title: A short, concise summary (max 10 words).
-        - description: The full detailed description.
-        - deadline: YYYY-MM-DD HH:MM:SS (Calculate based on current date/time if relative terms like "tomorrow" are used).
-        - assignee_name: The name of the person assigned to this task (if mentioned).
-        """
-        prompt = self._get_prompt(PromptTemplate.Scene.TODO, default_prompt)
-        prompt += f"\nCurrent Date/Time: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        data = self._call_llm_json(prompt, text, user=user, intent='create', entity='todo')
+        prompt = self.todo_prompt()
+
+        data = self._call_llm_json(prompt, text, user=user, intent='create', entity='todo', use_cache=False)
         if not data: return {'error': 'AI returned no data'}
         if 'error' in data: return data
         
@@ -594,18 +706,8 @@ class AIService:
         return data
 
     def parse_competition(self, text, user=None):
-        default_prompt = """
-        Extract Competition info.
-        Output JSON keys:
-        - name: Competition Name.
-        - time: Start Date (YYYY-MM-DD).
-        - location: Location.
-        - type: Type of competition.
-        - owner_name: Person in charge.
-        """
-        prompt = self._get_prompt(PromptTemplate.Scene.COMPETITION, default_prompt)
-        prompt += f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
-        
+        prompt = self.competition_prompt()
+
         data = self._call_llm_json(prompt, text, user=user, intent='create', entity='competition')
         if not data or ('error' in data):
             # Local fallback
@@ -638,17 +740,8 @@ class AIService:
         return data
         
     def parse_market_activity(self, text, user=None):
-        default_prompt = """
-        Extract Market Activity info.
-        Output JSON keys:
-        - name: Activity Name.
-        - time: Date (YYYY-MM-DD).
-        - location: Location.
-        - type: Type (e.g. Salon, Exhibition).
-        """
-        prompt = self._get_prompt(PromptTemplate.Scene.MARKET, default_prompt)
-        prompt += f"\nCurrent Date: {timezone.now().strftime('%Y-%m-%d')}"
-        
+        prompt = self.market_activity_prompt()
+
         data = self._call_llm_json(prompt, text, user=user, intent='create', entity='activity')
         if not data or ('error' in data):
             import re, datetime
@@ -681,49 +774,29 @@ class AIService:
         if not self.config:
              return "Error: No active AI configuration found."
              
-        messages = [
-            {"role": "system", "content": prompt},
-        ]
-        
-        # Append history if provided (simple concatenation for context)
-        if history and isinstance(history, list):
-            for h in history:
-                role = h.get('role', 'user')
-                content = h.get('content', '')
-                if content:
-                    messages.append({"role": role, "content": content})
-                    
-        messages.append({"role": "user", "content": user_text})
+        messages = self._chat_messages(prompt, user_text, history)
         
         try:
             if self.config.provider == AIConfiguration.Provider.OLLAMA:
-                import requests
-                base_url = self.config.base_url or 'http://localhost:11434'
-                
-                # Docker fix
-                import os
-                if os.path.exists('/.dockerenv'):
-                     base_url = base_url.replace('localhost', 'host.docker.internal').replace('127.0.1', 'host.docker.internal').replace('127.0.0.1', 'host.docker.internal')
-                
-                use_openai_compat = '/v1' in base_url
-                api_url = f"{base_url}/chat/completions" if use_openai_compat else f"{base_url}/api/chat"
+                client = llm_clients.get_client(self.config)
+                use_openai_compat = client.use_openai_compat
                 
                 if use_openai_compat:
                     payload = {
                         "model": self.config.model_name,
                         "messages": messages,
-                        "temperature": 0.3,
+                        "temperature": self.CHAT_TEMPERATURE,
                         "stream": False
                     }
                 else:
                     payload = {
                         "model": self.config.model_name,
                         "messages": messages,
-                        "options": {"temperature": 0.3},
+                        "options": {"temperature": self.CHAT_TEMPERATURE},
                         "stream": False
                     }
                 
-                resp = requests.post(api_url, json=payload, timeout=60)
+                resp = client.post(payload)
                 resp.raise_for_status()
                 data = resp.json()
                 
@@ -734,17 +807,112 @@ class AIService:
                     
             else:
                 # OpenAI Compatible
-                import openai
-                client = openai.OpenAI(api_key=self.config.api_key, base_url=self.config.base_url)
+                client = llm_clients.get_client(self.config)
                 completion = client.chat.completions.create(
                     model=self.config.model_name,
                     messages=messages,
-                    temperature=0.3
+                    temperature=self.CHAT_TEMPERATURE
                 )
                 return completion.choices[0].message.content
         except Exception as e:
             return f"Error calling LLM: {str(e)}"
 
+    def _chat_messages(self, prompt, user_text, history=None):
+        messages = [
+            {"role": "system", "content": prompt},
+        ]
+        
+        # Append history if provided (simple concatenation for context)
+        if history and isinstance(history, list):
+            for h in history:
+                role = h.get('role', 'user')
+                content = h.get('content', '')
+                if content:
+                    messages.append({"role": role, "content": content})
+                    
+        messages.append({"role": "user", "content": user_text})
+        return messages
+
+    def stream_chat(self, prompt, user_text, history=None):
+        """
+        流式对话：逐段产出模型返回的文本增量
+        - OpenAI 兼容接口：stream=True
+        - Ollama 原生 /api/chat：按行返回 JSON (done=true 结束)；/v1 兼容接口按 SSE `data:` 行返回
+        首个文本块到达耗时 (TTFT) 与总耗时记录到日志
+        """
+        if not self.config:
+            raise ValueError("No active AI configuration found.")
+
+        messages = self._chat_messages(prompt, user_text, history)
+        started = time.monotonic()
+        first_token_at = None
+        chunks = 0
+        try:
+            for delta in self._stream_deltas(messages):
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    logger.info(
+                        'LLM stream TTFT %.0fms (config=%s model=%s)',
+                        (first_token_at - started) * 1000, self.config.pk, self.config.model_name,
+                    )
+                chunks += 1
+                yield delta
+        finally:
+            logger.info(
+                'LLM stream finished in %.0fms, %d chunks (config=%s model=%s)',
+                (time.monotonic() - started) * 1000, chunks, self.config.pk, self.config.model_name,
+            )
+
+    def _stream_deltas(self, messages):
+        client = llm_clients.get_client(self.config)
+        if self.config.provider != AIConfiguration.Provider.OLLAMA:
+            stream = client.chat.completions.create(
+                model=self.config.model_name,
+                messages=messages,
+                temperature=self.CHAT_TEMPERATURE,
+                stream=True,
+            )
+            try:
+                for chunk in stream:
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content or ''
+            finally:
+                stream.close()
+            return
+
+        payload = {
+            "model": self.config.model_name,
+            "messages": messages,
+            "stream": True,
+        }
+        if client.use_openai_compat:
+            payload["temperature"] = self.CHAT_TEMPERATURE
+        else:
+            payload["options"] = {"temperature": self.CHAT_TEMPERATURE}
+
+        with client.post(payload, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                if client.use_openai_compat:
+                    if not line.startswith('data:'):
+                        continue
+                    line = line[5:].strip()
+                    if line == '[DONE]':
+                        break
+                    choices = json.loads(line).get('choices') or [{}]
+                    yield (choices[0].get('delta') or {}).get('content') or ''
+                else:
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise RuntimeError(data['error'])
+                    yield (data.get('message') or {}).get('content') or ''
+                    if data.get('done'):
+                        break
+
     def parse_task(self, text, user=None):
         """
         Analyze the user's intent from the text.
@@ -788,56 +956,20 @@ class AIService:
         return data
 
     def parse_customer(self, text, user=None):
-        default_prompt = """
-        Extract Customer Company info.
-        Output JSON keys:
-        - name: Company Name.
-        - industry: Industry.
-        - scale: One of [SMALL, MEDIUM, LARGE, ENTERPRISE, GOV].
-        - legal_representative: Legal Rep Name.
-        - website: URL.
-        - region: Region or City (e.g. "Beijing", "Shenyang").
-        - address: Full address if available.
-        - contact_name: Key contact person name.
-        - contact_title: Key contact person title.
-        """
-        prompt = self._get_prompt(PromptTemplate.Scene.CUSTOMER, default_prompt)
+        prompt = self.customer_prompt()
+        local = local_extractor.extract_customer(text)
+        data = self._local_result(local, text, user=user, entity='customer')
+        if data is not None:
+            return data
         data = self._call_llm_json(prompt, text, user=user, intent='create', entity='customer')
         if not data or ('error' in data):
-            import re
-            t = text or ''
-            name = None
-            # 增强的正则匹配：支持 "客户名称: XX" 或 "新建客户 XX" 或 "创建客户 XX" 或 "创建一个客户 XX"
-            m_name = re.search(r'客户名称[:：]\s*([^\s，,。;；]+)', t) or \
-                     re.search(r'(?:新建|创建)(?:一个|一项)?客户[，, ]\s*([^\s，,。;；]{2,40})', t) or \
-                     re.search(r'客户[，, ]\s*([^\s，,。;；]{2,40})', t)
-            
-            if m_name: name = m_name.group(1).strip()
-            
-            ind = None
-            m_ind = re.search(r'行业[:：]\s*([^\s，,。;；]+)', t) or re.search(r'([^\s，,。;；]+)行业', t)
-            if m_ind: ind = m_ind.group(1).strip()
-            
-            reg = None
-            m_reg = re.search(r'(?:区域|地点)[:：]\s*([^\s，,。;；]+)', t) or \
-                    re.search(r'在([^\s，,。;；]{1,10})', t) or \
-                    re.search(r'地点\s*([^\s，,。;；]{1,10})', t)
-            if m_reg: reg = m_reg.group(1).strip()
-            
-            fallback = {'name': name, 'industry': ind, 'region': reg, 'status': 'POTENTIAL'}
+            fields = local.fields
+            fallback = {'name': fields.get('name'), 'industry': fields.get('industry'), 'region': fields.get('region'), 'status': 'POTENTIAL'}
             if data and 'error' in data: fallback['error'] = data['error']
             return fallback
         return data
         
     def parse_contact(self, text, user=None):
-        prompt = """
-        Extract Contact Person info.
-        Output JSON keys:
-        - name: Name.
-        - title: Job Title.
-        - phone: Phone Number.
-        - email: Email.
-        - customer_name: Company Name they belong to.
-        """
+        prompt = self.contact_prompt()
         data = self._call_llm_json(prompt, text, user=user, intent='create', entity='contact')
         return data
@@ -0,0 +1,232 @@
+"""
+后台任务 (数据库实现，无需外部消息中间件)
+
+用于把耗时写入 (如全员通知下发、数据恢复) 移出请求线程，请求立即返回任务 ID：
+- submit 把任务 (执行函数的导入路径与 JSON 参数) 写入 BackgroundJob，由 run_background_worker 管理命令
+  领取执行；状态与进度保存在数据库，任一 gunicorn worker 都能通过 /api/jobs/<id>/ 查到
+- 领取采用条件 UPDATE (PENDING -> RUNNING)；执行中定期刷新 updated_at (心跳)，执行进程退出 (重启、部署)
+  超过 BACKGROUND_JOB_TIMEOUT 秒后任务放回队列重新执行，超过 max_attempts 标记失败
+- track 登记在请求内执行的长任务 (如流式备份导出)，只记录进度
+- 任务函数在事务中上报进度时 (如数据恢复)，进度由单独的线程 (独立数据库连接) 写入，查询方立即可见 (SQLite 除外)
+- BACKGROUND_JOBS_EAGER=True 时 submit 在当前线程同步执行 (测试使用)
+"""
+import importlib
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# 有独立列的字段，其余进度信息 (如当前导出的模型) 保存在 extra 中
+COLUMNS = {'status', 'done', 'total', 'result', 'error', 'started_at', 'finished_at'}
+DATETIME_COLUMNS = {'started_at', 'finished_at'}
+
+_writer = None
+_writer_lock = threading.Lock()
+_local = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='background-progress')
+        return _writer
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def as_dict(job):
+    return {
+        **job.extra,
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'done': job.done,
+        'total': job.total,
+        'result': job.result,
+        'error': job.error or None,
+        'user_id': job.user_id,
+        'attempts': job.attempts,
+        'created_at': _iso(job.created_at),
+        'started_at': _iso(job.started_at),
+        'finished_at': _iso(job.finished_at),
+    }
+
+
+def get_job(job_id):
+    job = BackgroundJob.objects.filter(pk=job_id).first()
+    return as_dict(job) if job else None
+
+
+def _write(job_id, fields):
+    columns, extra = {}, {}
+    for name, value in fields.items():
+        if name in DATETIME_COLUMNS and isinstance(value, str):
+            value = parse_datetime(value)
+        if name in COLUMNS:
+            columns[name] = '' if name == 'error' and value is None else value
+        else:
+            extra[name] = value
+    if extra:
+        current = BackgroundJob.objects.filter(pk=job_id).values_list('extra', flat=True).first() or {}
+        columns['extra'] = {**current, **extra}
+    BackgroundJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **columns)
+
+
+def _write_in_writer(job_id, fields):
+    try:
+        _write(job_id, fields)
+    finally:
+        connections.close_all()
+
+
+def _update(job_id, **fields):
+    if (connection.in_atomic_block and connection.vendor != 'sqlite'
+            and not _setting('BACKGROUND_JOBS_EAGER', False)):
+        # 调用方在事务中 (如数据恢复)：在当前连接写入的进度要等事务提交后才可见，回滚时还会丢失；
+        # SQLite 同一时刻只允许一个写连接，只能在当前连接写入
+        _get_writer().submit(_write_in_writer, job_id, fields).result()
+    else:
+        _write(job_id, fields)
+
+
+def set_progress(done, total=None):
+    """
+    在任务函数内上报进度；非后台任务中调用时忽略
+    """
+    job_id = getattr(_local, 'job_id', None)
+    if not job_id:
+        return
+    fields = {'done': done}
+    if total is not None:
+        fields['total'] = total
+    _update(job_id, **fields)
+
+
+def _create(name, user, status, func=None, args=(), kwargs=None):
+    job = BackgroundJob.objects.create(
+        id=uuid.uuid4().hex, name=name, status=status,
+        func=f"{func.__module__}.{func.__qualname__}" if func else '',
+        args=list(args), kwargs=kwargs or {},
+        user=user if getattr(user, 'pk', None) else None,
+        max_attempts=_setting('BACKGROUND_JOB_MAX_ATTEMPTS', 3),
+    )
+    return job
+
+
+def track(name, user=None):
+    """
+    登记在当前线程中执行的长任务 (如流式导出)，返回任务 ID；由调用方通过 update() 上报进度与结果
+    """
+    job = _create(name, user, BackgroundJob.Status.RUNNING)
+    _update(job.pk, started_at=timezone.now())
+    return job.pk
+
+
+def update(job_id, **fields):
+    _update(job_id, **fields)
+
+
+def submit(name, func, *args, user=None, **kwargs):
+    """
+    提交后台任务，返回任务 ID；func 须为模块级函数，参数须可序列化为 JSON
+    """
+    job = _create(name, user, BackgroundJob.Status.PENDING, func, args, kwargs)
+    if _setting('BACKGROUND_JOBS_EAGER', False):
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status=BackgroundJob.Status.RUNNING, attempts=1, started_at=timezone.now(),
+        )
+        job.refresh_from_db()
+        run_job(job)
+    return job.pk
+
+
+def _resolve(path):
+    module, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(module), name)
+
+
+def requeue_stale(now=None):
+    """
+    执行进程退出后遗留的 RUNNING 任务 (心跳超时)：未超过最大尝试次数的放回队列，其余 (含请求内任务) 标记失败
+    """
+    now = now or timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status=BackgroundJob.Status.RUNNING,
+        updated_at__lt=now - timedelta(seconds=_setting('BACKGROUND_JOB_TIMEOUT', 600)),
+    )
+    failed = stale.filter(Q(func='') | Q(attempts__gte=F('max_attempts')))
+    count = failed.update(status=BackgroundJob.Status.FAILED, error='执行进程已退出', finished_at=now)
+    return count + stale.update(status=BackgroundJob.Status.PENDING, locked_by='')
+
+
+def claim(limit, worker=None):
+    """
+    领取最多 limit 个等待中的任务，返回已领取的任务列表
+    """
+    candidates = list(
+        BackgroundJob.objects.filter(status=BackgroundJob.Status.PENDING).exclude(func='')
+        .order_by('created_at').values_list('pk', flat=True)[:limit]
+    )
+    worker = worker or worker_id()
+    now = timezone.now()
+    claimed = []
+    for job_id in candidates:
+        if BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.Status.PENDING).update(
+            status=BackgroundJob.Status.RUNNING, locked_by=worker, started_at=now, updated_at=now,
+            attempts=F('attempts') + 1,
+        ):
+            claimed.append(job_id)
+    return list(BackgroundJob.objects.filter(pk__in=claimed).order_by('created_at'))
+
+
+def _heartbeat(job_id, stop):
+    interval = _setting('BACKGROUND_JOB_HEARTBEAT', 60)
+    try:
+        while not stop.wait(interval):
+            BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.Status.RUNNING).update(updated_at=timezone.now())
+    finally:
+        connections.close_all()
+
+
+def run_job(job):
+    """
+    执行单个已领取的任务
+    """
+    stop = threading.Event()
+    if not _setting('BACKGROUND_JOBS_EAGER', False):
+        threading.Thread(target=_heartbeat, args=(job.pk, stop), daemon=True, name='background-heartbeat').start()
+    _local.job_id = job.pk
+    try:
+        result = _resolve(job.func)(*job.args, **job.kwargs)
+        _update(job.pk, status=BackgroundJob.Status.SUCCESS, result=result, finished_at=timezone.now())
+    except Exception as e:
+        logger.exception('后台任务执行失败: %s', job.pk)
+        _update(job.pk, status=BackgroundJob.Status.FAILED, error=str(e), finished_at=timezone.now())
+    finally:
+        stop.set()
+        _local.job_id = None
+    return job
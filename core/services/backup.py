@@ -0,0 +1,335 @@
+"""
+数据备份 (进程内流式导出)
+
+原先备份通过子进程执行 `manage.py dumpdata --indent 2`：再启动一个解释器重新加载 Django，
+在内存中拼出完整 JSON 写入 /tmp 后才开始下载，数据量增长后容易超出容器内存限制。这里：
+- 按依赖顺序 (与 dumpdata 相同的 sort_dependencies) 逐个模型按主键每 BACKUP_CHUNK_SIZE 条分页读取，
+  每批序列化后立即写入响应，内存占用与数据量无关
+- 输出格式：jsonl (每行一条记录) 或 json.gz (gzip 压缩的 JSON 数组)，全量备份可直接用 loaddata 导入
+- 导出进度 (已导出记录数 / 总数、当前模型) 登记为后台任务 (background.track)，可通过 /api/jobs/<id>/ 查询
+- 增量备份：每次导出在 BackupRecord 中记录各模型水位 (导出开始时间)。增量导出时含 updated_at 的模型
+  (以及只追加的日志表，按 created_at) 只导出上次水位之后变更的记录 (向前多取 BACKUP_WATERMARK_OVERLAP 秒，
+  覆盖导出时尚未提交的事务)，其余模型仍全量导出；软删除随 updated_at 变更导出，物理删除根据删除日志表
+  生成删除标记 {"model": ..., "pk": ..., "deleted": true}。没有删除日志的模型 (以及级联删除) 由主键清单还原：
+  增量文件末尾按模型列出导出时仍存在的全部主键 {"model": ..., "live_pks": [...], "after": ..., "until": ...}
+  (按主键区间分段)，恢复时删除区间内不在清单中的记录。增量文件首行为 {"model": "backup.meta", ...}，
+  记录本次与上一次备份的 ID；全量备份为保持 loaddata 兼容不写元信息，备份 ID 记录在文件名中
+  (db_backup_full_<ID>_...)，供 restore_backup 校验备份链的第一个增量
+- 用 QuerySet.update() 修改含 updated_at 的模型时需要同时设置 updated_at=timezone.now()，否则增量备份漏掉该修改
+"""
+import datetime
+import json
+import logging
+import os
+import re
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.utils import timezone
+
+from core.models import BackupRecord
+from core.services import background
+
+logger = logging.getLogger(__name__)
+
+# 与原 dumpdata 命令的 --exclude 参数一致：系统表在导入时容易冲突，日志表较大且不重要
+EXCLUDE = {
+    'contenttypes',
+    'auth.permission',
+    'admin.logentry',
+    'sessions.session',
+    'core.submissionlog',
+    'core.activitylog',
+    'core.backuprecord',
+    'core.backgroundjob',
+}
+
+META_MODEL = 'backup.meta'
+# 只追加、不修改的日志表：增量导出按 created_at 判断
+APPEND_ONLY = {
+    'core.opportunitylog': 'created_at',
+    'core.projectchangelog': 'created_at',
+}
+# 删除日志表 -> (被删除的模型, 从 original_data 中取主键)
+DELETE_LOGS = {
+    'core.contactdeletelog': ('core.contact', lambda data: data.get('id')),
+}
+
+JSONL = 'jsonl'
+JSON_GZ = 'json.gz'
+FORMATS = {
+    JSONL: 'application/x-ndjson',
+    JSON_GZ: 'application/gzip',
+}
+DEFAULT_FORMAT = JSON_GZ
+
+FLUSH_BYTES = 256 * 1024
+# filename() 生成的文件名：db_backup_<类型>_<备份ID>_<时间>.<格式>
+_FILENAME_ID = re.compile(r'_(full|incremental)_(\d+)_')
+# 每导出多少条记录更新一次进度
+PROGRESS_EVERY = 5000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backup_models(exclude=EXCLUDE):
+    """
+    需要备份的模型，按外键依赖排序 (被引用的模型在前)
+    """
+    app_list = {}
+    for app_config in apps.get_app_configs():
+        if app_config.label in exclude:
+            continue
+        models = [
+            model for model in app_config.get_models()
+            if model._meta.label_lower not in exclude
+            and not model._meta.proxy
+            and router.allow_migrate_model('default', model)
+        ]
+        if models:
+            app_list[app_config] = models
+    return serializers.sort_dependencies(app_list.items(), allow_cycles=True)
+
+
+def watermark_field(model):
+    """
+    增量导出依据的时间字段；返回 None 表示该模型每次全量导出
+    """
+    if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        return 'updated_at'
+    return APPEND_ONLY.get(model._meta.label_lower)
+
+
+def _since(watermarks):
+    """
+    上次备份水位 {模型: ISO 时间} -> {模型: datetime} (已减去重叠时间)
+    """
+    overlap = datetime.timedelta(seconds=_setting('BACKUP_WATERMARK_OVERLAP', 300))
+    return {label: datetime.datetime.fromisoformat(value) - overlap for label, value in (watermarks or {}).items()}
+
+
+def _queryset(model, since=None):
+    qs = model._base_manager.order_by(model._meta.pk.name)
+    field = watermark_field(model)
+    if since and field and model._meta.label_lower in since:
+        qs = qs.filter(**{f"{field}__gte": since[model._meta.label_lower]})
+    m2m = [f.name for f in model._meta.many_to_many if f.remote_field.through._meta.auto_created]
+    if m2m:
+        qs = qs.prefetch_related(*m2m)
+    return qs
+
+
+def iter_records(models, on_progress=None, since=None):
+    """
+    逐条产出 loaddata 格式的记录 {"model": ..., "pk": ..., "fields": {...}}；since 不为空时只导出水位之后的变更
+    """
+    chunk_size = _setting('BACKUP_CHUNK_SIZE', 2000)
+    serializer = serializers.get_serializer('python')()
+    for model in models:
+        for batch in _batches(_queryset(model, since), chunk_size):
+            yield from serializer.serialize(batch)
+            if on_progress:
+                on_progress(model, len(batch))
+
+
+def _batches(queryset, chunk_size):
+    """
+    按主键分页读取 (queryset 已按主键排序)；数据库配置了 DISABLE_SERVER_SIDE_CURSORS，
+    PostgreSQL 上 .iterator() 会一次取回全部结果，无法控制内存
+    """
+    page = queryset
+    while True:
+        batch = list(page[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        page = queryset.filter(pk__gt=batch[-1].pk)
+
+
+def _jsonl(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _json_array(records):
+    yield '['
+    first = True
+    for record in records:
+        yield ('\n' if first else ',\n') + json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+        first = False
+    yield '\n]\n'
+
+
+def _buffered(pieces, compress=False):
+    """
+    合并为约 FLUSH_BYTES 大小的字节块；compress=True 时输出 gzip 流
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer, size = [], 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def iter_tombstones(since):
+    """
+    根据删除日志生成水位之后被物理删除的记录的删除标记 (已被恢复、重新存在的记录除外)
+    """
+    for log_label, (target_label, get_pk) in DELETE_LOGS.items():
+        if target_label not in since:
+            continue
+        log_model, target = apps.get_model(log_label), apps.get_model(target_label)
+        logs = log_model._base_manager.filter(deleted_at__gte=since[target_label]).order_by('pk').values_list('original_data', 'pk')
+        pks = {get_pk(data or {}) for data, _ in _value_batches(logs, _setting('BACKUP_CHUNK_SIZE', 2000))} - {None}
+        pks -= set(target._base_manager.filter(pk__in=pks).values_list('pk', flat=True))
+        for pk in sorted(pks):
+            yield {'model': target_label, 'pk': pk, 'deleted': True}
+
+
+def _value_batches(rows, chunk_size):
+    """
+    与 _batches 相同的主键分页，用于 values_list (最后一列为主键)
+    """
+    page = rows
+    while True:
+        batch = list(page[:chunk_size])
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        page = rows.filter(pk__gt=batch[-1][-1])
+
+
+def iter_manifests(models):
+    """
+    各模型当前全部主键的清单，按主键区间 (after, until] 分段 (until 为 None 表示到末尾)；
+    按依赖逆序输出，恢复时先删除引用方，避免 PROTECT 外键阻止删除
+    """
+    chunk_size = _setting('BACKUP_CHUNK_SIZE', 2000)
+    for model in reversed(models):
+        pks = model._base_manager.order_by('pk').values_list('pk', flat=True)
+        after = None
+        while True:
+            batch = list((pks if after is None else pks.filter(pk__gt=after))[:chunk_size])
+            final = len(batch) < chunk_size
+            yield {'model': model._meta.label_lower, 'live_pks': batch, 'after': after, 'until': None if final else batch[-1]}
+            if final:
+                break
+            after = batch[-1]
+
+
+def record_id(path):
+    """
+    从 filename() 生成的文件名中取 (类型, 备份 ID)；文件被改名时返回 (None, None)
+    """
+    match = _FILENAME_ID.search(os.path.basename(path))
+    if not match:
+        return None, None
+    return match.group(1).upper(), int(match.group(2))
+
+
+def start(kind, user=None):
+    """
+    登记一次备份；增量备份以最近一次成功的备份为基准，没有时返回 None
+    """
+    parent = BackupRecord.objects.filter(status=BackupRecord.Status.SUCCESS).first()
+    if kind == BackupRecord.Kind.INCREMENTAL and parent is None:
+        return None
+    return BackupRecord.objects.create(
+        kind=kind, parent=parent if kind == BackupRecord.Kind.INCREMENTAL else None,
+        created_by=user if getattr(user, 'pk', None) else None,
+    )
+
+
+def filename(fmt, prefix='db_backup', record=None):
+    if record is not None:
+        prefix = f"{prefix}_{record.kind.lower()}_{record.pk}"
+    return f"{prefix}_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def stream(fmt=DEFAULT_FORMAT, job_id=None, models=None, record=None):
+    """
+    生成备份文件内容 (字节块)；job_id 不为空时上报进度，record (BackupRecord) 不为空时记录水位，
+    record 为增量备份时只导出上一次备份之后的变更
+    """
+    models = backup_models() if models is None else models
+    incremental = record is not None and record.kind == BackupRecord.Kind.INCREMENTAL
+    since = _since(record.parent.watermarks) if incremental else None
+    state = {'done': 0, 'reported': 0, 'tombstones': 0}
+    if job_id:
+        total = sum(_queryset(model, since).count() for model in models)
+        background.update(job_id, total=total, models=len(models))
+
+    def on_progress(model, count):
+        state['done'] += count
+        if job_id and state['done'] - state['reported'] >= PROGRESS_EVERY:
+            state['reported'] = state['done']
+            background.update(job_id, done=state['done'], model=model._meta.label)
+
+    def records():
+        if incremental:
+            yield {
+                'model': META_MODEL, 'id': record.pk, 'kind': record.kind, 'parent': record.parent_id,
+                'since': record.parent.watermarks, 'created_at': record.started_at.isoformat(),
+            }
+        yield from iter_records(models, on_progress, since)
+        if incremental:
+            for tombstone in iter_tombstones(since):
+                state['tombstones'] += 1
+                yield tombstone
+            yield from iter_manifests(models)
+
+    pieces = _jsonl(records()) if fmt == JSONL else _json_array(records())
+    try:
+        yield from _buffered(pieces, compress=(fmt == JSON_GZ))
+    except GeneratorExit:
+        # 客户端中途断开
+        if job_id:
+            background.update(job_id, status='CANCELLED', done=state['done'], finished_at=timezone.now().isoformat())
+        if record is not None:
+            _finish(record, BackupRecord.Status.FAILED, state)
+        raise
+    except Exception as e:
+        logger.exception('备份导出失败')
+        if job_id:
+            background.update(job_id, status='FAILED', error=str(e), finished_at=timezone.now().isoformat())
+        if record is not None:
+            _finish(record, BackupRecord.Status.FAILED, state)
+        raise
+    logger.info('备份导出完成：%d 个模型，%d 条记录，%d 个删除标记', len(models), state['done'], state['tombstones'])
+    if record is not None:
+        record.watermarks = {
+            model._meta.label_lower: record.started_at.isoformat() for model in models if watermark_field(model)
+        }
+        _finish(record, BackupRecord.Status.SUCCESS, state)
+    if job_id:
+        background.update(
+            job_id, status='SUCCESS', done=state['done'], model=None,
+            result={'records': state['done'], 'tombstones': state['tombstones'], 'backup_id': getattr(record, 'pk', None)},
+            finished_at=timezone.now().isoformat(),
+        )
+
+
+def _finish(record, status, state):
+    record.status = status
+    record.records = state['done']
+    record.tombstones = state['tombstones']
+    record.finished_at = timezone.now()
+    record.save(update_fields=['status', 'records', 'tombstones', 'watermarks', 'finished_at'])
@@ -0,0 +1,116 @@
+"""
+数据看板统计快照
+
+大屏与个人中心会高频轮询 `dashboard/stats/`，这里将统计结果缓存为快照：
+- 全局指标：每个有效期内只计算一次，所有请求共享
+- 个人指标：按用户单独缓存
+- 业务数据变更时由 signals 主动失效 (见 core/signals.py)
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.models import Customer, DailyReport, Opportunity, PerformanceTarget, Project
+from core.services import notification_summary
+
+VERSION_KEY = 'dashboard:stats:version'
+ORG_KEY = 'dashboard:stats:{version}:org'
+USER_KEY = 'dashboard:stats:{version}:user:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_STATS_TTL', 10)
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 0, None)
+
+
+def invalidate_org_stats():
+    """
+    全局数据变更：切换版本号，使全局快照及所有个人快照一并失效
+    """
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_user_stats(user_id):
+    """
+    个人数据变更 (通知、日报)：仅失效该用户的快照
+    """
+    if user_id:
+        cache.delete(USER_KEY.format(version=_version(), user_id=user_id))
+
+
+def compute_org_stats():
+    now = timezone.now()
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    opp = Opportunity.objects.aggregate(
+        total=Count('id'),
+        total_amount=Sum('amount'),
+        monthly=Count('id', filter=Q(created_at__gte=start_of_month)),
+        achieved=Sum('amount', filter=Q(stage='CLOSED_WON')),
+    )
+    proj = Project.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=~Q(status='COMPLETED')),
+    )
+    dept_target = PerformanceTarget.objects.filter(
+        year=now.year, month=now.month, target_type='SALES'
+    ).aggregate(Sum('target_revenue'))['target_revenue__sum'] or 0
+
+    return {
+        'total_opportunities': opp['total'],
+        'total_budget': opp['total_amount'] or 0,
+        'total_projects': proj['total'],
+        'active_projects': proj['active'],
+        'monthly_new_opportunities': opp['monthly'],
+        'update_time': now.isoformat(),
+        'deptTarget': dept_target,
+        'deptAchieved': opp['achieved'] or 0,
+        'ongoingProjects': proj['active'],
+        'totalCustomers': Customer.objects.count(),
+    }
+
+
+def compute_user_stats(user):
+    now = timezone.now()
+    return {
+        'personalAchieved': Opportunity.objects.filter(
+            sales_manager=user, stage='CLOSED_WON'
+        ).aggregate(Sum('amount'))['amount__sum'] or 0,
+        'personalTarget': PerformanceTarget.objects.filter(
+            user=user, year=now.year, month=now.month, target_type='SALES'
+        ).aggregate(Sum('target_revenue'))['target_revenue__sum'] or 0,
+        'todoCount': notification_summary.unread_count(user.pk),
+        'dailyReportCount': DailyReport.objects.filter(user=user).count(),
+    }
+
+
+def get_dashboard_stats(user=None):
+    """
+    返回看板统计数据 (字段与原 DashboardViewSet.get_stats 保持一致)
+    缓存命中时不产生数据库查询
+    """
+    version = _version()
+    ttl = _ttl()
+
+    org_key = ORG_KEY.format(version=version)
+    org = cache.get(org_key)
+    if org is None:
+        org = compute_org_stats()
+        cache.set(org_key, org, ttl)
+
+    personal = {'personalAchieved': 0, 'personalTarget': 0, 'todoCount': 0, 'dailyReportCount': 0}
+    if user is not None and user.is_authenticated:
+        user_key = USER_KEY.format(version=version, user_id=user.pk)
+        cached = cache.get(user_key)
+        if cached is None:
+            cached = compute_user_stats(user)
+            cache.set(user_key, cached, ttl)
+        personal = cached
+
+    return {**org, **personal}
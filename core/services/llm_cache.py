@@ -0,0 +1,181 @@
+"""
+LLM 响应缓存 (内容寻址)
+
+同一段文本经 AIAnalysisView / AgentRouterView / 后台 AI 表单反复提交时，每次都要等待 1~60 秒的模型调用。
+解析结果按 (配置ID, 模型名称, Prompt, 用户输入, 温度) 的 SHA-256 寻址缓存：
+- 后端由 LLM_CACHE_BACKEND 选择：memory (进程内 LRU)、db (LLMResponseCache 表)、off (关闭)
+- LLM_CACHE_TTL 控制有效期，LLM_CACHE_MAX_ENTRIES 控制容量，超出时淘汰最久未使用的条目
+- 只缓存解析成功的结果；调用方可通过 AIService(use_cache=False) 显式绕过
+- 命中 / 未命中次数记录在 Django 缓存中，见 stats()
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import LLMResponseCache
+
+METRIC_KEY = 'ai:llm_cache:{name}'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def make_key(config, prompt, user_text, temperature):
+    payload = json.dumps(
+        [config.pk, config.model_name, prompt, user_text, temperature],
+        ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    """
+    进程内 LRU：OrderedDict 按使用顺序排列，条目为 (过期时间戳, 值)
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, ttl, **meta):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DatabaseBackend:
+    """
+    数据库表 LLMResponseCache，多 worker 共享；写入时按 last_used_at 淘汰超出容量的条目
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+
+    def get(self, key):
+        now = timezone.now()
+        entry = LLMResponseCache.objects.filter(key=key, expires_at__gt=now).values('pk', 'raw_response', 'result').first()
+        if entry is None:
+            return None
+        LLMResponseCache.objects.filter(pk=entry['pk']).update(hits=F('hits') + 1, last_used_at=now)
+        return {'raw': entry['raw_response'], 'parsed': entry['result']}
+
+    def set(self, key, value, ttl, config_id=None, model_name=''):
+        now = timezone.now()
+        LLMResponseCache.objects.update_or_create(key=key, defaults={
+            'config_id': config_id, 'model_name': model_name or '',
+            'raw_response': value['raw'], 'result': value['parsed'],
+            'last_used_at': now, 'expires_at': now + timedelta(seconds=ttl),
+        })
+        self.evict(now)
+
+    def evict(self, now=None):
+        LLMResponseCache.objects.filter(expires_at__lte=now or timezone.now()).delete()
+        cutoff = (
+            LLMResponseCache.objects.order_by('-last_used_at')
+            .values_list('last_used_at', flat=True)[self.max_entries:self.max_entries + 1]
+        )
+        cutoff = list(cutoff)
+        if cutoff:
+            LLMResponseCache.objects.filter(last_used_at__lte=cutoff[0]).delete()
+
+    def clear(self):
+        LLMResponseCache.objects.all().delete()
+
+
+BACKENDS = {'memory': MemoryBackend, 'db': DatabaseBackend}
+
+_backend = None
+_backend_name = None
+_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    按当前配置返回后端实例；LLM_CACHE_BACKEND=off (或未知取值) 时返回 None
+    """
+    global _backend, _backend_name
+    name = _setting('LLM_CACHE_BACKEND', 'memory')
+    with _lock:
+        if name != _backend_name:
+            backend_cls = BACKENDS.get(name)
+            _backend = backend_cls(_setting('LLM_CACHE_MAX_ENTRIES', 1000)) if backend_cls else None
+            _backend_name = name
+        return _backend
+
+
+def _incr(name):
+    key = METRIC_KEY.format(name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get(key):
+    """
+    返回 {'raw': 原始返回, 'parsed': 解析结果}；未命中返回 None
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+    value = backend.get(key)
+    _incr('hits' if value is not None else 'misses')
+    return value
+
+
+def set(key, raw, parsed, config=None):
+    backend = get_backend()
+    if backend is None or not isinstance(parsed, dict) or 'error' in parsed:
+        return
+    backend.set(
+        key, {'raw': raw, 'parsed': parsed}, _setting('LLM_CACHE_TTL', 3600),
+        config_id=getattr(config, 'pk', None), model_name=getattr(config, 'model_name', ''),
+    )
+
+
+def clear():
+    backend = get_backend()
+    if backend is not None:
+        backend.clear()
+    cache.delete_many([METRIC_KEY.format(name='hits'), METRIC_KEY.format(name='misses')])
+
+
+def stats():
+    hits = cache.get(METRIC_KEY.format(name='hits'), 0)
+    misses = cache.get(METRIC_KEY.format(name='misses'), 0)
+    total = hits + misses
+    return {
+        'backend': _setting('LLM_CACHE_BACKEND', 'memory'),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0,
+    }
@@ -0,0 +1,178 @@
+"""
+LLM 客户端注册表 (进程级)
+
+原先每次调用都会新建 openai.OpenAI 客户端或直接 requests.post，每次解析都要重新握手 TCP/TLS；
+AIService 构造时也会重新查询 AIConfiguration。这里统一维护：
+- 模型配置快照：版本 = 缓存中的版本号 + 表版本 (见 table_version)。AIConfiguration 保存 / 删除时 signals 调用
+  invalidate()：本进程立即重新加载；默认缓存为进程内缓存时，其他进程依靠表版本在 TABLE_VERSION_TTL 秒内感知
+- 客户端：按 (配置ID, updated_at) 复用，Ollama 使用带连接池的 requests.Session，
+  OpenAI 兼容接口复用 openai.OpenAI 实例 (其内部 HTTP 连接池保持长连接)
+超时与连接池大小见 settings.LLM_* 配置。
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.models import AIConfiguration
+from core.services import table_version
+
+CONFIG_VERSION_KEY = 'ai:config:version'
+
+_lock = threading.RLock()
+_configs = {'version': None, 'by_id': {}, 'active': None, 'active_loaded': False, 'owners': {}}
+_clients = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _version():
+    return cache.get_or_set(CONFIG_VERSION_KEY, 0, None), table_version.current(AIConfiguration)
+
+
+def invalidate(config_id=None):
+    """
+    配置变更：切换版本号并关闭本进程中该配置的客户端 (其他进程由表版本感知，见模块说明)
+    """
+    cache.set(CONFIG_VERSION_KEY, time.time_ns(), None)
+    table_version.expire(AIConfiguration)
+    with _lock:
+        for key in [k for k in _clients if config_id is None or k[0] == config_id]:
+            _clients.pop(key).close()
+
+
+def _sync_version():
+    version = _version()
+    if _configs['version'] != version:
+        _configs.update(version=version, by_id={}, active=None, active_loaded=False, owners={})
+
+
+def get_config(config_id=None):
+    """
+    获取模型配置：指定 ID 不存在时回退到默认 (is_active) 配置；版本未变化时不查询配置
+    """
+    with _lock:
+        _sync_version()
+        if config_id:
+            try:
+                config_id = int(config_id)
+            except (TypeError, ValueError):
+                config_id = None
+        if config_id:
+            if config_id not in _configs['by_id']:
+                _configs['by_id'][config_id] = AIConfiguration.objects.filter(pk=config_id).first()
+            config = _configs['by_id'][config_id]
+            if config:
+                return config
+        if not _configs['active_loaded']:
+            _configs['active'] = AIConfiguration.objects.filter(is_active=True).first()
+            _configs['active_loaded'] = True
+            if _configs['active']:
+                _configs['by_id'].setdefault(_configs['active'].pk, _configs['active'])
+        return _configs['active']
+
+
+def get_owner_configs(user_id=None):
+    """
+    同一所属用户的全部配置 (user_id 为 None 时为系统级配置)，供 llm_router 故障转移使用；版本未变化时不重新查询
+    """
+    with _lock:
+        _sync_version()
+        if user_id not in _configs['owners']:
+            _configs['owners'][user_id] = list(
+                AIConfiguration.objects.filter(user_id=user_id).order_by('-is_active', 'id')
+                if user_id else AIConfiguration.objects.filter(user__isnull=True).order_by('-is_active', 'id')
+            )
+        return _configs['owners'][user_id]
+
+
+def get_system_configs():
+    """
+    全部系统级配置 (未绑定用户)
+    """
+    return get_owner_configs(None)
+
+
+def resolve_base_url(config):
+    """
+    Ollama 基础地址：在 Docker 中运行时 localhost 指向容器自身，需替换为 host.docker.internal
+    """
+    base_url = config.base_url or 'http://localhost:11434'
+    if os.path.exists('/.dockerenv'):
+        base_url = base_url.replace('localhost', 'host.docker.internal').replace('127.0.0.1', 'host.docker.internal')
+    return base_url.rstrip('/')
+
+
+class OllamaClient:
+    """
+    Ollama 客户端：原生 /api/chat 或 OpenAI 兼容 /v1/chat/completions (base_url 含 /v1 时)
+    """
+    is_ollama = True
+
+    def __init__(self, config):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = resolve_base_url(config)
+        self.use_openai_compat = '/v1' in self.base_url
+        self.api_url = f"{self.base_url}/chat/completions" if self.use_openai_compat else f"{self.base_url}/api/chat"
+        self.timeout = (_setting('LLM_CONNECT_TIMEOUT', 10), _setting('LLM_TIMEOUT', 60))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_setting('LLM_POOL_MAXSIZE', 10))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def post(self, payload, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(self.api_url, json=payload, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class OpenAICompatClient:
+    """
+    OpenAI 兼容接口客户端 (DeepSeek、Moonshot、OpenAI 等)
+    """
+    is_ollama = False
+
+    def __init__(self, config):
+        import openai
+
+        self.client = openai.OpenAI(
+            api_key=config.api_key,
+            base_url=config.base_url or None,
+            timeout=_setting('LLM_TIMEOUT', 60),
+            max_retries=_setting('LLM_MAX_RETRIES', 0),
+        )
+        self.chat = self.client.chat
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+def get_client(config):
+    """
+    获取 (或创建) 配置对应的客户端；配置更新后 (updated_at 变化) 旧客户端被关闭替换
+    """
+    key = (config.pk, config.updated_at)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            for stale in [k for k in _clients if k[0] == config.pk]:
+                _clients.pop(stale).close()
+            if config.provider == AIConfiguration.Provider.OLLAMA:
+                client = OllamaClient(config)
+            else:
+                client = OpenAICompatClient(config)
+            _clients[key] = client
+        return client
@@ -0,0 +1,206 @@
+"""
+LLM 服务路由：故障转移、熔断与对冲请求 (进程级)
+
+原先只调用当前选中的配置，服务变慢或宕机时每次解析都要等满 LLM_TIMEOUT (默认 60 秒)。这里：
+- 候选服务 = 请求的配置 + 同一所属用户的其余配置 (系统级配置只转移到系统级配置，用户私有配置只转移到该用户的其他配置，
+  LLM_FAILOVER_TO_SYSTEM=True 时用户配置也可转移到系统级配置)，按最近错误率、平均耗时排序
+- 每个服务记录最近 WINDOW 次调用的成败与耗时 (EWMA)；连续失败 LLM_CIRCUIT_FAILURES 次后熔断，
+  LLM_CIRCUIT_COOLDOWN 秒内不再调用，之后放行一次探测请求 (半开)，成功即恢复
+- 调用失败时立即转到下一个候选服务
+- LLM_HEDGE_AFTER > 0 时 (默认关闭)，请求超过该秒数仍未返回即向下一个候选服务发出对冲请求，取先成功的结果
+  (对冲请求在线程池中执行，未采用的请求继续运行并计入统计)
+统计与熔断状态保存在本进程内存中，各 worker 独立判断。
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from core.services import llm_clients
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+WINDOW = 20
+EWMA_ALPHA = 0.3
+
+# 路由结果：原始返回文本、错误信息、实际响应的配置、Token 用量 (dict 或 None)、发出的调用次数
+RouteResult = namedtuple('RouteResult', 'raw_content error_msg config usage attempts')
+
+_lock = threading.Lock()
+_health = {}
+_executor = {'pool': None}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ProviderHealth:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.latency = None
+        self.outcomes = deque(maxlen=WINDOW)
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def acquire(self, now):
+        """
+        是否允许本次调用；半开状态只放行一个探测请求
+        """
+        if self.state == OPEN and now - self.opened_at >= _setting('LLM_CIRCUIT_COOLDOWN', 30):
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+        return self.state == CLOSED
+
+    def record(self, ok, elapsed, now):
+        self.outcomes.append(ok)
+        self.probing = False
+        if ok:
+            self.failures = 0
+            self.state = CLOSED
+            self.latency = elapsed if self.latency is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= _setting('LLM_CIRCUIT_FAILURES', 3):
+            self.state = OPEN
+            self.opened_at = now
+
+
+def _get_health(config_id):
+    health = _health.get(config_id)
+    if health is None:
+        health = _health[config_id] = ProviderHealth()
+    return health
+
+
+def reset():
+    with _lock:
+        _health.clear()
+
+
+def snapshot():
+    """
+    各服务当前状态 {配置ID: {...}}，供监控展示
+    """
+    with _lock:
+        return {
+            config_id: {
+                'state': h.state,
+                'consecutive_failures': h.failures,
+                'error_rate': round(h.error_rate, 4),
+                'latency_ms': round(h.latency * 1000) if h.latency is not None else None,
+                'calls': len(h.outcomes),
+            }
+            for config_id, h in _health.items()
+        }
+
+
+def candidates(primary):
+    """
+    候选服务列表：请求的配置在前，同一所属用户的其余配置按错误率、平均耗时排序
+    """
+    if not _setting('LLM_FAILOVER', True):
+        return [primary]
+    pool = list(llm_clients.get_owner_configs(primary.user_id))
+    if primary.user_id and _setting('LLM_FAILOVER_TO_SYSTEM', False):
+        pool += llm_clients.get_system_configs()
+    backups = [c for c in pool if c.pk != primary.pk]
+    with _lock:
+        def rank(config):
+            h = _health.get(config.pk)
+            return (h.error_rate, h.latency or 0.0) if h else (0.0, 0.0)
+        backups.sort(key=rank)
+    return [primary] + backups
+
+
+def _acquire(config):
+    with _lock:
+        return _get_health(config.pk).acquire(time.monotonic())
+
+
+def _attempt(config, fn):
+    started = time.monotonic()
+    try:
+        raw_content, error_msg, usage = fn(config)
+    except Exception as e:
+        raw_content, error_msg, usage = '', f"AI 服务调用出错: {str(e)}", None
+    now = time.monotonic()
+    with _lock:
+        _get_health(config.pk).record(not error_msg, now - started, now)
+    return raw_content, error_msg, usage
+
+
+def _pool():
+    with _lock:
+        if _executor['pool'] is None:
+            _executor['pool'] = ThreadPoolExecutor(
+                max_workers=_setting('LLM_ROUTER_WORKERS', 16), thread_name_prefix='llm-router',
+            )
+        return _executor['pool']
+
+
+def call(primary, fn):
+    """
+    依次 / 对冲调用候选服务，fn(config) 返回 (原始返回文本, 错误信息, Token 用量)
+    返回 RouteResult；全部失败时为最后一个错误
+    """
+    queue = candidates(primary)
+    last = ('', f"AI 服务暂不可用 (熔断中): {primary.name}", None)
+    hedge_after = _setting('LLM_HEDGE_AFTER', 0)
+    attempts = 0
+
+    # 无需对冲时在当前线程依次尝试
+    if not hedge_after or len(queue) == 1:
+        for config in queue:
+            if not _acquire(config):
+                continue
+            attempts += 1
+            raw_content, error_msg, usage = _attempt(config, fn)
+            if not error_msg:
+                return RouteResult(raw_content, '', config, usage, attempts)
+            last = (raw_content, error_msg, usage)
+        return RouteResult(last[0], last[1], primary, last[2], attempts)
+
+    pending = {}
+
+    def launch():
+        nonlocal attempts
+        while queue:
+            config = queue.pop(0)
+            if _acquire(config):
+                attempts += 1
+                pending[_pool().submit(_attempt, config, fn)] = config
+                return True
+        return False
+
+    launch()
+    while pending:
+        done, _ = wait(pending, timeout=hedge_after if queue else None, return_when=FIRST_COMPLETED)
+        if not done:
+            # 超过对冲阈值仍未返回：向下一个候选服务发出请求
+            launch()
+            continue
+        for future in done:
+            config = pending.pop(future)
+            raw_content, error_msg, usage = future.result()
+            if not error_msg:
+                return RouteResult(raw_content, '', config, usage, attempts)
+            last = (raw_content, error_msg, usage)
+        if not pending:
+            launch()
+    return RouteResult(last[0], last[1], primary, last[2], attempts)
@@ -0,0 +1,159 @@
+"""
+模型调用遥测
+
+每次 _call_llm_json 记录到 SubmissionLog 的结构化字段：服务提供商 / 模型、缓存状态、耗时、
+调用次数 (含故障转移与对冲)、输入 / 输出 Token 与估算费用 (单价见 settings.LLM_PRICING)。
+summarize() 按 意图 / 实体 / 服务提供商 分组计算 p50 / p95 / p99 耗时与耗时分布，
+供 /api/submission-logs/telemetry/ 与后台 AI提交日志 列表页使用。
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+# 耗时分布桶上界 (毫秒)，最后一个桶为 “超过最大值”
+HISTOGRAM_BUCKETS_MS = [250, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+GROUP_FIELDS = ('intent', 'entity', 'provider', 'model_name', 'cache_status')
+
+
+def usage_from_ollama(result):
+    """
+    Ollama 原生接口返回 prompt_eval_count / eval_count，/v1 兼容接口返回 usage
+    """
+    usage = result.get('usage') or {}
+    prompt_tokens = usage.get('prompt_tokens', result.get('prompt_eval_count'))
+    completion_tokens = usage.get('completion_tokens', result.get('eval_count'))
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+
+
+def usage_from_openai(*completions):
+    """
+    合并一次或多次 (严格 JSON 重试) OpenAI 兼容调用的用量
+    """
+    totals = None
+    for completion in completions:
+        usage = getattr(completion, 'usage', None)
+        if usage is None:
+            continue
+        totals = totals or {'prompt_tokens': 0, 'completion_tokens': 0}
+        totals['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+        totals['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+    return totals
+
+
+def estimate_cost(model_name, usage):
+    """
+    按 settings.LLM_PRICING {模型名称: [输入单价, 输出单价]} (元 / 千 Token) 估算费用；未配置单价时返回 None
+    """
+    price = getattr(settings, 'LLM_PRICING', {}).get(model_name)
+    if not price or not usage:
+        return None
+    input_price, output_price = (Decimal(str(p)) for p in price)
+    cost = (Decimal(usage.get('prompt_tokens') or 0) * input_price
+            + Decimal(usage.get('completion_tokens') or 0) * output_price) / 1000
+    return cost.quantize(Decimal('0.000001'))
+
+
+def build(config, cache_status, latency_ms=None, attempts=0, usage=None):
+    """
+    组装 SubmissionLog 遥测字段
+    """
+    usage = usage or {}
+    model_name = config.model_name if config else ''
+    return {
+        'provider': config.provider if config else '',
+        'model_name': model_name,
+        'config_id': config.pk if config else None,
+        'cache_status': cache_status,
+        'latency_ms': latency_ms,
+        'attempts': attempts,
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': usage.get('completion_tokens'),
+        'cost': estimate_cost(model_name, usage),
+    }
+
+
+def percentile(sorted_values, p):
+    """
+    最近秩法百分位 (sorted_values 已升序)
+    """
+    if not sorted_values:
+        return None
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+def histogram(values):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for value in values:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f"<={b}" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}"]
+    return dict(zip(labels, counts))
+
+
+def _paged(rows, chunk_size):
+    """
+    按主键分页读取 (rows 按 pk 升序、最后一列为 pk)：数据库配置了 DISABLE_SERVER_SIDE_CURSORS，
+    PostgreSQL 上 .iterator() 会一次取回全部结果
+    """
+    page = rows
+    while True:
+        batch = list(page[:chunk_size])
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        page = rows.filter(pk__gt=batch[-1][-1])
+
+
+def summarize(queryset, group_by=('intent', 'entity', 'provider'), chunk_size=2000):
+    """
+    按 group_by 分组统计：调用数、失败数、缓存命中数、耗时百分位与分布、Token 与费用合计
+    """
+    from core.models import SubmissionLog
+
+    group_by = [f for f in group_by if f in GROUP_FIELDS]
+    rows = queryset.order_by('pk').values_list(*group_by, 'status', 'cache_status', 'latency_ms', 'attempts',
+                                               'prompt_tokens', 'completion_tokens', 'cost', 'pk')
+    groups = {}
+    for row in _paged(rows, chunk_size):
+        key = row[:len(group_by)]
+        status, cache_status, latency, attempts, prompt_tokens, completion_tokens, cost, _ = row[len(group_by):]
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {
+                'count': 0, 'failed': 0, 'cache_hits': 0, 'retries': 0, 'latencies': [],
+                'prompt_tokens': 0, 'completion_tokens': 0, 'cost': Decimal('0'),
+            }
+        g['count'] += 1
+        g['failed'] += status == SubmissionLog.Status.FAILED
+        g['cache_hits'] += cache_status in (SubmissionLog.CacheStatus.HIT, SubmissionLog.CacheStatus.PREFILLED)
+        g['retries'] += max((attempts or 0) - 1, 0)
+        if latency is not None:
+            g['latencies'].append(latency)
+        g['prompt_tokens'] += prompt_tokens or 0
+        g['completion_tokens'] += completion_tokens or 0
+        g['cost'] += cost or 0
+
+    result = []
+    for key, g in groups.items():
+        latencies = sorted(g.pop('latencies'))
+        item = dict(zip(group_by, key))
+        item.update(g)
+        item.update(
+            cost=float(g['cost']),
+            p50_ms=percentile(latencies, 50),
+            p95_ms=percentile(latencies, 95),
+            p99_ms=percentile(latencies, 99),
+            avg_ms=round(sum(latencies) / len(latencies)) if latencies else None,
+            max_ms=latencies[-1] if latencies else None,
+            histogram=histogram(latencies),
+        )
+        result.append(item)
+    result.sort(key=lambda item: (-(item['p95_ms'] or 0), -item['count']))
+    return result
@@ -0,0 +1,154 @@
+"""
+本地规则抽取 (确定性，无模型调用)
+
+销售录入的文本大多是“客户名称：XX，金额：50万，销售：付磊，预计签约：2026-03-31”这类模板化输入，
+原先也要等待一次模型调用。这里把 parse_opportunity / parse_customer 中的正则兜底整理为抽取引擎：
+- 每个字段记录取值与可信度：带标签的写法 (如“金额：”) 为 1.0，启发式写法 (如“在深圳”) 较低
+- 置信度 = 必填字段可信度的最小值 × (0.8 + 0.2 × 选填字段覆盖率)；缺少必填字段时为 0
+- AIService 在置信度达到 AI_LOCAL_EXTRACT_MIN_CONFIDENCE 时直接采用本地结果，否则调用模型，
+  模型失败时仍用这里的结果兜底
+"""
+import datetime
+import re
+
+from django.utils import timezone
+
+from core.models import Opportunity
+
+LABELED = 1.0
+
+_STOP = r'[^\s，,。;；]'
+# 带标签的取值：允许内部空格 (如“招商银行 深圳分行”)，遇到下一个“标签：”为止
+_VALUE = r'[^\s，,。;；]+(?:[ \t\u3000]+(?![^\s:：，,。;；]{1,8}[:：])[^\s，,。;；]+)*'
+# 金额：整数部分允许千分位分隔符 (1,500,000 / 1，500，000)
+_NUMBER = r'([0-9]{1,3}(?:[,，][0-9]{3})+|[0-9]+)(\.[0-9]+)?'
+# 金额之后允许的内容：货币单位后紧跟分隔符或结尾；否则 (如“50万左右”、“1,50”) 视为未完整解析
+_AMOUNT_END = r'\s*(?:元|块|人民币|RMB)?\s*(?:$|[。;；\s]|[，,](?![0-9]))'
+UNIT_MAP = {'千': 1_000, '万': 10_000, '百万': 1_000_000, '亿': 100_000_000}
+QUARTER_MIDDLE_MONTH = {1: 2, 2: 5, 3: 8, 4: 11}
+STAGE_LABELS = {label.split(' ')[0]: value for value, label in Opportunity.Stage.choices}
+
+
+class Extraction:
+    def __init__(self, required, optional):
+        self.required = required
+        self.optional = optional
+        self.fields = {}
+        self.certainty = {}
+
+    def set(self, field, value, certainty):
+        if value in (None, '') or self.certainty.get(field, 0) >= certainty:
+            return
+        self.fields[field] = value
+        self.certainty[field] = certainty
+
+    def first(self, field, text, patterns):
+        """
+        patterns: [(正则, 可信度), ...]，按顺序取第一个命中的分组 1
+        """
+        for pattern, certainty in patterns:
+            m = re.search(pattern, text, re.IGNORECASE)
+            if m:
+                self.set(field, m.group(1).strip(), certainty)
+                return
+
+    @property
+    def confidence(self):
+        if any(field not in self.fields for field in self.required):
+            return 0.0
+        base = min(self.certainty[field] for field in self.required)
+        covered = sum(1 for field in self.optional if field in self.fields)
+        return round(base * (0.8 + 0.2 * covered / len(self.optional)), 4) if self.optional else base
+
+
+def _amount(text):
+    """
+    返回 (金额, 可信度)；金额之后还有未解析的数字或文字时降低可信度，交给模型判断
+    """
+    m = re.search(rf'(?:预算|金额)[:：]?\s*{_NUMBER}\s*(千|万|百万|亿)?', text)
+    if not m:
+        return None, 0
+    number = float(re.sub(r'[,，]', '', m.group(1)) + (m.group(2) or ''))
+    amount = int(number * UNIT_MAP.get(m.group(3) or '', 1))
+    certainty = LABELED if re.match(_AMOUNT_END, text[m.end():], re.IGNORECASE) else 0.5
+    return amount, certainty
+
+
+def _quarter_date(text):
+    m = re.search(r'明年?\s*Q([1-4])', text, re.IGNORECASE) or re.search(r'Q([1-4])', text, re.IGNORECASE)
+    if not m:
+        return None
+    year = timezone.now().year + (1 if '明年' in text else 0)
+    return f"{year}-{QUARTER_MIDDLE_MONTH[int(m.group(1))]:02d}-15"
+
+
+def _labeled_date(text):
+    m = re.search(r'(?:预计签约|签约日期|签约时间)(?:日期|时间)?[:：]?\s*(\d{4})[-/年.](\d{1,2})[-/月.](\d{1,2})', text)
+    if not m:
+        return None
+    try:
+        return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3))).isoformat()
+    except ValueError:
+        return None
+
+
+def _stage(text):
+    m = re.search(r'阶段[:：]\s*([A-Za-z_]+|[^\s，,。;；(（]+)', text)
+    if not m:
+        return None
+    value = m.group(1).strip()
+    if value.upper() in Opportunity.Stage.values:
+        return value.upper()
+    return STAGE_LABELS.get(value)
+
+
+def extract_opportunity(text):
+    t = text or ''
+    ex = Extraction(
+        required=['customer_name', 'amount'],
+        optional=['sales_manager_name', 'expected_sign_date', 'stage', 'customer_region'],
+    )
+    ex.first('name', t, [(rf'商机名称[:：]\s*({_VALUE})', LABELED)])
+    ex.first('customer_name', t, [
+        (rf'客户(?:名称)?[:：]\s*({_VALUE})', LABELED),
+        (rf'新增(?:一个|一条|一项)?({_STOP}{{2,40}})的商机', 0.6),
+        (rf'({_STOP}{{2,40}})商机', 0.5),
+    ])
+    amount, certainty = _amount(t)
+    if amount is not None:
+        ex.set('amount', amount, certainty)
+    ex.set('expected_sign_date', _labeled_date(t), LABELED)
+    ex.set('expected_sign_date', _quarter_date(t), 0.8)
+    ex.set('stage', _stage(t), LABELED)
+    ex.first('customer_region', t, [
+        (r'区域[:：]\s*([^\s，,]+)', LABELED),
+        (r'在([^\s，,]{1,10})', 0.4),
+    ])
+    ex.first('sales_manager_name', t, [
+        (rf'(?:销售负责人|销售经理|销售)[:：]\s*({_STOP}{{2,10}})', LABELED),
+        (r'销售([^\s，,]{2,10})', 0.7),
+    ])
+    return ex
+
+
+def extract_customer(text):
+    t = text or ''
+    ex = Extraction(required=['name'], optional=['industry', 'region', 'address', 'contact_name'])
+    # 增强的正则匹配：支持 "客户名称: XX" 或 "新建客户 XX" 或 "创建客户 XX" 或 "创建一个客户 XX"
+    ex.first('name', t, [
+        (rf'客户名称[:：]\s*({_VALUE})', LABELED),
+        (rf'(?:新建|创建)(?:一个|一项)?客户[，, ]\s*({_STOP}{{2,40}})', 0.9),
+        (rf'客户[，, ]\s*({_STOP}{{2,40}})', 0.6),
+    ])
+    ex.first('industry', t, [
+        (rf'行业[:：]\s*({_STOP}+)', LABELED),
+        (rf'({_STOP}+)行业', 0.6),
+    ])
+    ex.first('region', t, [
+        (rf'(?:区域|地点)[:：]\s*({_STOP}+)', LABELED),
+        (rf'在({_STOP}{{1,10}})', 0.4),
+        (rf'地点\s*({_STOP}{{1,10}})', 0.4),
+    ])
+    ex.first('address', t, [(rf'地址[:：]\s*({_VALUE})', LABELED)])
+    ex.first('contact_name', t, [(rf'联系人[:：]\s*({_STOP}{{2,10}})', LABELED)])
+    return ex
@@ -0,0 +1,185 @@
+"""
+人员 / 客户名称解析索引 (进程级)
+
+AI 解析出的“付磊”“九号电动车”等名称需要落到用户 / 客户 ID。原先 find_user_id 每次遍历全部用户在 Python 中拼接姓名比较，
+find_customer_id 与 OpportunitySerializer 使用无索引的 icontains 扫描并直接取 .first()。
+这里为每类对象维护一份内存索引：
+- 用户：用户名、中文全名 (姓+名)、名、全拼 (zhangsan)、首字母 (zs)
+- 客户：客户名称、客户编号、名称全拼
+匹配按 精确 > 前缀 > 包含 > 模糊 (difflib) 打分，返回排序后的候选；最高分并列时视为无法确定，resolve 返回 None。
+索引版本 = (缓存中的版本号, 数据库表版本)：User / Customer 保存或删除时由 signals 切换缓存中的版本号，本进程立即重建；
+默认缓存是进程内缓存，其他 worker 依赖数据库表版本 (见 table_version)：客户为 (行数, Max(updated_at))，
+用户表没有 updated_at，取 (行数, Max(id), Max(date_joined))，只能发现新增与删除，
+用户改名由 NAME_INDEX_MAX_AGE 兜底 (索引最长使用时间)。
+"""
+import bisect
+import difflib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from core.models import Customer
+from core.services import table_version
+
+USER = 'user'
+CUSTOMER = 'customer'
+VERSION_KEY = 'names:{kind}:version'
+
+# 键类型权重
+PRIMARY = 1.0
+SECONDARY = 0.95
+PINYIN = 0.9
+INITIALS = 0.7
+
+# 匹配方式得分
+EXACT = 1.0
+PREFIX = 0.7
+CONTAINS = 0.6
+CONTAINED = 0.5
+FUZZY = 0.5
+FUZZY_MIN_RATIO = 0.6
+# 查询文本包含某个名称 (如“北京”出现在一段更长的名称中) 时，名称至少 CONTAINED_MIN_LEN 个字、得分不低于 CONTAINED_MIN
+CONTAINED_MIN_LEN = 3
+CONTAINED_MIN = 0.35
+
+# 解析阈值：STRICT 只接受全名 / 用户名 / 名 / 全拼的精确匹配 (首字母与前缀的得分均低于该值)，
+# LOOSE 与原先 icontains 的宽松程度相当
+STRICT = 0.75
+LOOSE = 0.3
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def _normalize(value):
+    return (value or '').strip().lower().replace(' ', '')
+
+
+def _pinyin(value):
+    import pinyin
+    return pinyin.get(value, format='strip', delimiter=''), pinyin.get_initial(value, delimiter='')
+
+
+def _has_chinese(value):
+    return any('一' <= ch <= '鿿' for ch in value)
+
+
+class NameIndex:
+    def __init__(self, entries):
+        """
+        entries: [(对象ID, 显示名称, [(键, 权重), ...]), ...]
+        """
+        self.labels = {}
+        self.exact = {}
+        for obj_id, label, keys in entries:
+            self.labels[obj_id] = label
+            for key, weight in keys:
+                key = _normalize(key)
+                if key:
+                    self.exact.setdefault(key, {})
+                    self.exact[key][obj_id] = max(weight, self.exact[key].get(obj_id, 0))
+        self.keys = sorted(self.exact)
+
+    def search(self, query, limit=5):
+        """
+        返回 [(对象ID, 得分, 显示名称), ...]，按得分降序
+        """
+        q = _normalize(query)
+        if not q:
+            return []
+        scores = {}
+
+        def hit(key, score):
+            for obj_id, weight in self.exact[key].items():
+                value = round(score * weight, 4)
+                if value > scores.get(obj_id, 0):
+                    scores[obj_id] = value
+
+        if q in self.exact:
+            hit(q, EXACT)
+        start = bisect.bisect_left(self.keys, q)
+        for key in self.keys[start:]:
+            if not key.startswith(q):
+                break
+            if key != q:
+                hit(key, PREFIX * (0.5 + 0.5 * len(q) / len(key)))
+        if not scores:
+            for key in self.keys:
+                if q in key:
+                    hit(key, CONTAINS * (0.5 + 0.5 * len(q) / len(key)))
+                elif len(key) >= CONTAINED_MIN_LEN and key in q:
+                    score = CONTAINED * (0.5 + 0.5 * len(key) / len(q))
+                    if round(score, 4) >= CONTAINED_MIN:
+                        hit(key, score)
+        if not scores:
+            for key in difflib.get_close_matches(q, self.keys, n=limit, cutoff=FUZZY_MIN_RATIO):
+                hit(key, FUZZY * difflib.SequenceMatcher(None, q, key).ratio())
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.labels[item[0]]), item[0]))
+        return [(obj_id, score, self.labels[obj_id]) for obj_id, score in ranked[:limit]]
+
+
+def _user_entries():
+    entries = []
+    for pk, username, first, last in User.objects.values_list('id', 'username', 'first_name', 'last_name'):
+        full = f"{last}{first}"
+        keys = [(username, PRIMARY), (full, PRIMARY), (first, SECONDARY)]
+        if _has_chinese(full):
+            full_py, initials = _pinyin(full)
+            keys += [(full_py, PINYIN), (initials, INITIALS)]
+        entries.append((pk, full or username, keys))
+    return entries
+
+
+def _customer_entries():
+    entries = []
+    for pk, name, code in Customer.objects.values_list('id', 'name', 'customer_code'):
+        keys = [(name, PRIMARY), (code, PRIMARY)]
+        if _has_chinese(name or ''):
+            keys.append((_pinyin(name)[0], PINYIN))
+        entries.append((pk, name, keys))
+    return entries
+
+
+LOADERS = {USER: _user_entries, CUSTOMER: _customer_entries}
+MODELS = {USER: User, CUSTOMER: Customer}
+VERSION_FIELDS = {USER: ('id', 'date_joined'), CUSTOMER: ('updated_at',)}
+
+
+def invalidate(kind):
+    cache.set(VERSION_KEY.format(kind=kind), time.time_ns(), None)
+    table_version.expire(MODELS[kind])
+
+
+def _version(kind):
+    return cache.get_or_set(VERSION_KEY.format(kind=kind), 0, None), table_version.current(MODELS[kind], VERSION_FIELDS[kind])
+
+
+def get_index(kind):
+    version = _version(kind)
+    now = time.monotonic()
+    with _lock:
+        current = _indexes.get(kind)
+        if current is None or current[0] != version or current[2] <= now:
+            current = (version, NameIndex(LOADERS[kind]()), now + getattr(settings, 'NAME_INDEX_MAX_AGE', 300))
+            _indexes[kind] = current
+        return current[1]
+
+
+def search(kind, query, limit=5):
+    return get_index(kind).search(query, limit)
+
+
+def resolve(kind, query, min_score=STRICT):
+    """
+    返回得分最高的对象 ID；低于阈值或前两名同分 (如两个用户同名) 时返回 None
+    """
+    candidates = search(kind, query, limit=2)
+    if not candidates or candidates[0][1] < min_score:
+        return None
+    if len(candidates) > 1 and candidates[1][1] == candidates[0][1]:
+        return None
+    return candidates[0][0]
@@ -0,0 +1,71 @@
+"""
+无效通知清理
+
+通知通过 content_type / object_id 关联业务对象，对象删除 (或软删除) 后通知即成为脏数据：
+- 实时：signals 中对 SOURCE_MODELS 的删除 / 软删除直接清理关联通知
+- 兜底：purge_dangling_notifications 按 content_type 分组，每组一次 id__in 查询判断对象是否存在
+  (由 clean_notifications 管理命令定期执行)
+"""
+from django.contrib.contenttypes.models import ContentType
+
+from core.models import (
+    Announcement, ApprovalRequest, Customer, DailyReport, Notification, Opportunity, Project, TodoTask,
+)
+
+CHUNK_SIZE = 1000
+
+# 可能作为通知来源的业务模型
+SOURCE_MODELS = [DailyReport, ApprovalRequest, Announcement, Project, Opportunity, Customer, TodoTask]
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _alive_queryset(model):
+    qs = model._default_manager.all()
+    if any(f.name == 'is_deleted' for f in model._meta.concrete_fields):
+        qs = qs.filter(is_deleted=False)
+    return qs
+
+
+def delete_for_object(instance):
+    """
+    删除指向某个业务对象的通知
+    """
+    ct = ContentType.objects.get_for_model(instance.__class__)
+    return Notification.objects.filter(content_type=ct, object_id=instance.pk).delete()[0]
+
+
+def purge_dangling_notifications(chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    清理关联对象已不存在的通知，返回 {模型名: 条数}
+    """
+    linked = Notification.objects.filter(content_type__isnull=False, object_id__isnull=False)
+    result = {}
+    for ct_id in linked.values_list('content_type_id', flat=True).distinct().order_by():
+        ct = ContentType.objects.get_for_id(ct_id)
+        model = ct.model_class()
+        notices = linked.filter(content_type_id=ct_id)
+        label = model.__name__ if model else f'{ct.app_label}.{ct.model}'
+
+        if model is None:
+            # 关联模型已不存在
+            result[label] = notices.count() if dry_run else notices.delete()[0]
+            continue
+
+        object_ids = list(notices.values_list('object_id', flat=True).distinct().order_by())
+        alive_qs = _alive_queryset(model)
+        missing = []
+        for chunk in _chunks(object_ids, chunk_size):
+            alive = set(alive_qs.filter(pk__in=chunk).values_list('pk', flat=True))
+            missing.extend(pk for pk in chunk if pk not in alive)
+
+        count = 0
+        for chunk in _chunks(missing, chunk_size):
+            stale = notices.filter(object_id__in=chunk)
+            count += stale.count() if dry_run else stale.delete()[0]
+        if count:
+            result[label] = count
+    return result
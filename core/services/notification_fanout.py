@@ -0,0 +1,87 @@
+"""
+通知批量下发
+
+接收人只解析为用户 ID 查询集，通知按批 bulk_create 写入；
+接收人数量达到 NOTIFICATION_ASYNC_THRESHOLD (或调用方要求异步) 时转入后台任务，请求立即返回任务 ID。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from core.models import Notification
+from core.services import background, dashboard_stats, notification_summary
+
+CHUNK_SIZE = 1000
+
+
+def resolve_recipient_ids(target, dept_ids=None, user_ids=None):
+    """
+    解析接收人，返回用户 ID 查询集 (不加载用户对象)
+    """
+    if target == 'all':
+        users = User.objects.all()
+    elif target == 'dept_specific':
+        users = User.objects.filter(profile__department_link__in=dept_ids or [])
+    elif target == 'user_specific':
+        users = User.objects.filter(id__in=user_ids or [])
+    else:
+        raise ValueError('无效的发送对象')
+    return users.order_by('id').values_list('id', flat=True).distinct()
+
+
+def fan_out(recipient_ids, title, content, type=Notification.Type.SYSTEM,
+            content_type_id=None, object_id=None, chunk_size=CHUNK_SIZE):
+    """
+    按批写入通知，返回创建条数
+    """
+    created = 0
+    batch = []
+
+    def flush():
+        nonlocal created
+        recipients = [n.recipient_id for n in batch]
+        with transaction.atomic():
+            Notification.objects.bulk_create(batch)
+            transaction.on_commit(lambda: notification_summary.invalidate(*recipients))
+        created += len(batch)
+        batch.clear()
+        background.set_progress(created)
+
+    for recipient_id in recipient_ids:
+        batch.append(Notification(
+            recipient_id=recipient_id, title=title, content=content, type=type,
+            content_type_id=content_type_id, object_id=object_id,
+        ))
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+
+    if created:
+        # bulk_create 不触发 post_save，统一失效看板快照中的待办计数
+        transaction.on_commit(dashboard_stats.invalidate_org_stats)
+    return created
+
+
+def dispatch(recipient_ids, title, content, type=Notification.Type.SYSTEM, defer=None, user=None, **extra):
+    """
+    下发通知：
+    - 同步：返回 {'created': n}
+    - 后台：返回 {'job_id': ..., 'recipients': n}
+    defer=None 时按 NOTIFICATION_ASYNC_THRESHOLD 自动判断
+    """
+    total = recipient_ids.count()
+    if defer is None:
+        defer = total >= getattr(settings, 'NOTIFICATION_ASYNC_THRESHOLD', 2000)
+    if not defer:
+        return {'created': fan_out(recipient_ids.iterator(chunk_size=CHUNK_SIZE), title, content, type, **extra)}
+
+    job_id = background.submit(
+        'notification_fanout', _fan_out_job, list(recipient_ids), title, content, type, user=user, **extra
+    )
+    return {'job_id': job_id, 'recipients': total}
+
+
+def _fan_out_job(recipient_ids, title, content, type, **extra):
+    background.set_progress(0, len(recipient_ids))
+    return {'created': fan_out(recipient_ids, title, content, type, **extra)}
@@ -0,0 +1,52 @@
+"""
+个人通知摘要 (未读数 + 最新一条)
+
+顶栏与个人中心高频轮询，摘要按用户缓存：
+- 命中 (recipient, is_read, created_at) 索引计算，缓存命中时不查询数据库
+- 通知写入 / 删除 / 标记已读时由 signals 及批量写入路径主动失效；默认缓存是进程内缓存，主动失效只作用于
+  当前 worker，其他 worker 依靠 NOTIFICATION_SUMMARY_TTL 过期。TTL 短于顶栏轮询间隔 (30 秒)，
+  每次轮询都拿到最新数据，缓存只吸收页面加载时多个组件的并发请求
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from core.models import Notification
+
+SUMMARY_KEY = 'notifications:summary:{user_id}'
+
+
+def _key(user_id):
+    return SUMMARY_KEY.format(user_id=user_id)
+
+
+def invalidate(*user_ids):
+    keys = [_key(uid) for uid in user_ids if uid]
+    if keys:
+        cache.delete_many(keys)
+
+
+def compute_summary(user_id):
+    latest = (
+        Notification.objects.filter(recipient_id=user_id)
+        .order_by('-created_at', '-id')
+        .values('id', 'created_at')
+        .first()
+    )
+    return {
+        'unread': Notification.objects.filter(recipient_id=user_id, is_read=False).count(),
+        'latest_id': latest['id'] if latest else None,
+        'latest_at': latest['created_at'].isoformat() if latest else None,
+    }
+
+
+def get_summary(user_id):
+    key = _key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_summary(user_id)
+        cache.set(key, summary, getattr(settings, 'NOTIFICATION_SUMMARY_TTL', 10))
+    return summary
+
+
+def unread_count(user_id):
+    return get_summary(user_id)['unread']
@@ -0,0 +1,162 @@
+"""
+业绩报表聚合引擎
+
+PerformanceReportView 的数据来源：使用条件聚合 (Sum(..., filter=Q(...))) 与 TruncMonth 分组，
+一次报表只需固定数量的查询，与统计窗口和月份数无关。
+"""
+import datetime
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import Opportunity, PerformanceTarget
+
+SIGNED_STAGES = ['SIGNED', 'DELIVERY', 'AFTER_SALES', 'WON', 'COMPLETED']
+TREND_MONTHS = 6
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+class PerformanceReport:
+    """
+    按 年 / 季度 / 月 窗口生成业绩报表
+    - month 优先于 quarter；都为空时统计全年
+    """
+
+    def __init__(self, year, month=None, quarter=None, group_by='department', now=None):
+        self.now = timezone.localtime(now or timezone.now())
+        self.year = year
+        self.month = month
+        self.quarter = None if month else quarter
+        self.group_by = group_by
+
+    @property
+    def months(self):
+        if self.month:
+            return [self.month]
+        if self.quarter:
+            start = (self.quarter - 1) * 3 + 1
+            return list(range(start, start + 3))
+        return list(range(1, 13))
+
+    def opportunities(self):
+        qs = Opportunity.objects.filter(created_at__year=self.year)
+        if self.month:
+            qs = qs.filter(created_at__month=self.month)
+        elif self.quarter:
+            qs = qs.filter(created_at__month__in=self.months)
+        return qs
+
+    def targets(self):
+        qs = PerformanceTarget.objects.filter(year=self.year, target_type=PerformanceTarget.TargetType.DEPARTMENT)
+        if self.month:
+            return qs.filter(period=PerformanceTarget.Period.MONTH, month=self.month)
+        if self.quarter:
+            return qs.filter(period=PerformanceTarget.Period.QUARTER, quarter=self.quarter)
+        return qs.filter(period=PerformanceTarget.Period.YEAR)
+
+    def totals(self, base_qs):
+        agg = base_qs.aggregate(
+            pipeline=Sum('amount'),
+            signed=Sum('amount', filter=Q(stage__in=SIGNED_STAGES)),
+            revenue=Sum('collected_amount'),
+            gross=Sum('profit'),
+            opp_count=Count('id'),
+        )
+        return {
+            'pipeline': float(agg['pipeline'] or 0),
+            'signed': float(agg['signed'] or 0),
+            'revenue': float(agg['revenue'] or 0),
+            'gross': float(agg['gross'] or 0),
+            'opp_count': agg['opp_count'],
+        }
+
+    def target_totals(self):
+        agg = self.targets().aggregate(
+            t_contract=Sum('target_contract_amount'),
+            t_revenue=Sum('target_revenue'),
+            t_gross=Sum('target_gross_profit'),
+        )
+        return {
+            't_signed': float(agg['t_contract'] or 0),
+            't_revenue': float(agg['t_revenue'] or 0),
+            't_gross': float(agg['t_gross'] or 0),
+        }
+
+    def status_distribution(self, base_qs):
+        labels = dict(Opportunity.Stage.choices)
+        return [
+            {
+                'status': labels.get(s['stage'], s['stage']),
+                'count': s['count'],
+                'total': float(s['total'] or 0),
+            }
+            for s in base_qs.values('stage').annotate(count=Count('id'), total=Sum('amount')).order_by()
+        ]
+
+    def groups(self, base_qs):
+        if self.group_by == 'user':
+            key = 'sales_manager__username'
+        else:
+            # 优先使用新部门字段 department_link__name
+            key = 'sales_manager__profile__department_link__name'
+        return list(
+            base_qs.values(key)
+            .annotate(
+                count=Count('id'),
+                signed=Sum('amount', filter=Q(stage__in=SIGNED_STAGES))
+            )
+            .order_by()
+        )
+
+    def monthly(self):
+        """
+        连续 TREND_MONTHS 个自然月的趋势，截止到统计窗口末月 (不晚于当前月)
+        """
+        end = min((self.year, self.months[-1]), (self.now.year, self.now.month))
+        start = _shift_month(end[0], end[1], -(TREND_MONTHS - 1))
+        tz = timezone.get_current_timezone()
+        start_dt = timezone.make_aware(datetime.datetime(start[0], start[1], 1), tz)
+        end_next = _shift_month(end[0], end[1], 1)
+        end_dt = timezone.make_aware(datetime.datetime(end_next[0], end_next[1], 1), tz)
+
+        rows = (
+            Opportunity.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt)
+            .annotate(bucket=TruncMonth('created_at'))
+            .values('bucket')
+            .annotate(
+                count=Count('id'),
+                signed=Sum('amount', filter=Q(stage__in=SIGNED_STAGES)),
+                revenue=Sum('collected_amount'),
+                gross=Sum('profit'),
+            )
+            .order_by()
+        )
+        by_month = {(r['bucket'].year, r['bucket'].month): r for r in rows}
+
+        monthly = []
+        for i in range(TREND_MONTHS):
+            y, m = _shift_month(start[0], start[1], i)
+            r = by_month.get((y, m), {})
+            monthly.append({
+                'month': f"{y}-{m:02d}",
+                'count': r.get('count', 0),
+                'signed': float(r.get('signed') or 0),
+                'revenue': float(r.get('revenue') or 0),
+                'gross': float(r.get('gross') or 0),
+            })
+        return monthly
+
+    def build(self):
+        base_qs = self.opportunities()
+        return {
+            'totals': self.totals(base_qs),
+            'targets': self.target_totals(),
+            'status_distribution': self.status_distribution(base_qs),
+            'groups': self.groups(base_qs),
+            'monthly': self.monthly(),
+        }
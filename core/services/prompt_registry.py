@@ -0,0 +1,49 @@
+"""
+提示词模板注册表 (进程级)
+
+原先每次 AI 调用都要按场景查询一次 PromptTemplate，parse_opportunity 甚至会在读路径上写模板表。
+这里每个 worker 一次性加载所有启用的模板 (每个场景取最近更新的一条)，之后直接命中内存：
+- 版本 = 缓存中的版本号 + 表版本 (见 table_version)：PromptTemplate 保存 / 删除时 signals 调用 invalidate()，
+  本进程立即重新加载；默认缓存为进程内缓存，其他 worker / ai_worker 依靠表版本在 TABLE_VERSION_TTL 秒内重新加载
+- 未配置模板的场景使用调用方给出的默认提示词，不再写入数据库
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+from core.models import PromptTemplate
+from core.services import table_version
+
+VERSION_KEY = 'ai:prompts:version'
+
+_lock = threading.Lock()
+_state = {'version': None, 'templates': None}
+
+
+def invalidate():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+    table_version.expire(PromptTemplate)
+
+
+def _load():
+    templates = {}
+    rows = PromptTemplate.objects.filter(is_active=True).order_by('-updated_at', '-id').values_list('scene', 'template')
+    for scene, template in rows:
+        templates.setdefault(scene, template)
+    return templates
+
+
+def get_templates():
+    """
+    返回 {场景: 模板内容}；版本未变化时不重新加载
+    """
+    version = cache.get_or_set(VERSION_KEY, 0, None), table_version.current(PromptTemplate)
+    with _lock:
+        if _state['templates'] is None or _state['version'] != version:
+            _state.update(version=version, templates=_load())
+        return _state['templates']
+
+
+def get(scene, default=''):
+    return get_templates().get(scene) or default
@@ -0,0 +1,298 @@
+"""
+数据恢复 (流式解析、分批写入，后台任务执行)
+
+原先恢复把上传文件写入 /tmp 后以子进程执行 loaddata：整个文件解析进内存再逐条 save()，
+每条记录都会触发 core/signals.py 中的 post_save (写 ActivityLog / OpportunityLog、AI 补全入队等)。这里：
+- 增量解析：json / jsonl 及其 gzip 压缩文件 (按文件头识别) 逐条读出记录，内存占用与文件大小无关
+- 同一模型的连续记录每 RESTORE_BATCH_SIZE 条批量 INSERT 一次：按 raw 方式写入 (与 loaddata 相同，
+  保留备份中的 created_at / updated_at)，主键冲突时覆盖更新；多对多关系按批写入中间表
+- 批量写入不经过 Model.save()，恢复过程中不会发送 pre_save / post_save 信号，因此不会再生成日志、
+  通知或触发模型调用；结束后统一失效各类缓存 (名称索引、提示词、模型配置、看板统计、通知摘要)
+- 整个恢复在一个事务中完成，失败时全部回滚；结束后重置主键序列 (PostgreSQL)
+- 由 background.submit 在后台执行，进度 (已恢复记录数) 可通过 /api/jobs/<id>/ 查询
+- 增量备份 (见 services/backup)：首行元信息用于校验备份链，删除标记在该文件的记录写入后统一删除，
+  主键清单 (文件末尾) 逐段删除区间内已不存在的记录；restore_chain / restore_backup 命令按
+  全量 + 若干增量 的顺序在同一事务中恢复，全量备份的 ID 取自文件名 (或 full_id 参数)
+"""
+import gzip
+import json
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+
+from core.models import Notification
+from core.services import background, dashboard_stats, llm_clients, name_index, notification_summary, prompt_registry
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def open_backup(path):
+    """
+    以文本方式打开备份文件；gzip 压缩按文件头识别，与扩展名无关
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_records(fileobj, read_size=READ_SIZE):
+    """
+    逐条产出记录：支持 loaddata 的 JSON 数组格式与 jsonl (每行一条)
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, in_array = '', 0, False, False
+
+    def refill():
+        nonlocal buffer, pos, eof
+        data = fileobj.read(read_size)
+        if not data:
+            eof = True
+        buffer, pos = buffer[pos:] + data, 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                return
+            refill()
+            continue
+        if buffer[pos] == '[' and not in_array:
+            in_array = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            pos += 1
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # 记录被读取边界截断：继续读入后重试
+            if eof:
+                raise
+            refill()
+            continue
+        pos = end
+        yield record
+
+
+class RestoreWriter:
+    """
+    将同一模型的一批记录写入数据库
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.connection = connections[using]
+        self.counts = {}
+        self.models = set()
+        self.notification_recipients = set()
+
+    def write(self, records):
+        if not records:
+            return
+        deserialized = list(serializers.deserialize('python', records, using=self.using, ignorenonexistent=True))
+        model = type(deserialized[0].object)
+        objs = [d.object for d in deserialized]
+
+        if model._meta.parents:
+            # 多表继承模型无法批量插入，逐条按 loaddata 方式保存
+            for d in deserialized:
+                d.save(using=self.using)
+        else:
+            self._insert(model, objs)
+            self._write_m2m(model, deserialized)
+
+        self.models.add(model)
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objs)
+        if model is Notification:
+            self.notification_recipients.update(obj.recipient_id for obj in objs)
+
+    def _insert(self, model, objs):
+        opts = model._meta
+        fields = list(opts.concrete_fields)
+        update_fields = [f for f in fields if not f.primary_key]
+        on_conflict = OnConflict.UPDATE if update_fields else OnConflict.IGNORE
+        batch_size = max(min(_setting('RESTORE_BATCH_SIZE', 1000), self.connection.ops.bulk_batch_size(fields, objs)), 1)
+        for i in range(0, len(objs), batch_size):
+            # raw=True：与 loaddata 一致，不调用字段的 pre_save (auto_now 等字段保留备份中的值)
+            model._base_manager.using(self.using)._insert(
+                objs[i:i + batch_size], fields=fields, raw=True, using=self.using,
+                on_conflict=on_conflict,
+                update_fields=update_fields if on_conflict == OnConflict.UPDATE else None,
+                unique_fields=[opts.pk] if on_conflict == OnConflict.UPDATE else None,
+            )
+
+    def _write_m2m(self, model, deserialized):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source, target = f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+            owners = [d.object.pk for d in deserialized if field.name in (d.m2m_data or {})]
+            if not owners:
+                continue
+            # 与 loaddata 的 set() 语义一致：先清空这些对象原有的关联
+            through._base_manager.using(self.using).filter(**{f"{source}__in": owners}).delete()
+            rows = [
+                through(**{source: d.object.pk, target: target_pk})
+                for d in deserialized
+                for target_pk in (d.m2m_data or {}).get(field.name, [])
+            ]
+            through._base_manager.using(self.using).bulk_create(
+                rows, batch_size=_setting('RESTORE_BATCH_SIZE', 1000), ignore_conflicts=True,
+            )
+
+    def finish(self):
+        """
+        检查外键约束并重置主键序列
+        """
+        self.connection.check_constraints(table_names=[m._meta.db_table for m in self.models])
+        sequence_sql = self.connection.ops.sequence_reset_sql(no_style(), list(self.models))
+        if sequence_sql:
+            with self.connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+
+def invalidate_caches(writer):
+    """
+    恢复不经过 signals，结束后统一失效依赖这些表的缓存
+    """
+    dashboard_stats.invalidate_org_stats()
+    notification_summary.invalidate(*writer.notification_recipients)
+    llm_clients.invalidate()
+    prompt_registry.invalidate()
+    name_index.invalidate(name_index.USER)
+    name_index.invalidate(name_index.CUSTOMER)
+
+
+def apply_tombstones(tombstones, using=DEFAULT_DB_ALIAS):
+    """
+    删除增量备份中标记为已删除的记录 {模型: [主键, ...]}，返回删除的记录数
+    """
+    batch_size = _setting('RESTORE_BATCH_SIZE', 1000)
+    deleted = 0
+    for label, pks in tombstones.items():
+        model = apps.get_model(label)
+        for i in range(0, len(pks), batch_size):
+            deleted += model._base_manager.using(using).filter(pk__in=pks[i:i + batch_size]).delete()[1].get(model._meta.label, 0)
+    return deleted
+
+
+def apply_manifest(record, using=DEFAULT_DB_ALIAS):
+    """
+    删除主键区间 (after, until] 内不在清单中的记录 (备份时已被物理删除)，返回删除的记录数
+    """
+    model = apps.get_model(record['model'])
+    qs = model._base_manager.using(using)
+    if record.get('after') is not None:
+        qs = qs.filter(pk__gt=record['after'])
+    if record.get('until') is not None:
+        qs = qs.filter(pk__lte=record['until'])
+    return qs.exclude(pk__in=record['live_pks']).delete()[1].get(model._meta.label, 0)
+
+
+def restore(fileobj, using=DEFAULT_DB_ALIAS, expect_parent=None):
+    """
+    从已打开的备份文件恢复，返回 {'records': 总数, 'deleted': 删除数, 'models': {模型: 数量}, 'meta': 增量备份元信息}
+    expect_parent 不为空时校验增量备份的上一次备份 ID
+    """
+    from core.services.backup import META_MODEL
+
+    batch_size = _setting('RESTORE_BATCH_SIZE', 1000)
+    writer = RestoreWriter(using)
+    done = 0
+    deleted = 0
+    meta, tombstones = None, {}
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            batch, current = [], None
+            for record in iter_records(fileobj):
+                if record.get('model') == META_MODEL:
+                    meta = record
+                    if expect_parent is not None and meta.get('parent') != expect_parent:
+                        raise ValueError(f"增量备份 #{meta.get('id')} 基于备份 #{meta.get('parent')}，与上一个文件 #{expect_parent} 不连续")
+                    continue
+                if record.get('deleted'):
+                    tombstones.setdefault(record['model'], []).append(record['pk'])
+                    continue
+                if 'live_pks' in record:
+                    # 清单位于文件末尾：先写入缓冲的记录，再逐段删除，内存占用与主键数量无关
+                    writer.write(batch)
+                    done += len(batch)
+                    batch = []
+                    deleted += apply_manifest(record, using)
+                    continue
+                if batch and (record.get('model') != current or len(batch) >= batch_size):
+                    writer.write(batch)
+                    done += len(batch)
+                    background.set_progress(done)
+                    batch = []
+                current = record.get('model')
+                batch.append(record)
+            writer.write(batch)
+            done += len(batch)
+        deleted += apply_tombstones(tombstones, using)
+        writer.finish()
+        transaction.on_commit(lambda: invalidate_caches(writer), using=using)
+    background.set_progress(done)
+    logger.info('数据恢复完成：%d 条记录，%d 个模型，删除 %d 条', done, len(writer.counts), deleted)
+    return {'records': done, 'deleted': deleted, 'models': writer.counts, 'meta': meta}
+
+
+def restore_file(path, remove=False):
+    """
+    后台任务入口：恢复指定文件，remove=True 时结束后删除 (上传的临时文件)
+    """
+    try:
+        with open_backup(path) as f:
+            return restore(f)
+    finally:
+        if remove and os.path.exists(path):
+            os.remove(path)
+
+
+def restore_chain(paths, using=DEFAULT_DB_ALIAS, full_id=None):
+    """
+    按顺序恢复 全量备份 + 增量备份链，任一文件失败时全部回滚；
+    全量备份不含元信息，其备份 ID 取自文件名，文件被改名时需通过 full_id 指定
+    """
+    from core.services.backup import record_id
+
+    results = []
+    kind, previous = record_id(paths[0])
+    if kind == 'INCREMENTAL':
+        raise ValueError(f"{paths[0]} 是增量备份，备份链的第一个文件必须是全量备份")
+    previous = full_id if full_id is not None else previous
+    if previous is None and len(paths) > 1:
+        raise ValueError(f"无法从文件名 {paths[0]} 确定全量备份的 ID，请指定 full_id")
+    with transaction.atomic(using=using):
+        for i, path in enumerate(paths):
+            with open_backup(path) as f:
+                result = restore(f, using=using, expect_parent=previous)
+            meta = result['meta']
+            if i == 0 and meta is not None:
+                raise ValueError(f"{path} 是增量备份，备份链的第一个文件必须是全量备份")
+            if i > 0 and meta is None:
+                raise ValueError(f"{path} 不是增量备份")
+            if meta:
+                previous = meta['id']
+            results.append({'file': path, **result})
+    return results
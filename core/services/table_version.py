@@ -0,0 +1,47 @@
+"""
+按数据库内容计算的表版本号 (跨进程一致)
+
+默认缓存 (CACHES['default']) 未配置 CACHE_BACKEND 时是进程内的 LocMemCache，写入其中的版本号
+其他 gunicorn worker 与 ai_worker 看不到。因此进程级快照 (模型配置、提示词模板) 同时以数据库内容
+作为版本：(行数, Max(updated_at))。每个进程每 TABLE_VERSION_TTL 秒最多查询一次；新增、修改
+(updated_at 变化)、删除 (行数变化) 都会改变版本，其他进程最迟 TTL 秒后重新加载。
+用 QuerySet.update() 修改这些表时需要同时更新 updated_at。
+没有 updated_at 的表 (如 auth.User) 通过 fields 指定其他单调字段，例如 ('id', 'date_joined')。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+_lock = threading.Lock()
+_checked = {}
+
+
+def current(model, fields=('updated_at',)):
+    """
+    (行数, 各字段最大值...)，默认即 (行数, 最近更新时间)；TTL 内直接返回上次查询的结果
+    """
+    key = (model._meta.label, tuple(fields))
+    now = time.monotonic()
+    with _lock:
+        hit = _checked.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+    row = model._base_manager.aggregate(count=Count('pk'), **{f'max_{name}': Max(name) for name in fields})
+    version = (row['count'], *(row[f'max_{name}'] for name in fields))
+    with _lock:
+        _checked[key] = (now + getattr(settings, 'TABLE_VERSION_TTL', 5), version)
+    return version
+
+
+def expire(model=None):
+    """
+    本进程内的变更：下次取版本时立即重新查询
+    """
+    with _lock:
+        if model is None:
+            _checked.clear()
+        else:
+            for key in [key for key in _checked if key[0] == model._meta.label]:
+                del _checked[key]
@@ -0,0 +1,279 @@
+"""
+业绩目标汇总引擎
+
+月度目标是唯一的录入口径，季度 / 年度目标由月度汇总得出。
+原先每改一条月度目标都要多次 update_or_create 并对全年重新求和，批量修改时逐条重复；
+这里先收集本次请求触及的月度目标，再按 (指标类型, 负责人, 部门, 年份) 维度统一汇总：
+- 经理规则：部门经理的个人目标 = 部门总目标 - 部门其他人目标之和 (不小于0)
+- 时间聚合：月度 -> 季度 -> 年度
+无论触及多少条月度目标，查询数量固定，写入使用 bulk_create / bulk_update 并在同一事务内完成。
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import DepartmentModel, PerformanceTarget
+from core.services import dashboard_stats
+
+AMOUNT_FIELDS = ('target_contract_amount', 'target_gross_profit', 'target_revenue')
+UNIQUE_FIELDS = ('target_type', 'period', 'year', 'month', 'quarter', 'user', 'department')
+UNIQUE_ATTNAMES = ('target_type', 'period', 'year', 'month', 'quarter', 'user_id', 'department_id')
+BATCH_SIZE = 500
+
+MONTH = PerformanceTarget.Period.MONTH
+QUARTER = PerformanceTarget.Period.QUARTER
+YEAR = PerformanceTarget.Period.YEAR
+INDIVIDUAL = PerformanceTarget.TargetType.INDIVIDUAL
+DEPARTMENT = PerformanceTarget.TargetType.DEPARTMENT
+
+
+def rollup_key(target):
+    return (target.target_type, target.user_id, target.department_id, target.year)
+
+
+def quarter_of(month):
+    return (month - 1) // 3 + 1
+
+
+def _key_filter(keys):
+    condition = Q()
+    for target_type, user_id, department_id, year in keys:
+        condition |= Q(target_type=target_type, user_id=user_id, department_id=department_id, year=year)
+    return condition
+
+
+def _zero():
+    return {f: Decimal('0') for f in AMOUNT_FIELDS}
+
+
+def natural_key(target):
+    return tuple(getattr(target, attname) for attname in UNIQUE_ATTNAMES)
+
+
+def summarize(month_targets):
+    """
+    纯内存汇总：将月度目标按维度汇总为季度 / 年度目标 (未保存的实例)
+    季度仅在该季度存在月度目标时生成，年度目标总是生成
+    """
+    totals = defaultdict(_zero)
+    for m in month_targets:
+        key = rollup_key(m)
+        for bucket in ((key, quarter_of(m.month)), (key, None)):
+            for f in AMOUNT_FIELDS:
+                totals[bucket][f] += getattr(m, f)
+
+    result = []
+    for (key, quarter), values in totals.items():
+        target_type, user_id, department_id, year = key
+        result.append(PerformanceTarget(
+            target_type=target_type, period=QUARTER if quarter else YEAR, year=year,
+            month=None, quarter=quarter, user_id=user_id, department_id=department_id, **values
+        ))
+    return result
+
+
+def upsert_targets(targets, prune=False):
+    """
+    按 unique_together 键批量写入业绩目标，返回写入条数
+    - 先一次查询取回涉及维度的已有记录：唯一键中含 NULL (部门目标的 user、季度/年度的 month) 时
+      数据库的 ON CONFLICT 无法命中，需在内存中按键匹配后 bulk_update
+    - 新记录使用 bulk_create(update_conflicts=True)，并发写入同一键时退化为更新
+    - prune=True 时，删除这些维度下未出现在本次数据中的记录 (含历史重复记录)
+    """
+    wanted = {natural_key(t): t for t in targets}
+    if not wanted:
+        return 0
+
+    existing = {}
+    stale = []
+    keys = {rollup_key(t) for t in wanted.values()}
+    for t in PerformanceTarget.objects.filter(_key_filter(keys)).order_by('id'):
+        k = natural_key(t)
+        if k in existing:
+            stale.append(t.pk)
+        else:
+            existing[k] = t
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for k, t in wanted.items():
+        row = existing.pop(k, None)
+        if row is None:
+            to_create.append(t)
+            continue
+        for f in AMOUNT_FIELDS:
+            setattr(row, f, getattr(t, f))
+        row.updated_at = now
+        to_update.append(row)
+
+    with transaction.atomic():
+        if prune:
+            stale.extend(row.pk for row in existing.values())
+        if stale:
+            PerformanceTarget.objects.filter(pk__in=stale).delete()
+        if to_update:
+            PerformanceTarget.objects.bulk_update(to_update, AMOUNT_FIELDS + ('updated_at',), batch_size=BATCH_SIZE)
+        if to_create:
+            PerformanceTarget.objects.bulk_create(
+                to_create, batch_size=BATCH_SIZE, update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS, update_fields=AMOUNT_FIELDS + ('updated_at',)
+            )
+        transaction.on_commit(dashboard_stats.invalidate_org_stats)
+    return len(wanted)
+
+
+class TargetRollup:
+    """
+    用法：
+        rollup = TargetRollup()
+        rollup.touch(month_target)   # 可多次调用
+        rollup.flush()
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.dept_months = set()
+        self._to_create = []
+        self._to_update = {}
+
+    def touch(self, target):
+        """
+        登记一条已变更的月度目标 (非月度目标忽略)
+        """
+        if target.period != MONTH or not target.month:
+            return self
+        self.keys.add(rollup_key(target))
+        if target.department_id:
+            self.dept_months.add((target.department_id, target.year, target.month))
+        return self
+
+    def flush(self):
+        if not self.keys:
+            return
+        with transaction.atomic():
+            self._apply_manager_rule()
+            self._rollup()
+            self._write()
+            transaction.on_commit(dashboard_stats.invalidate_org_stats)
+        self.keys.clear()
+        self.dept_months.clear()
+
+    def _assign(self, obj, values):
+        changed = False
+        for field, value in values.items():
+            if getattr(obj, field) != value:
+                setattr(obj, field, value)
+                changed = True
+        if changed and obj.pk:
+            self._to_update[obj.pk] = obj
+
+    def _write(self):
+        if self._to_update:
+            now = timezone.now()
+            objs = list(self._to_update.values())
+            for obj in objs:
+                obj.updated_at = now
+            PerformanceTarget.objects.bulk_update(objs, AMOUNT_FIELDS + ('updated_at',), batch_size=BATCH_SIZE)
+        if self._to_create:
+            PerformanceTarget.objects.bulk_create(self._to_create, batch_size=BATCH_SIZE)
+        self._to_create = []
+        self._to_update = {}
+
+    def _apply_manager_rule(self):
+        """
+        部门经理的个人目标 = 部门总目标数 - 部门其他人总目标数
+        同时登记部门维度的汇总 (个人目标变动后，部门目标的季度/年度需同步刷新)
+        """
+        if not self.dept_months:
+            return
+
+        dept_ids = {d for d, _, _ in self.dept_months}
+        month_filter = {
+            'period': MONTH,
+            'department_id__in': dept_ids,
+            'year__in': {y for _, y, _ in self.dept_months},
+            'month__in': {m for _, _, m in self.dept_months},
+        }
+
+        dept_targets = {}
+        for t in PerformanceTarget.objects.filter(target_type=DEPARTMENT, **month_filter).order_by('id'):
+            dept_targets.setdefault((t.department_id, t.year, t.month), t)
+        if not dept_targets:
+            return
+
+        for department_id, year, month in dept_targets:
+            if (department_id, year, month) in self.dept_months:
+                self.keys.add((DEPARTMENT, None, department_id, year))
+
+        managers = dict(
+            DepartmentModel.objects.filter(id__in=dept_ids, manager__isnull=False).values_list('id', 'manager_id')
+        )
+        if not any(d in managers for d, _, _ in dept_targets):
+            return
+
+        individuals = defaultdict(list)
+        for t in PerformanceTarget.objects.filter(target_type=INDIVIDUAL, **month_filter).order_by('id'):
+            individuals[(t.department_id, t.year, t.month)].append(t)
+
+        for slot, dept_target in dept_targets.items():
+            if slot not in self.dept_months:
+                continue
+            department_id, year, month = slot
+            manager_id = managers.get(department_id)
+            if not manager_id:
+                continue
+
+            others = _zero()
+            manager_target = None
+            for t in individuals[slot]:
+                if t.user_id == manager_id:
+                    manager_target = manager_target or t
+                    continue
+                for f in AMOUNT_FIELDS:
+                    others[f] += getattr(t, f)
+
+            # 经理个人目标 = 部门总目标 - 其他人总和 (不小于0)
+            values = {f: max(Decimal('0'), getattr(dept_target, f) - others[f]) for f in AMOUNT_FIELDS}
+            if manager_target is None:
+                self._to_create.append(PerformanceTarget(
+                    target_type=INDIVIDUAL, period=MONTH, year=year, month=month, quarter=quarter_of(month),
+                    user_id=manager_id, department_id=department_id, **values
+                ))
+            else:
+                self._assign(manager_target, values)
+            self.keys.add((INDIVIDUAL, manager_id, department_id, year))
+
+    def _rollup(self):
+        """
+        汇总月度到季度和年度 (一次查询取回所有维度的月/季/年目标)
+        """
+        pending_months = defaultdict(list)
+        for obj in self._to_create:
+            pending_months[rollup_key(obj)].append(obj)
+
+        months = defaultdict(dict)
+        quarters = defaultdict(list)
+        years = defaultdict(list)
+        for t in PerformanceTarget.objects.filter(_key_filter(self.keys)).order_by('id'):
+            key = rollup_key(t)
+            if t.period == MONTH and t.month:
+                # 以 _to_update 中的最新值为准
+                months[key][t.pk] = self._to_update.get(t.pk, t)
+            elif t.period == QUARTER and t.quarter:
+                quarters[(key, t.quarter)].append(t)
+            elif t.period == YEAR:
+                years[key].append(t)
+
+        month_targets = [m for key in self.keys for m in list(months[key].values()) + pending_months[key]]
+        for summary in summarize(month_targets):
+            key = rollup_key(summary)
+            values = {f: getattr(summary, f) for f in AMOUNT_FIELDS}
+            existing = quarters.get((key, summary.quarter)) if summary.quarter else years.get(key)
+            if existing:
+                for obj in existing:
+                    self._assign(obj, values)
+            else:
+                self._to_create.append(summary)
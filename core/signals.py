@@ -4,101 +4,68 @@ from django.db.models.signals import pre_save, post_save
 from .models import (
     Opportunity, TodoTask, WorkReport, Competition, MarketActivity, Customer, Contact, SocialMediaStats,
     DepartmentModel, OpportunityLog, SocialMediaAccount, ApprovalRequest, 
-    ApprovalStatus, Project, DailyReport, ActivityLog
+    ApprovalStatus, Project, DailyReport, ActivityLog, PerformanceTarget, Notification, AIConfiguration,
+    AIEnrichmentJob, PromptTemplate,
 )
 from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
 from .models_transfer import OpportunityTransferApplication
 from django.contrib.auth.models import User
-from .services.ai_service import AIService
+from .services import ai_enrichment, dashboard_stats, llm_clients, notification_cleanup, notification_summary, name_index, prompt_registry
 import datetime
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 
-def get_ai_service():
-    return AIService()
-
-def safe_parse_date(date_str):
-    if not date_str: return None
-    try:
-        return datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-    except:
-        return None
-
-def safe_parse_datetime(date_str):
-    if not date_str: return None
-    try:
-        return datetime.datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-    except:
-        try:
-            # Fallback to date only
-            d = datetime.datetime.strptime(date_str, '%Y-%m-%d')
-            return d
-        except:
-            return None
+def _enqueue_ai_enrichment(instance, kind):
+    text = getattr(instance, '_ai_enrichment_text', None)
+    if not text:
+        return
+    instance._ai_enrichment_text = None
+    pk = instance.pk
+    transaction.on_commit(lambda: ai_enrichment.enqueue(kind, pk, text))
 
 @receiver(pre_save, sender=TodoTask)
 def process_todotask_ai(sender, instance, **kwargs):
+    """
+    待办 AI 解析：保存时只做判断，解析在 run_ai_worker 中异步执行 (见 services/ai_enrichment)
+    """
+    if getattr(instance, '_skip_ai_enrichment', False):
+        return
     is_new = instance.pk is None
     should_trigger = instance.source_type == 'AI_GENERATED'
     
     if not should_trigger and is_new and instance.description and len(instance.description) > 10 and (not instance.title or len(instance.title) < 5):
         should_trigger = True
         
-    if should_trigger:
-        raw_text = instance.description
-        data = get_ai_service().parse_todo_task(raw_text)
-        if data:
-            instance.title = data.get('title') or instance.title
-            if data.get('description'):
-                instance.description = data.get('description')
-            
-            if data.get('deadline'):
-                parsed_dt = safe_parse_datetime(data.get('deadline'))
-                if parsed_dt:
-                    instance.deadline = parsed_dt
-            
-            if data.get('assignee'):
-                instance.assignee = data.get('assignee')
-            
-            instance.source_type = 'AI_GENERATED'
+    if should_trigger and instance.description:
+        instance._ai_enrichment_text = instance.description
+
+@receiver(post_save, sender=TodoTask)
+def enqueue_todotask_ai(sender, instance, **kwargs):
+    _enqueue_ai_enrichment(instance, AIEnrichmentJob.Kind.TODO)
 
 @receiver(pre_save, sender=Opportunity)
 def process_opportunity_ai(sender, instance, **kwargs):
-    is_new = instance.pk is None
-    is_placeholder = instance.name in ['新商机', 'New Opportunity', '商机', '未命名']
+    if getattr(instance, '_skip_ai_enrichment', False):
+        return
+    is_placeholder = instance.name in ai_enrichment.OPPORTUNITY_PLACEHOLDERS
     
     # 1. AI 解析逻辑
     # Optimization: Only run AI if the name is a placeholder. 
     # If the user has already filled in the name (e.g. via Frontend Form), skip this slow step.
+    # 解析在 run_ai_worker 中异步执行，保存不再等待模型返回
     if getattr(instance, 'ai_raw_text', None) and is_placeholder:
-        data = get_ai_service().parse_opportunity(instance.ai_raw_text)
-        if data:
-            instance.name = data.get('name') or instance.name
-            if data.get('amount'):
-                instance.amount = data.get('amount')
-            if data.get('customer_name'):
-                instance.customer_company = data.get('customer_name')
-                cust = Customer.objects.filter(name__icontains=data.get('customer_name')).first()
-                if cust:
-                    instance.customer = cust
-            
-            if data.get('sales_manager'):
-                instance.sales_manager = data.get('sales_manager')
-            
-            if data.get('expected_sign_date'):
-                instance.expected_sign_date = safe_parse_date(data.get('expected_sign_date'))
-                
-            if data.get('stage'):
-                for choice in Opportunity.Stage.choices:
-                    if choice[0] == data.get('stage'):
-                        instance.stage = data.get('stage')
-                        break
+        instance._ai_enrichment_text = instance.ai_raw_text
     
     # 2. 自动创建跟进记录 (OpportunityLog) 用于大屏展示
     # 注意：这里我们只在创建时自动生成一条“创建”日志。
     # 后续的更新，如果通过 Admin 编辑，通常 Admin 不会自动创建 Log，除非我们手动 override save_model
     # 但为了确保大屏有数据，我们在 created 时强制生成一条。
 
+@receiver(post_save, sender=Opportunity)
+def enqueue_opportunity_ai(sender, instance, **kwargs):
+    _enqueue_ai_enrichment(instance, AIEnrichmentJob.Kind.OPPORTUNITY)
+
 @receiver(post_save, sender=Opportunity)
 def log_opportunity_created(sender, instance, created, **kwargs):
     if created:
@@ -306,3 +273,62 @@ def generate_customer_code(sender, instance, **kwargs):
             new_seq = 1
             
         instance.customer_code = f"{prefix}-{new_seq:03d}"
+
+# --- 数据看板统计快照失效 ---
+# 在事务提交后再失效，避免并发请求在提交前重新计算并缓存旧数据
+
+@receiver([post_save, post_delete], sender=Opportunity)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=PerformanceTarget)
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_dashboard_org_stats(sender, instance, **kwargs):
+    transaction.on_commit(dashboard_stats.invalidate_org_stats)
+
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=DailyReport)
+def invalidate_dashboard_user_stats(sender, instance, **kwargs):
+    user_id = getattr(instance, 'recipient_id', None) or getattr(instance, 'user_id', None)
+    transaction.on_commit(lambda: dashboard_stats.invalidate_user_stats(user_id))
+
+@receiver([post_save, post_delete], sender=Notification)
+def invalidate_notification_summary(sender, instance, **kwargs):
+    transaction.on_commit(lambda: notification_summary.invalidate(instance.recipient_id))
+
+# --- 无效通知清理 ---
+# 业务对象删除 / 软删除时清理指向它的通知，列表接口无需再逐条校验
+
+def purge_notifications_for_deleted_object(sender, instance, **kwargs):
+    if kwargs.get('signal') is post_save and not getattr(instance, 'is_deleted', False):
+        return
+    notification_cleanup.delete_for_object(instance)
+
+for _model in notification_cleanup.SOURCE_MODELS:
+    post_delete.connect(purge_notifications_for_deleted_object, sender=_model, dispatch_uid=f'purge_notifications_{_model.__name__}')
+    if any(f.name == 'is_deleted' for f in _model._meta.concrete_fields):
+        post_save.connect(purge_notifications_for_deleted_object, sender=_model, dispatch_uid=f'purge_notifications_soft_{_model.__name__}')
+
+# --- LLM 配置与客户端缓存失效 ---
+
+@receiver([post_save, post_delete], sender=AIConfiguration)
+def invalidate_llm_clients(sender, instance, **kwargs):
+    transaction.on_commit(lambda: llm_clients.invalidate(instance.pk))
+
+@receiver([post_save, post_delete], sender=PromptTemplate)
+def invalidate_prompt_registry(sender, instance, **kwargs):
+    transaction.on_commit(prompt_registry.invalidate)
+
+# --- 名称解析索引失效 ---
+
+USER_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_name_index(sender, instance, **kwargs):
+    # 登录时只更新 last_login，无需重建索引
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not USER_NAME_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(lambda: name_index.invalidate(name_index.USER))
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer_name_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: name_index.invalidate(name_index.CUSTOMER))
@@ -0,0 +1,67 @@
+import datetime
+import io
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from core.models import ActivityLog, ActivityLogDailyStat
+from core.services import activity_log_store, restore
+
+
+class ActivityLogStoreTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        ActivityLog.objects.all().delete()
+        self.today = timezone.localdate()
+        self._log(ActivityLog.Type.CUSTOMER, 400, department='销售部')
+        self._log(ActivityLog.Type.CUSTOMER, 3, department='销售部')
+        self._log(ActivityLog.Type.PROJECT, 3)
+        self._log(ActivityLog.Type.SYSTEM, 0, department='技术部')
+
+    def _log(self, type_, days_ago, **kwargs):
+        log = ActivityLog.objects.create(type=type_, action='CREATE', content='测试', actor=self.admin, **kwargs)
+        created_at = activity_log_store.day_start(self.today - datetime.timedelta(days=days_ago)) + datetime.timedelta(hours=12)
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=created_at)
+        return log
+
+    def test_stats_read_daily_rollups_plus_today(self):
+        data = self.client.get('/api/activity-logs/stats/').data
+        self.assertEqual({s['type']: s['count'] for s in data['type_stats']}, {'CUSTOMER': 2, 'PROJECT': 1, 'SYSTEM': 1})
+        self.assertEqual({s['department']: s['count'] for s in data['dept_stats']}, {'销售部': 2, '技术部': 1})
+        # 已结束的日期写入汇总，当天不汇总
+        self.assertEqual(ActivityLogDailyStat.objects.aggregate(total=Sum('count'))['total'], 3)
+        self.assertFalse(ActivityLogDailyStat.objects.filter(date=self.today).exists())
+
+        self._log(ActivityLog.Type.SYSTEM, 0)
+        self.assertEqual(activity_log_store.refresh_rollups(), 0)
+        data = self.client.get('/api/activity-logs/stats/').data
+        self.assertEqual({s['type']: s['count'] for s in data['type_stats']}['SYSTEM'], 2)
+
+    def test_date_filter_uses_created_at_range(self):
+        day = (self.today - datetime.timedelta(days=3)).isoformat()
+        response = self.client.get('/api/activity-logs/', {'start_date': day, 'end_date': day})
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 2)
+
+    def test_archive_keeps_rollups_and_writes_restorable_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('archive_activity_logs', days=30, output=tmp, batch_size=1, stdout=io.StringIO())
+            files = os.listdir(tmp)
+            self.assertEqual(len(files), 1)
+            with restore.open_backup(os.path.join(tmp, files[0])) as f:
+                records = list(restore.iter_records(f))
+        self.assertEqual([r['model'] for r in records], ['core.activitylog'])
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        data = self.client.get('/api/activity-logs/stats/').data
+        self.assertEqual({s['type']: s['count'] for s in data['type_stats']}['CUSTOMER'], 2)
+
+    def test_archive_without_old_logs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(activity_log_store.archive(activity_log_store.day_start(self.today - datetime.timedelta(days=1000)), tmp), (None, 0))
+            self.assertEqual(os.listdir(tmp), [])
@@ -0,0 +1,79 @@
+import threading
+
+from django.test import SimpleTestCase
+from core.services import agent_router
+
+
+class FakeService:
+    def __init__(self, intent='other'):
+        self.intent = intent
+        self.calls = []
+        self.threads = {}
+
+    def _parse(self, name):
+        def parse(text, user=None):
+            self.calls.append(name)
+            self.threads[name] = threading.current_thread().name
+            if user is not None and self.__dict__.get('log_sink') is not None:
+                self.log_sink.append(name)
+            return {'name': name}
+        return parse
+
+    def parse_task(self, text, user=None):
+        self.calls.append('parse_task')
+        return {'intent': self.intent}
+
+    def __getattr__(self, name):
+        if name.startswith('parse_'):
+            return self._parse(name)
+        raise AttributeError(name)
+
+
+class AgentRouterTest(SimpleTestCase):
+    def test_classify(self):
+        self.assertEqual(agent_router.classify('新建客户 华为'), [('customer', agent_router.HIGH_CONFIDENCE)])
+        self.assertEqual(agent_router.classify('新建一个华东区的客户'), [('customer', agent_router.LOW_CONFIDENCE)])
+        self.assertEqual(agent_router.classify('今天天气不错'), [])
+
+    def test_high_confidence_skips_intent_call(self):
+        service = FakeService()
+        result = agent_router.route(service, '创建一个商机：某银行安全项目')
+        self.assertEqual(service.calls, ['parse_opportunity'])
+        self.assertEqual((result['intent'], result['entity'], result['intent_source']), ('create', 'opportunity', 'local'))
+        self.assertEqual(result['fields'], {'name': 'parse_opportunity'})
+
+    def test_ambiguous_intent_extracts_concurrently(self):
+        service = FakeService(intent='create_customer')
+        result = agent_router.route(service, '新建一个华东区的客户')
+        self.assertEqual(sorted(service.calls), ['parse_customer', 'parse_task'])
+        self.assertTrue(service.threads['parse_customer'].startswith('agent-router'))
+        self.assertEqual((result['entity'], result['intent_source']), ('customer', 'llm'))
+
+    def test_intent_outside_candidates_and_fallback(self):
+        service = FakeService(intent='create_todo')
+        result = agent_router.route(service, '帮我安排一下明天的工作')
+        self.assertEqual(service.calls, ['parse_task', 'parse_todo_task'])
+        self.assertEqual(result['entity'], 'todo')
+
+        service = FakeService(intent='other')
+        result = agent_router.route(service, '录入下周的市场活动')
+        self.assertEqual(result['entity'], 'activity')
+        self.assertEqual(result['intent_source'], 'fallback')
+
+        service = FakeService()
+        self.assertEqual(agent_router.route(service, '查询客户列表')['intent'], '')
+        self.assertEqual(service.calls, [])
+
+    def test_query_keyword_only_short_circuits_whole_query(self):
+        service = FakeService(intent='create_todo')
+        result = agent_router.route(service, '查询一下客户，然后安排明天拜访')
+        self.assertEqual(service.calls, ['parse_task', 'parse_todo_task'])
+        self.assertEqual(result['entity'], 'todo')
+
+    def test_discarded_speculative_extractions_are_not_logged(self):
+        service = FakeService(intent='create_opportunity')
+        service.log_sink = []
+        result = agent_router.route(service, '新建一个华东区客户的商机', user=object())
+        self.assertEqual(sorted(service.calls), ['parse_customer', 'parse_opportunity', 'parse_task'])
+        self.assertEqual(result['entity'], 'opportunity')
+        self.assertEqual(service.log_sink, ['parse_opportunity'])
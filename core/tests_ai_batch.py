@@ -0,0 +1,74 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.models import AIConfiguration, SubmissionLog
+from core.services import ai_batch, llm_cache, llm_clients
+
+
+def _ollama_response(content):
+    response = mock.Mock()
+    response.json.return_value = {'message': {'content': json.dumps(content, ensure_ascii=False)}}
+    return response
+
+
+@override_settings(AI_BATCH_CONCURRENCY=1, AI_BATCH_PACK_SIZE=2)
+class AIBatchParseTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+        self.client.force_login(User.objects.create_user('batch-user', password='x'))
+
+    def _post(self, **data):
+        resp = self.client.post('/api/ai/batch-parse/', data, content_type='application/json')
+        return [json.loads(line) for line in b''.join(resp.streaming_content).decode('utf-8').splitlines()]
+
+    def test_groups(self):
+        self.assertEqual(ai_batch._groups(['a', 'b', 'c'], False), [([0], False), ([1], False), ([2], False)])
+        with override_settings(AI_BATCH_PACK_MAX_CHARS=3):
+            self.assertEqual(ai_batch._groups(['a', 'long text', 'b', 'c'], True), [([1], False), ([0, 2], True), ([3], False)])
+
+    def test_packed_items_share_one_call_and_logs_are_bulk_written(self):
+        items = {'items': [{'name': '甲公司', 'industry': '金融'}, {'name': '乙公司', 'industry': '能源'}]}
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response(items)) as post:
+            lines = self._post(entity='customer', texts=['甲公司 金融行业', '乙公司 能源行业'], pack=True)
+
+        self.assertEqual(post.call_count, 1)
+        self.assertIn('### 2\n乙公司 能源行业', post.call_args.args[0]['messages'][1]['content'])
+        self.assertEqual([(l['index'], l['result']['name']) for l in lines[:2]], [(0, '甲公司'), (1, '乙公司')])
+        self.assertEqual(lines[-1], {'done': True, 'total': 2, 'failed': 0})
+        self.assertEqual(SubmissionLog.objects.filter(entity='customer').count(), 2)
+
+    def test_locally_extracted_texts_are_not_packed(self):
+        texts = ['客户名称：丙公司，行业：制造，区域：深圳', '甲公司 金融行业', '乙公司 能源行业']
+        self.assertEqual(ai_batch._groups(texts, True, 'customer'), [([0], False), ([1, 2], True)])
+        items = {'items': [{'name': '甲公司', 'industry': '金融'}, {'name': '乙公司', 'industry': '能源'}]}
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response(items)) as post:
+            lines = self._post(entity='customer', texts=texts, pack=True)
+
+        self.assertEqual(post.call_count, 1)
+        self.assertNotIn('丙公司', post.call_args.args[0]['messages'][1]['content'])
+        self.assertEqual(sorted((l['index'], l['result']['name']) for l in lines[:3]), [(0, '丙公司'), (1, '甲公司'), (2, '乙公司')])
+
+    def test_packed_duplicate_texts_keep_their_own_results(self):
+        items = {'items': [{'name': '甲公司', 'industry': '金融'}, {'name': '甲公司', 'industry': '能源'}]}
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response(items)) as post:
+            lines = self._post(entity='customer', texts=['甲公司 某行业', '甲公司 某行业'], pack=True)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(sorted((l['index'], l['result']['industry']) for l in lines[:2]), [(0, '金融'), (1, '能源')])
+
+    def test_unpacked_and_validation(self):
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response({'name': 'X'})) as post:
+            lines = self._post(entity='contact', texts=['张三 13800000000', '李四 13900000000'])
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(len(lines), 3)
+
+        resp = self.client.post('/api/ai/batch-parse/', {'entity': 'unknown', 'texts': ['x']}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import AIEnrichmentJob, TodoTask
+from core.services import ai_enrichment
+from core.services.ai_service import AIService
+
+
+class AIEnrichmentQueueTest(TestCase):
+    def _create_task(self):
+        with mock.patch.object(AIService, 'parse_todo_task') as parse, \
+                self.captureOnCommitCallbacks(execute=True):
+            task = TodoTask.objects.create(title='待办', description='明天下午三点前提交季度销售报告')
+        parse.assert_not_called()
+        return task
+
+    def test_save_enqueues_and_worker_applies_fields(self):
+        task = self._create_task()
+        job = AIEnrichmentJob.objects.get(kind=AIEnrichmentJob.Kind.TODO, object_id=task.pk)
+        self.assertEqual(job.status, AIEnrichmentJob.Status.PENDING)
+
+        data = {'title': '提交季度销售报告', 'description': '季度销售报告', 'deadline': '2026-01-02 15:00:00'}
+        with mock.patch.object(AIService, 'parse_todo_task', return_value=data), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ai_enrichment.run_pending(), 1)
+
+        task.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(task.title, '提交季度销售报告')
+        self.assertEqual(task.source_type, TodoTask.SourceType.AI_GENERATED)
+        self.assertEqual(timezone.localtime(task.deadline).hour, 15)
+        self.assertEqual(job.status, AIEnrichmentJob.Status.SUCCESS)
+        # 回写不会再次入队
+        self.assertEqual(AIEnrichmentJob.objects.count(), 1)
+
+    def test_failed_parse_is_retried_with_backoff(self):
+        task = self._create_task()
+        with mock.patch.object(AIService, 'parse_todo_task', return_value={'error': 'timeout'}):
+            ai_enrichment.run_pending()
+            job = AIEnrichmentJob.objects.get()
+            self.assertEqual((job.status, job.attempts, job.last_error), (AIEnrichmentJob.Status.PENDING, 1, 'timeout'))
+            # 退避时间未到，不会被再次领取
+            self.assertEqual(ai_enrichment.run_pending(), 0)
+
+            AIEnrichmentJob.objects.update(run_after=job.created_at, attempts=2)
+            ai_enrichment.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (AIEnrichmentJob.Status.FAILED, 3, 'timeout'))
+        self.assertIsNotNone(job.finished_at)
+        # 最后一次仍失败：不回写记录
+        task.refresh_from_db()
+        self.assertEqual(task.title, '待办')
+        self.assertNotEqual(task.source_type, TodoTask.SourceType.AI_GENERATED)
+
+    @override_settings(AI_ENRICHMENT_MAX_RUNNING=1)
+    def test_claim_respects_global_limit(self):
+        self._create_task()
+        self._create_task()
+        self.assertEqual(len(ai_enrichment.claim(5, worker='a')), 1)
+        self.assertEqual(ai_enrichment.claim(5, worker='b'), [])
@@ -0,0 +1,199 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from core.models import BackgroundJob, BackupRecord, Contact, ContactDeleteLog, Customer, CustomerTag
+from core.services import backup, restore
+
+
+@override_settings(BACKUP_CHUNK_SIZE=2)
+class BackupExportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        for i in range(5):
+            Customer.objects.create(name=f'客户{i}', customer_code=f'CUST-{i}', owner=self.admin)
+
+    def _backup(self, fmt):
+        response = self.client.post('/api/data-management/backup/', {'format': fmt}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_jsonl_is_streamed_in_dependency_order_with_progress(self):
+        response, body = self._backup('jsonl')
+        records = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        models = [r['model'] for r in records]
+        self.assertEqual(models.count('core.customer'), 5)
+        self.assertLess(models.index('auth.user'), models.index('core.customer'))
+        self.assertNotIn('contenttypes.contenttype', models)
+
+        job = self.client.get(f"/api/jobs/{response['X-Job-Id']}/").data
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(job['done'], len(records))
+        self.assertEqual(job['total'], len(records))
+
+    def test_gzip_backup_round_trips_through_loaddata(self):
+        response, body = self._backup('json.gz')
+        self.assertIn('.json.gz', response['Content-Disposition'])
+        self.assertEqual(len([r for r in json.loads(gzip.decompress(body)) if r['model'] == 'core.customer']), 5)
+
+        Customer.objects.all().delete()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'backup.json.gz')
+            with open(path, 'wb') as f:
+                f.write(body)
+            call_command('loaddata', path, verbosity=0)
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_unknown_format(self):
+        response = self.client.post('/api/data-management/backup/', {'format': 'xml'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=True, RESTORE_BATCH_SIZE=2)
+class RestoreTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        customers = [Customer.objects.create(name=f'客户{i}', customer_code=f'CUST-{i}', owner=self.admin) for i in range(3)]
+        CustomerTag.objects.create(name='重点').customers.set(customers[:2])
+        self.created_at = timezone.make_aware(datetime.datetime(2023, 1, 1))
+        Customer.objects.update(created_at=self.created_at)
+
+    def test_iter_records_handles_arrays_split_across_reads(self):
+        text = '[\n{"a": "x,]"},\n{"b": [1, 2]}\n]\n'
+        self.assertEqual(list(restore.iter_records(io.StringIO(text), read_size=3)), [{'a': 'x,]'}, {'b': [1, 2]}])
+        self.assertEqual(list(restore.iter_records(io.StringIO('{"a": 1}\n{"a": 2}\n'))), [{'a': 1}, {'a': 2}])
+
+    def test_restore_upload_is_queued_for_worker_in_shared_dir(self):
+        upload_dir = tempfile.mkdtemp()
+        upload = SimpleUploadedFile('backup.jsonl', b'', content_type='application/json')
+        with self.settings(BACKGROUND_JOBS_EAGER=False, BACKUP_UPLOAD_DIR=upload_dir):
+            response = self.client.post('/api/data-management/restore/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        job = BackgroundJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.status, job.func), (BackgroundJob.Status.PENDING, 'core.services.restore.restore_file'))
+        self.assertEqual(os.path.dirname(job.args[0]), upload_dir)
+        self.assertTrue(os.path.exists(job.args[0]))
+        os.remove(job.args[0])
+        os.rmdir(upload_dir)
+
+    def test_restore_job_bulk_loads_without_signals(self):
+        body = b''.join(backup.stream(backup.JSON_GZ))
+        CustomerTag.objects.all().delete()
+        Customer.objects.all().delete()
+
+        handler = mock.Mock()
+        post_save.connect(handler, dispatch_uid='restore-test')
+        self.addCleanup(post_save.disconnect, dispatch_uid='restore-test')
+        upload = SimpleUploadedFile('backup.json.gz', body, content_type='application/gzip')
+        response = self.client.post('/api/data-management/restore/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual(job['status'], 'SUCCESS', job.get('error'))
+        self.assertEqual(job['result']['models']['core.Customer'], 3)
+        # 只有任务记录本身触发信号
+        self.assertEqual({c.kwargs['sender'] for c in handler.call_args_list}, {BackgroundJob})
+        self.assertEqual(Customer.objects.filter(created_at=self.created_at).count(), 3)
+        self.assertEqual(CustomerTag.objects.get().customers.count(), 2)
+
+
+@override_settings(BACKUP_WATERMARK_OVERLAP=0)
+class IncrementalBackupTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        self.customers = [Customer.objects.create(name=f'客户{i}', customer_code=f'CUST-{i}', owner=self.admin) for i in range(3)]
+        self.contact = Contact.objects.create(customer=self.customers[0], name='张三')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _backup(self, mode):
+        response = self.client.post('/api/data-management/backup/', {'format': 'jsonl', 'mode': mode}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        path = os.path.join(self.tmp.name, response['Content-Disposition'].split('filename="')[1].rstrip('"'))
+        with open(path, 'wb') as f:
+            f.write(body)
+        return path, [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+    def test_incremental_requires_previous_backup(self):
+        response = self.client.post('/api/data-management/backup/', {'mode': 'incremental'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_incremental_chain_exports_changes_and_deletions(self):
+        full_path, _ = self._backup('full')
+        full = BackupRecord.objects.get()
+        self.assertEqual(full.status, BackupRecord.Status.SUCCESS)
+        self.assertIn('core.customer', full.watermarks)
+
+        later = timezone.now() + datetime.timedelta(seconds=1)
+        Customer.objects.filter(pk=self.customers[1].pk).update(name='客户1-改', updated_at=later)
+        # 没有删除日志的模型被物理删除：由增量末尾的主键清单还原
+        Customer.objects.filter(pk=self.customers[2].pk).delete()
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(self.client.delete(f'/api/contacts/{self.contact.pk}/').status_code, 204)
+        self.assertEqual(ContactDeleteLog.objects.get().original_data['id'], self.contact.pk)
+        BackupRecord.objects.filter(pk=full.pk).update(
+            watermarks={label: (later - datetime.timedelta(milliseconds=500)).isoformat() for label in full.watermarks},
+        )
+
+        inc_path, records = self._backup('incremental')
+        self.assertEqual(records[0]['model'], backup.META_MODEL)
+        self.assertEqual(records[0]['parent'], full.pk)
+        customers = [r for r in records if r['model'] == 'core.customer' and 'fields' in r]
+        self.assertEqual([r['pk'] for r in customers], [self.customers[1].pk])
+        self.assertIn({'model': 'core.contact', 'pk': self.contact.pk, 'deleted': True}, records)
+        manifest = [r for r in records if r['model'] == 'core.customer' and 'live_pks' in r]
+        self.assertEqual(manifest, [{'model': 'core.customer', 'live_pks': [c.pk for c in self.customers[:2]], 'after': None, 'until': None}])
+
+        # 恢复到全量备份之前的状态后按链恢复
+        Customer.objects.all().delete()
+        results = restore.restore_chain([full_path, inc_path])
+        self.assertEqual(results[1]['deleted'], 2)
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertFalse(Customer.objects.filter(pk=self.customers[2].pk).exists())
+        self.assertEqual(Customer.objects.get(pk=self.customers[1].pk).name, '客户1-改')
+        self.assertFalse(Contact.objects.exists())
+
+    def test_restore_chain_rejects_out_of_order_files(self):
+        full_path, _ = self._backup('full')
+        inc_path, _ = self._backup('incremental')
+        with self.assertRaises(ValueError):
+            restore.restore_chain([inc_path])
+        with self.assertRaises(ValueError):
+            restore.restore_chain([full_path, full_path])
+
+    def test_restore_chain_checks_first_increment_against_full_backup(self):
+        old_full, _ = self._backup('full')
+        new_full, _ = self._backup('full')
+        inc_path, _ = self._backup('incremental')
+        with self.assertRaises(ValueError):
+            restore.restore_chain([old_full, inc_path])
+        renamed = os.path.join(self.tmp.name, 'full.jsonl')
+        os.rename(new_full, renamed)
+        with self.assertRaises(ValueError):
+            restore.restore_chain([renamed, inc_path])
+        self.assertEqual(len(restore.restore_chain([renamed, inc_path], full_id=backup.record_id(new_full)[1])), 2)
+
+    def test_queryset_updates_bump_updated_at(self):
+        from core.models import AIConfiguration
+        first = AIConfiguration.objects.create(name='a', api_key='-', is_active=True)
+        stamp = first.updated_at
+        AIConfiguration.objects.create(name='b', api_key='-', is_active=True)
+        first.refresh_from_db()
+        self.assertFalse(first.is_active)
+        self.assertGreater(first.updated_at, stamp)
@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from core.models import Customer, Notification
+
+
+class DashboardStatsSnapshotTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/dashboard/stats/'
+
+    def test_snapshot_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('error', first.data)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+
+    def test_signals_invalidate_snapshot(self):
+        self.assertEqual(self.client.get(self.url).data['totalCustomers'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Test Customer', owner=self.user)
+        self.assertEqual(self.client.get(self.url).data['totalCustomers'], 1)
+
+        self.assertEqual(self.client.get(self.url).data['todoCount'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(recipient=self.user, title='t', content='c')
+        self.assertEqual(self.client.get(self.url).data['todoCount'], 1)
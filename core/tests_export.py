@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from core.models import ActivityLog, Customer
+from core.services import export
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class StreamingExportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True, is_superuser=True)
+        self.client.force_authenticate(user=self.admin)
+        named = User.objects.create_user(username='fulei', first_name='磊', last_name='付')
+        ActivityLog.objects.all().delete()
+        ActivityLog.objects.create(type=ActivityLog.Type.CUSTOMER, action='CREATE', content='新建客户, "甲"', actor=named)
+        ActivityLog.objects.create(type=ActivityLog.Type.SYSTEM, action='LOGIN', content='登录', actor=self.admin)
+        ActivityLog.objects.create(type=ActivityLog.Type.SYSTEM, action='CRON', content='定时任务\x01')
+
+    def _export(self, fmt=''):
+        response = self.client.get('/api/activity-logs/export_csv/', {'file_format': fmt} if fmt else {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_pages_by_primary_key_without_per_row_queries(self):
+        # 3 条日志，每批 2 条
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/activity-logs/export_csv/')
+            body = b''.join(response.streaming_content)
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['ID', '类型', '动作', '内容', '操作人', '部门', '时间'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], sorted(ActivityLog.objects.values_list('pk', flat=True), reverse=True))
+        by_action = {row[2]: row for row in rows[1:]}
+        self.assertEqual(by_action['CREATE'][1], '客户')
+        self.assertEqual(by_action['CREATE'][3], '新建客户, "甲"')
+        self.assertEqual([by_action[a][4] for a in ('CREATE', 'LOGIN', 'CRON')], ['付磊', 'admin', '系统'])
+
+    def test_gzip_and_xlsx(self):
+        response, body = self._export('csv.gz')
+        self.assertIn('system_logs.csv.gz', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(body).decode('utf-8-sig').splitlines()), 4)
+
+        _, body = self._export('xlsx')
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertIn('xl/workbook.xml', zf.namelist())
+            sheet = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        self.assertEqual(len(sheet.findall('.//{*}row')), 4)
+
+    def test_xlsx_rolls_over_to_next_sheet(self):
+        body = b''.join(export._xlsx(['A'], ([i] for i in range(5)), max_rows=3))
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            rows = [len(ElementTree.fromstring(zf.read(f'xl/worksheets/sheet{i}.xml')).findall('.//{*}row')) for i in (1, 2, 3)]
+            self.assertIn('sheet3.xml', zf.read('xl/_rels/workbook.xml.rels').decode())
+        self.assertEqual(rows, [3, 3, 2])
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/activity-logs/export_csv/', {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_export_action_uses_related_names(self):
+        Customer.objects.create(name='甲公司', customer_code='CUST-1', owner=self.admin)
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/core/customer/', {
+            'action': 'export_as_csv', '_selected_action': list(Customer.objects.values_list('pk', flat=True)),
+        })
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 2)
+        self.assertIn('甲公司', rows[1])
+        self.assertIn('admin', rows[1])
@@ -0,0 +1,274 @@
+import datetime
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import AIConfiguration, LLMResponseCache, PromptTemplate, SubmissionLog
+from core.services import llm_cache, llm_clients, llm_router, llm_telemetry, prompt_registry
+from core.services.ai_service import AIService
+
+
+class LLMClientRegistryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config = AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+
+    def test_config_and_client_are_reused(self):
+        self.assertEqual(AIService().config.pk, self.config.pk)
+        with self.assertNumQueries(0):
+            service = AIService()
+            AIService(config_id=self.config.pk)
+        client = llm_clients.get_client(service.config)
+        self.assertIs(llm_clients.get_client(AIService().config), client)
+        self.assertTrue(client.api_url.endswith('/api/chat'))
+
+    def test_saving_config_replaces_client(self):
+        client = llm_clients.get_client(AIService().config)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config.base_url = 'http://localhost:11434/v1'
+            self.config.save()
+        new_client = llm_clients.get_client(AIService().config)
+        self.assertIsNot(new_client, client)
+        self.assertTrue(new_client.use_openai_compat)
+
+    def test_edit_in_another_process_is_seen_after_ttl(self):
+        self.assertEqual(AIService().config.model_name, 'qwen')
+        # 其他进程保存配置：本进程的 (进程内) 缓存版本号不会变化，只能依靠表版本
+        AIConfiguration.objects.filter(pk=self.config.pk).update(
+            model_name='qwen2', updated_at=timezone.now() + datetime.timedelta(seconds=1),
+        )
+        self.assertEqual(AIService().config.model_name, 'qwen')
+        with mock.patch('core.services.table_version.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertEqual(AIService().config.model_name, 'qwen2')
+
+
+class LLMResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+        self.user = User.objects.create_user('cache-user', password='x')
+        response = mock.Mock()
+        response.json.return_value = {'message': {'content': '{"name": "项目A"}'}}
+        patcher = mock.patch.object(llm_clients.OllamaClient, 'post', return_value=response)
+        self.post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_parse_hits_memory_cache(self):
+        first = AIService()._call_llm_json('prompt', '同一段文本', user=self.user)
+        first['mutated'] = True
+        second = AIService()._call_llm_json('prompt', '同一段文本', user=self.user)
+        self.assertEqual(second, {'name': '项目A'})
+        self.assertEqual(self.post.call_count, 1)
+        self.assertEqual(SubmissionLog.objects.filter(user=self.user).count(), 2)
+
+        AIService(use_cache=False)._call_llm_json('prompt', '同一段文本')
+        AIService()._call_llm_json('prompt', '另一段文本')
+        self.assertEqual(self.post.call_count, 3)
+        self.assertEqual(llm_cache.stats()['hits'], 1)
+        self.assertEqual(llm_cache.stats()['misses'], 2)
+
+    def test_todo_keeps_exact_time_and_bypasses_cache(self):
+        now = datetime.datetime(2026, 3, 2, 10, 40, 12, tzinfo=datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertTrue(AIService().todo_prompt().endswith('Current Date/Time: 2026-03-02 10:40:12'))
+            # "两小时后" 的结果随当前时间变化，不能复用缓存
+            AIService().parse_todo_task('两小时后开会')
+            AIService().parse_todo_task('两小时后开会')
+        self.assertEqual(self.post.call_count, 2)
+
+    @override_settings(LLM_CACHE_BACKEND='db', LLM_CACHE_MAX_ENTRIES=2)
+    def test_db_backend_evicts_least_recently_used(self):
+        service = AIService()
+        for text in ('a', 'b', 'a', 'c'):
+            service._call_llm_json('prompt', text)
+        self.assertEqual(self.post.call_count, 3)
+        self.assertEqual(LLMResponseCache.objects.count(), 2)
+        self.assertEqual(LLMResponseCache.objects.get(hits=1).result, {'name': '项目A'})
+
+
+class ChatStreamTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+        self.client.force_login(User.objects.create_user('chat-user', password='x'))
+
+    def test_ollama_chunks_are_proxied_as_sse(self):
+        lines = [
+            '{"message": {"content": "你"}, "done": false}',
+            '{"message": {"content": "好"}, "done": false}',
+            '{"message": {"content": ""}, "done": true}',
+        ]
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.iter_lines.return_value = iter(lines)
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=response) as post, \
+                self.assertLogs('core.services.ai_service', 'INFO') as logs:
+            resp = self.client.post('/api/chat/', {'message': 'hi', 'stream': True}, content_type='application/json')
+            body = b''.join(resp.streaming_content).decode('utf-8')
+
+        self.assertEqual(resp['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertTrue(post.call_args.args[0]['stream'])
+        self.assertEqual(post.call_args.kwargs, {'stream': True})
+        self.assertEqual(body, 'data: {"delta": "你"}\n\ndata: {"delta": "好"}\n\nevent: done\ndata: {}\n\n')
+        self.assertIn('TTFT', logs.output[0])
+
+
+class PromptRegistryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        prompt_registry.invalidate()
+
+    def test_templates_are_cached_until_saved(self):
+        service = AIService()
+        self.assertEqual(service._get_prompt(PromptTemplate.Scene.CUSTOMER, 'default'), 'default')
+        with self.assertNumQueries(0):
+            service._get_prompt(PromptTemplate.Scene.CUSTOMER, 'default')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template = PromptTemplate.objects.create(name='客户', scene=PromptTemplate.Scene.CUSTOMER, template='custom')
+        self.assertEqual(service._get_prompt(PromptTemplate.Scene.CUSTOMER, 'default'), 'custom')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template.is_active = False
+            template.save()
+        self.assertEqual(service._get_prompt(PromptTemplate.Scene.CUSTOMER, 'default'), 'default')
+
+    def test_edit_in_another_worker_is_seen_after_ttl(self):
+        scene = PromptTemplate.Scene.CUSTOMER
+        # 本 worker 的进程内缓存：另一个 worker 保存模板时切换的版本号不会写到这里，signals 也不在本进程执行
+        local_cache = LocMemCache('prompt-registry-worker', {})
+        with mock.patch.object(prompt_registry, 'cache', local_cache):
+            self.assertEqual(prompt_registry.get(scene, 'default'), 'default')
+            PromptTemplate.objects.create(name='客户', scene=scene, template='custom')
+            self.assertEqual(prompt_registry.get(scene, 'default'), 'default')
+            with mock.patch('core.services.table_version.time.monotonic', return_value=time.monotonic() + 60):
+                self.assertEqual(prompt_registry.get(scene, 'default'), 'custom')
+
+    def test_parse_opportunity_does_not_write_templates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PromptTemplate.objects.create(name='旧版', scene=PromptTemplate.Scene.OPPORTUNITY, template='old prompt')
+        service = AIService()
+        prompt = service.opportunity_prompt()
+        self.assertIn('customer_code', prompt)
+        self.assertEqual(PromptTemplate.objects.get().template, 'old prompt')
+
+
+class LLMRouterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear()
+        llm_router.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.primary = AIConfiguration.objects.create(
+                name='primary', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://primary:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+            self.backup = AIConfiguration.objects.create(
+                name='backup', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://backup:11434', model_name='qwen', api_key='-',
+            )
+        self.calls = []
+
+    def _post(self, primary_delay=0, primary_error=None):
+        def post(client, payload, **kwargs):
+            self.calls.append(client.base_url)
+            if 'primary' in client.base_url:
+                if primary_error:
+                    raise primary_error
+                time.sleep(primary_delay)
+            response = mock.Mock()
+            response.json.return_value = {'message': {'content': json.dumps({'from': client.base_url})}}
+            return response
+        return mock.patch.object(llm_clients.OllamaClient, 'post', autospec=True, side_effect=post)
+
+    @override_settings(LLM_HEDGE_AFTER=0, LLM_CIRCUIT_FAILURES=2)
+    def test_failover_and_circuit_breaker(self):
+        user = User.objects.create_user('router-user', password='x')
+        with self._post(primary_error=RuntimeError('down')):
+            for text in ('a', 'b', 'c'):
+                service = AIService(use_cache=False)
+                self.assertEqual(service._call_llm_json('prompt', text, user=user), {'from': 'http://backup:11434'})
+        self.assertEqual(set(SubmissionLog.objects.values_list('config_id', flat=True)), {self.backup.pk})
+        # 第三次调用时主服务已熔断，直接使用备用服务
+        self.assertEqual([url.split(':')[1] for url in self.calls], ['//primary', '//backup', '//primary', '//backup', '//backup'])
+        self.assertEqual(llm_router.snapshot()[self.primary.pk]['state'], llm_router.OPEN)
+
+    def test_user_config_does_not_fail_over_to_system_configs(self):
+        owner = User.objects.create_user('config-owner', password='x')
+        AIConfiguration.objects.filter(pk=self.primary.pk).update(user=owner, updated_at=timezone.now())
+        llm_clients.invalidate()
+        primary = llm_clients.get_config(self.primary.pk)
+        self.assertEqual(llm_router.candidates(primary), [primary])
+        with self.settings(LLM_FAILOVER_TO_SYSTEM=True):
+            self.assertEqual([c.pk for c in llm_router.candidates(primary)], [self.primary.pk, self.backup.pk])
+
+    @override_settings(LLM_HEDGE_AFTER=0.05)
+    def test_slow_primary_is_hedged(self):
+        started = time.monotonic()
+        with self._post(primary_delay=0.5):
+            data = AIService(use_cache=False)._call_llm_json('prompt', 'text')
+        self.assertEqual(data, {'from': 'http://backup:11434'})
+        self.assertLess(time.monotonic() - started, 0.4)
+
+
+class LLMTelemetryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear()
+        llm_router.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config = AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+        self.admin = User.objects.create_superuser('telemetry-admin', password='x')
+        response = mock.Mock()
+        response.json.return_value = {'message': {'content': '{"name": "A"}'}, 'prompt_eval_count': 1000, 'eval_count': 500}
+        patcher = mock.patch.object(llm_clients.OllamaClient, 'post', return_value=response)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(LLM_PRICING={'qwen': [0.002, 0.008]})
+    def test_calls_record_telemetry_and_summary(self):
+        for _ in range(2):
+            AIService()._call_llm_json('prompt', '同一段文本', user=self.admin, intent='create', entity='customer')
+        miss, hit = SubmissionLog.objects.order_by('id')
+        self.assertEqual((miss.cache_status, miss.provider, miss.attempts), (SubmissionLog.CacheStatus.MISS, 'OLLAMA', 1))
+        self.assertEqual((miss.prompt_tokens, miss.completion_tokens, str(miss.cost)), (1000, 500, '0.006000'))
+        self.assertEqual((hit.cache_status, hit.attempts, hit.prompt_tokens), (SubmissionLog.CacheStatus.HIT, 0, None))
+        self.assertIsNotNone(hit.latency_ms)
+
+        self.client.force_login(self.admin)
+        data = self.client.get('/api/submission-logs/telemetry/', {'group_by': 'entity,cache_status'}).json()
+        self.assertEqual(data['group_by'], ['entity', 'cache_status'])
+        self.assertEqual(sorted((g['cache_status'], g['count']) for g in data['groups']), [('HIT', 1), ('MISS', 1)])
+        self.assertEqual(sum(g['cost'] for g in data['groups']), 0.006)
+        self.assertEqual(set(data['worker']), {'host', 'pid', 'cache', 'providers'})
+        paged = llm_telemetry.summarize(SubmissionLog.objects.all(), ('entity',), chunk_size=1)
+        self.assertEqual([(g['entity'], g['count']) for g in paged], [('customer', 2)])
+        for bad in ({'start_date': '2024-13-01'}, {'end_date': 'yesterday'}):
+            self.assertEqual(self.client.get('/api/submission-logs/telemetry/', bad).status_code, 400)
+        self.assertEqual(self.client.get('/admin/core/submissionlog/').status_code, 200)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual([llm_telemetry.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertIsNone(llm_telemetry.percentile([], 50))
@@ -0,0 +1,71 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.models import AIConfiguration, SubmissionLog
+from core.services import llm_cache, llm_clients, local_extractor
+from core.services.ai_service import AIService, LOCAL_EXTRACTOR_PROMPT
+
+
+def _ollama_response(content):
+    response = mock.Mock()
+    response.json.return_value = {'message': {'content': json.dumps(content, ensure_ascii=False)}}
+    return response
+
+
+class LocalExtractorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            AIConfiguration.objects.create(
+                name='local', provider=AIConfiguration.Provider.OLLAMA,
+                base_url='http://localhost:11434', model_name='qwen', api_key='-', is_active=True,
+            )
+        self.user = User.objects.create_user('fulei', first_name='磊', last_name='付')
+
+    def test_extract_opportunity_fields(self):
+        ex = local_extractor.extract_opportunity('客户名称：九号电动车，金额：50万，销售：付磊，预计签约：2026-03-31，阶段：需求分析，区域：深圳')
+        self.assertEqual(ex.fields['amount'], 500000)
+        self.assertEqual(ex.fields['expected_sign_date'], '2026-03-31')
+        self.assertEqual(ex.fields['stage'], 'REQ_ANALYSIS')
+        self.assertEqual(ex.confidence, 1.0)
+        self.assertEqual(local_extractor.extract_opportunity('九号电动车商机，销售付磊').confidence, 0.0)
+
+    def test_amount_separators_and_partial_values(self):
+        for text in ('客户名称：九号电动车，金额：1,500,000元', '客户名称：九号电动车，金额：1，500，000'):
+            ex = local_extractor.extract_opportunity(text)
+            self.assertEqual((ex.fields['amount'], ex.certainty['amount']), (1500000, 1.0))
+        # 金额后还有未解析的数字或文字：降低可信度，低于默认阈值，交给模型
+        for text in ('客户：甲公司，金额：1,50', '客户：甲公司，金额：50万左右'):
+            self.assertLess(local_extractor.extract_opportunity(text).confidence, 0.8)
+
+    def test_labeled_names_keep_inner_spaces(self):
+        ex = local_extractor.extract_opportunity('客户名称：招商银行 深圳分行，金额：50万')
+        self.assertEqual(ex.fields['customer_name'], '招商银行 深圳分行')
+        ex = local_extractor.extract_opportunity('客户名称：九号电动车 金额：50万 销售：付磊')
+        self.assertEqual((ex.fields['customer_name'], ex.fields['amount']), ('九号电动车', 500000))
+        self.assertEqual(local_extractor.extract_customer('客户名称：招商银行 深圳分行').fields['name'], '招商银行 深圳分行')
+
+    def test_structured_input_skips_llm(self):
+        text = '客户名称：九号电动车，金额：50万，销售：付磊，预计签约：2026-03-31'
+        with mock.patch.object(llm_clients.OllamaClient, 'post') as post:
+            data = AIService().parse_opportunity(text, user=self.user)
+        post.assert_not_called()
+        self.assertEqual(data['name'], '九号电动车-商机')
+        self.assertEqual(data['sales_manager'], self.user.id)
+        self.assertEqual(SubmissionLog.objects.get(entity='opportunity').prompt, LOCAL_EXTRACTOR_PROMPT)
+
+    def test_free_text_uses_llm(self):
+        reply = {'name': '甲公司', 'industry': '金融'}
+        with mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response(reply)) as post:
+            data = AIService(use_cache=False).parse_customer('帮我录一下甲公司，做金融的')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(data['name'], '甲公司')
+
+        with override_settings(AI_LOCAL_EXTRACT_MIN_CONFIDENCE=1.1), \
+                mock.patch.object(llm_clients.OllamaClient, 'post', return_value=_ollama_response(reply)) as post:
+            AIService(use_cache=False).parse_customer('客户名称：甲公司，行业：金融')
+        self.assertEqual(post.call_count, 1)
@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from core.models import Customer
+from core.services import name_index
+from core.services.ai_service import AIService
+
+
+class NameIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fu = User.objects.create_user('fulei', first_name='磊', last_name='付')
+            self.zhang = User.objects.create_user('zs01', first_name='三', last_name='张')
+            self.bank = Customer.objects.create(name='招商银行', customer_code='CUST-001', owner=self.fu)
+            self.bank2 = Customer.objects.create(name='招商银行深圳分行', owner=self.fu)
+
+    def test_find_user_id(self):
+        service = AIService()
+        self.assertEqual(service.find_user_id('付磊'), self.fu.pk)
+        self.assertEqual(service.find_user_id('zhangsan'), self.zhang.pk)
+        self.assertEqual(service.find_user_id('磊'), self.fu.pk)
+        self.assertIsNone(service.find_user_id('李四'))
+        with self.assertNumQueries(0):
+            service.find_user_id('付磊')
+
+    def test_customer_candidates_are_ranked(self):
+        ranked = name_index.search(name_index.CUSTOMER, '招商')
+        self.assertEqual([c[0] for c in ranked], [self.bank.pk, self.bank2.pk])
+        self.assertEqual(AIService().find_customer_id('cust-001'), self.bank.pk)
+        # 文本包含客户名称
+        self.assertEqual(AIService().find_customer_id('招商银行股份有限公司'), self.bank.pk)
+        self.assertEqual(AIService().find_customer_id('招商银行深圳'), self.bank2.pk)
+
+    def test_saving_rebuilds_index(self):
+        self.assertIsNone(AIService().find_user_id('王五'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zhang.last_name, self.zhang.first_name = '王', '五'
+            self.zhang.save()
+        self.assertEqual(AIService().find_user_id('王五'), self.zhang.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.zhang.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_changes_in_another_process_are_seen_after_ttl(self):
+        self.assertIsNone(AIService().find_customer_id('华为技术'))
+        self.assertIsNone(AIService().find_user_id('李四'))
+        # 其他进程的写入：不执行本进程的 on_commit 回调，进程内缓存的版本号不变
+        Customer.objects.create(name='华为技术', owner=self.fu)
+        User.objects.create_user('lisi', first_name='四', last_name='李')
+        with mock.patch('core.services.table_version.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertIsNotNone(AIService().find_customer_id('华为技术'))
+            self.assertIsNotNone(AIService().find_user_id('李四'))
+        # 改名不改变用户表版本，索引到期 (NAME_INDEX_MAX_AGE) 后重建
+        User.objects.filter(pk=self.zhang.pk).update(first_name='五', last_name='王')
+        with mock.patch('core.services.table_version.time.monotonic', return_value=time.monotonic() + 120):
+            self.assertIsNone(AIService().find_user_id('王五'))
+        with mock.patch('core.services.table_version.time.monotonic', return_value=time.monotonic() + 600):
+            self.assertEqual(AIService().find_user_id('王五'), self.zhang.pk)
+
+    def test_strict_rejects_initials_prefixes_and_ties(self):
+        self.assertIsNone(name_index.resolve(name_index.USER, 'fl'))
+        self.assertEqual(name_index.resolve(name_index.USER, 'fl', name_index.LOOSE), self.fu.pk)
+        self.assertIsNone(name_index.resolve(name_index.USER, 'fule'))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('fulei2', first_name='磊', last_name='付')
+        self.assertIsNone(name_index.resolve(name_index.USER, '付磊'))
+
+    def test_short_name_inside_longer_text_is_not_matched(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='北京', owner=self.fu)
+        self.assertIsNone(name_index.resolve(name_index.CUSTOMER, '北京中关村科技发展有限公司', name_index.LOOSE))
@@ -0,0 +1,76 @@
+import datetime
+import io
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from core.models import Announcement, DailyReport, Notification
+
+
+class NotificationCleanupTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+
+    def _notify(self, model, object_id):
+        return Notification.objects.create(
+            recipient=self.user, title='t', content='c',
+            content_type=ContentType.objects.get_for_model(model), object_id=object_id,
+        )
+
+    def test_delete_hook_removes_notifications(self):
+        report = DailyReport.objects.create(user=self.user, date=datetime.date(2026, 1, 5), raw_content='x')
+        self._notify(DailyReport, report.id)
+        report.delete()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_batched_purge(self):
+        report = DailyReport.objects.create(user=self.user, date=datetime.date(2026, 1, 5), raw_content='x')
+        kept = self._notify(DailyReport, report.id)
+        for object_id in (9001, 9002):
+            self._notify(DailyReport, object_id)
+            self._notify(Announcement, object_id)
+
+        call_command('clean_notifications', stdout=io.StringIO())
+        self.assertEqual(list(Notification.objects.values_list('id', flat=True)), [kept.id])
+
+    def test_list_does_not_check_each_notification(self):
+        report = DailyReport.objects.create(user=self.user, date=datetime.date(2026, 1, 5), raw_content='x')
+        self._notify(DailyReport, report.id)
+        for object_id in range(9):
+            self._notify(DailyReport, 9000 + object_id)
+        # 计数、列表、关联对象预加载各一次
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/notifications/')
+        self.assertEqual(response.data['count'], 10)
+
+
+class NotificationSummaryTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+
+    def test_summary_is_cached_and_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notices = [Notification.objects.create(recipient=self.user, title=f't{i}', content='c') for i in range(3)]
+        self.assertEqual(self.client.get('/api/notifications/summary/').data['unread'], 3)
+        with self.assertNumQueries(0):
+            summary = self.client.get('/api/notifications/summary/').data
+        self.assertEqual(summary['latest_id'], notices[-1].id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notifications/{notices[0].id}/mark_read/')
+        self.assertEqual(self.client.get('/api/notifications/summary/').data['unread'], 2)
+        self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.client.get('/api/notifications/summary/').data['unread'], 0)
+
+    def test_feed_cursor_pagination(self):
+        for i in range(5):
+            Notification.objects.create(recipient=self.user, title=f't{i}', content='c')
+        first = self.client.get('/api/notifications/feed/', {'page_size': 3}).data
+        self.assertEqual([n['title'] for n in first['results']], ['t4', 't3', 't2'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([n['title'] for n in second['results']], ['t1', 't0'])
+        self.assertIsNone(second['next'])
@@ -0,0 +1,71 @@
+import datetime
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+from core.models import BackgroundJob, DepartmentModel, Notification, UserProfile
+from core.services import background
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=True)
+class NotificationFanoutTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/notifications/'
+        self.dept = DepartmentModel.objects.create(name='销售一部')
+        for i in range(5):
+            u = User.objects.create_user(username=f'user{i}', password='password')
+            if i < 2:
+                profile, _ = UserProfile.objects.get_or_create(user=u)
+                profile.department_link = self.dept
+                profile.save()
+
+    def _post(self, **data):
+        return self.client.post(self.url, {'title': 't', 'content': 'c', **data}, format='json')
+
+    def test_broadcast_to_all(self):
+        with self.assertNumQueries(5):
+            response = self._post(target='all')
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual(Notification.objects.count(), 6)
+
+    def test_department_broadcast(self):
+        response = self._post(target='dept_specific', targetDepts=[self.dept.id])
+        self.assertEqual(response.data['created'], 2)
+
+    def test_deferred_broadcast_returns_job(self):
+        response = self._post(target='all', **{'async': True})
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(job['result'], {'created': 6})
+        self.assertEqual(Notification.objects.count(), 6)
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=False)
+class NotificationFanoutWorkerTest(APITransactionTestCase):
+    # worker 在独立线程 (独立数据库连接) 中执行任务，不能包在测试用例的事务中
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            User.objects.create_user(username=f'user{i}', password='password')
+
+    def test_deferred_broadcast_runs_in_worker_and_survives_restart(self):
+        response = self.client.post('/api/notifications/', {'title': 't', 'content': 'c', 'target': 'all', 'async': True}, format='json')
+        job_id = response.data['job_id']
+        self.assertEqual(self.client.get(f"/api/jobs/{job_id}/").data['status'], 'PENDING')
+
+        # 执行进程在任务中途退出：心跳超时后重新入队
+        self.assertEqual([j.pk for j in background.claim(1, 'dead-worker')], [job_id])
+        BackgroundJob.objects.filter(pk=job_id).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(background.requeue_stale(), 1)
+
+        call_command('run_background_worker', '--once', stdout=io.StringIO())
+        job = self.client.get(f"/api/jobs/{job_id}/").data
+        self.assertEqual((job['status'], job['result'], job['attempts']), ('SUCCESS', {'created': 6}, 2))
+        self.assertEqual(Notification.objects.count(), 6)
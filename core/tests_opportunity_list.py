@@ -0,0 +1,51 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from core.models import Customer, Opportunity, OpportunityLog, OpportunityTeamMember
+from core.serializers import OpportunityListSerializer
+
+
+class OpportunityListQueryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/opportunities/'
+
+    def _create_opps(self, n):
+        for i in range(n):
+            owner = User.objects.create_user(username=f'sales{Opportunity.objects.count()}', password='password')
+            customer = Customer.objects.create(name=f'Customer {i}', owner=owner)
+            opp = Opportunity.objects.create(
+                name=f'Opp {i}', creator=owner, sales_manager=owner, customer=customer, amount=Decimal('100')
+            )
+            OpportunityTeamMember.objects.create(opportunity=opp, user=self.user)
+            for j in range(5):
+                OpportunityLog.objects.create(opportunity=opp, operator=owner, action='拜访', content=f'log {j}')
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant_per_page(self):
+        self._create_opps(2)
+        _, small = self._list_queries()
+        self._create_opps(20)
+        response, large = self._list_queries()
+
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small, large)
+        row = response.data['results'][0]
+        self.assertEqual(len(row['logs']), OpportunityListSerializer.LOG_LIMIT)
+        self.assertEqual(row['team_members'], [self.user.id])
+
+    def test_detail_keeps_full_logs(self):
+        self._create_opps(1)
+        opp = Opportunity.objects.get()
+        response = self.client.get(f'{self.url}{opp.id}/')
+        self.assertEqual(len(response.data['logs']), opp.logs.count())
+        self.assertGreater(len(response.data['logs']), OpportunityListSerializer.LOG_LIMIT)
+        self.assertEqual(response.data['logs'][0]['opportunity_name'], opp.name)
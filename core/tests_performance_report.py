@@ -0,0 +1,42 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from core.models import Opportunity
+
+
+class PerformanceReportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/reports/performance/'
+
+    def _create_opps(self, n):
+        for i in range(n):
+            Opportunity.objects.create(
+                name=f'Opp {i}', creator=self.user, sales_manager=self.user,
+                amount=Decimal('100'), collected_amount=Decimal('10'), profit=Decimal('5'),
+                stage='SIGNED' if i % 2 == 0 else 'CONTACT',
+            )
+
+    def test_report_totals_and_trend(self):
+        self._create_opps(4)
+        now = timezone.localtime()
+        data = self.client.get(self.url, {'year': now.year}).data
+
+        self.assertEqual(data['totals'], {'pipeline': 400.0, 'signed': 200.0, 'revenue': 40.0, 'gross': 20.0, 'opp_count': 4})
+        self.assertEqual(len(data['monthly']), 6)
+        self.assertEqual(data['monthly'][-1]['month'], f"{now.year}-{now.month:02d}")
+        self.assertEqual(data['monthly'][-1]['count'], 4)
+        self.assertEqual(sum(s['count'] for s in data['status_distribution']), 4)
+
+    def test_query_count_is_constant(self):
+        self._create_opps(2)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        self._create_opps(10)
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {'quarter': 1})
+
+    def test_invalid_window(self):
+        self.assertEqual(self.client.get(self.url, {'quarter': 5}).status_code, 400)
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from core.middleware import fingerprint
+from core.models import Customer, QueryProfile
+
+
+@override_settings(QUERY_PROFILER_ENABLED=True, QUERY_BUDGETS={'default': 100, 'customers-list': 1})
+class QueryProfilerMiddlewareTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+
+    def test_headers_and_profile(self):
+        Customer.objects.create(name='Test Customer', owner=self.user)
+        with self.assertLogs('core.middleware', level='WARNING'):
+            response = self.client.get('/api/customers/')
+            self.client.get('/api/customers/')
+
+        self.assertGreater(int(response['X-Query-Count']), 1)
+        self.assertIn('X-Query-Time-Ms', response)
+        self.assertIn('X-Query-Duplicates', response)
+
+        profile = QueryProfile.objects.get(url_name='customers-list', method='GET')
+        self.assertEqual(profile.requests, 2)
+        self.assertEqual(profile.budget_violations, 2)
+        self.assertEqual(profile.max_queries, int(response['X-Query-Count']))
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s,\n %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
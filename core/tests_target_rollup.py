@@ -0,0 +1,119 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from core.models import DepartmentModel, PerformanceTarget
+from core.services.target_rollup import TargetRollup
+
+
+class TargetRollupTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.sales = [User.objects.create_user(username=f'sales{i}', password='password') for i in range(3)]
+        self.dept = DepartmentModel.objects.create(name='销售一部', manager=self.manager)
+        self.client.force_authenticate(user=self.admin)
+
+    def _month(self, month, amount, user=None, target_type=PerformanceTarget.TargetType.INDIVIDUAL):
+        return PerformanceTarget.objects.create(
+            target_type=target_type, period=PerformanceTarget.Period.MONTH, year=2026,
+            month=month, quarter=(month - 1) // 3 + 1, user=user, department=self.dept,
+            target_contract_amount=amount, target_gross_profit=0, target_revenue=0,
+        )
+
+    def _amount(self, **filters):
+        return PerformanceTarget.objects.get(year=2026, department=self.dept, **filters).target_contract_amount
+
+    def test_rollup_and_manager_rule(self):
+        self._month(1, 1000, target_type=PerformanceTarget.TargetType.DEPARTMENT)
+        self._month(2, 500, target_type=PerformanceTarget.TargetType.DEPARTMENT)
+        rollup = TargetRollup()
+        for month in (1, 2):
+            for user in self.sales:
+                rollup.touch(self._month(month, 100, user=user))
+        rollup.flush()
+
+        self.assertEqual(self._amount(user=self.sales[0], period='QUARTER', quarter=1), Decimal('200'))
+        self.assertEqual(self._amount(user=self.sales[0], period='YEAR'), Decimal('200'))
+        self.assertEqual(self._amount(user=self.manager, period='MONTH', month=1), Decimal('700'))
+        self.assertEqual(self._amount(user=self.manager, period='YEAR'), Decimal('900'))
+        self.assertEqual(self._amount(user=None, target_type='DEPARTMENT', period='YEAR'), Decimal('1500'))
+
+    def test_bulk_batch_update_rolls_up_in_few_queries(self):
+        self._month(1, 1000, target_type=PerformanceTarget.TargetType.DEPARTMENT)
+        ids = [self._month(m, 100, user=u).id for u in self.sales for m in range(1, 13)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/performance-targets/bulk_batch_update/',
+                {'ids': ids, 'target_contract_amount': 50}, format='json'
+            )
+        self.assertEqual(response.data['updated'], 36)
+        self.assertLess(len(queries), 15)
+        self.assertEqual(self._amount(user=self.sales[2], period='QUARTER', quarter=4), Decimal('150'))
+        self.assertEqual(self._amount(user=self.sales[2], period='YEAR'), Decimal('600'))
+        self.assertEqual(self._amount(user=self.manager, period='MONTH', month=1), Decimal('850'))
+
+    def test_bulk_update_targets_for_many_people(self):
+        targets = [{'month': m, 'target_contract_amount': 100, 'target_revenue': 10} for m in range(1, 13)]
+        items = [{'user_id': u.id, 'target_type': 'INDIVIDUAL', 'targets': targets} for u in self.sales]
+        items.append({'target_type': 'DEPARTMENT', 'targets': targets})
+        payload = {'year': 2026, 'department': self.dept.id, 'items': items}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/performance-targets/bulk_update_targets/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated_months'], 48)
+        self.assertLess(len(queries), 15)
+        self.assertEqual(PerformanceTarget.objects.count(), 4 * (12 + 4 + 1))
+        self.assertEqual(self._amount(user=self.sales[1], period='QUARTER', quarter=2), Decimal('300'))
+        self.assertEqual(self._amount(user=None, target_type='DEPARTMENT', period='YEAR'), Decimal('1200'))
+
+        # 再次提交：原有记录就地更新，未提交的月份被清理
+        response = self.client.post('/api/performance-targets/bulk_update_targets/', {
+            'year': 2026, 'department': self.dept.id, 'user_id': self.sales[0].id,
+            'targets': [{'month': 1, 'target_contract_amount': 50}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PerformanceTarget.objects.filter(user=self.sales[0]).count(), 3)
+        self.assertEqual(self._amount(user=self.sales[0], period='YEAR'), Decimal('50'))
+
+    def test_bulk_update_targets_rejects_bad_input(self):
+        url = '/api/performance-targets/bulk_update_targets/'
+        base = {'year': 2026, 'department': self.dept.id, 'user_id': self.sales[0].id}
+        for payload in (
+            {**base, 'targets': [{'month': 13, 'target_contract_amount': 1}]},
+            {**base, 'targets': [{'month': 'abc'}]},
+            {**base, 'targets': [{'month': 1}, {'month': '1'}]},
+            {**base, 'targets': ['1']},
+            {**base, 'targets': [{'month': 1, 'target_contract_amount': 'abc'}]},
+            {**base, 'targets': [{'month': 1, 'target_revenue': True}]},
+            {**base, 'targets': [{'month': 1, 'target_gross_profit': 'NaN'}]},
+            {**base, 'targets': [{'month': 1, 'target_gross_profit': 1e15}]},
+            {**base, 'user_id': 'x', 'targets': [{'month': 1}]},
+            {'year': 2026, 'department': self.dept.id, 'items': ['bad']},
+            {'year': 2026, 'department': self.dept.id, 'items': [
+                {'user_id': self.sales[0].id, 'targets': [{'month': 2}]},
+                {'user_id': self.sales[0].id, 'targets': [{'month': 2}]},
+            ]},
+        ):
+            self.assertEqual(self.client.post(url, payload, format='json').status_code, 400, payload)
+        response = self.client.post(url, {**base, 'targets': [{'month': 1, 'target_revenue': 'abc'}]}, format='json')
+        self.assertIn('target_revenue', response.data['error'])
+        self.assertFalse(PerformanceTarget.objects.exists())
+
+    def test_copy_year_targets(self):
+        for u in self.sales:
+            self._month(1, 100, user=u)
+        self._month(1, 300, target_type=PerformanceTarget.TargetType.DEPARTMENT)
+        for _ in range(2):
+            response = self.client.post('/api/performance-targets/copy_year_targets/', {
+                'from_year': 2026, 'to_year': '2027', 'user_ids': [u.id for u in self.sales[:2]],
+            }, format='json')
+            self.assertEqual(response.data['copied'], 2)
+        response = self.client.post('/api/performance-targets/copy_year_targets/', {
+            'from_year': 2026, 'to_year': 2027, 'department': self.dept.id,
+        }, format='json')
+        self.assertEqual(response.data['copied'], 4)
+        self.assertEqual(PerformanceTarget.objects.filter(year=2027).count(), 4)
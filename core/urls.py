@@ -4,7 +4,8 @@ from .views import (
     OpportunityViewSet, PerformanceTargetViewSet, DashboardViewSet, 
     WeChatLoginView, MeView, competition_kanban_page, marketactivity_kanban_page, 
     CompetitionViewSet, MarketActivityViewSet, AIAnalysisView, CustomerViewSet, ApprovalRequestViewSet, SocialMediaStatsViewSet, SocialMediaAccountViewSet, ContactViewSet, CustomerTagViewSet, OpportunityTeamMemberViewSet, OpportunityLogViewSet, ExternalIdMapViewSet, CustomerCohortViewSet, ChatView, PerformanceReportView, AgentRouterView, SubmissionLogViewSet, AIConfigurationViewSet, UserViewSet, ActivityLogViewSet, ContactDeleteLogViewSet,
-    ProjectViewSet, ProjectCardViewSet, DailyReportViewSet, NotificationViewSet, AnnouncementViewSet, DepartmentViewSet, JobTitleViewSet, DataManagementViewSet, SystemReleaseViewSet
+    ProjectViewSet, ProjectCardViewSet, DailyReportViewSet, NotificationViewSet, AnnouncementViewSet, DepartmentViewSet, JobTitleViewSet, DataManagementViewSet, SystemReleaseViewSet,
+    BackgroundJobView
 )
 from django.views.generic import TemplateView
 
@@ -40,7 +41,7 @@ router.register(r'project-cards', ProjectCardViewSet, basename='project-cards')
 router.register(r'system-releases', SystemReleaseViewSet, basename='system-releases')
 
 from rest_framework.authtoken import views as auth_views
-from .views import UserSimpleListView, AIAnalysisView, AgentRouterView, AIConfigsListView, AIConnectionTestView, LegacyImportView, ResetTestDataView, SeedTargetsView
+from .views import UserSimpleListView, AIAnalysisView, AIBatchParseView, AgentRouterView, AIConfigsListView, AIConnectionTestView, LegacyImportView, ResetTestDataView, SeedTargetsView
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -50,8 +51,10 @@ urlpatterns = [
     path('chat/', ChatView.as_view(), name='chat'),
     path('agent/route/', AgentRouterView.as_view(), name='agent-route'),
     path('reports/performance/', PerformanceReportView.as_view(), name='reports-performance'),
+    path('jobs/<str:job_id>/', BackgroundJobView.as_view(), name='background-job'),
     path('users/simple/', UserSimpleListView.as_view(), name='users-simple'),
     path('ai/analyze/', AIAnalysisView.as_view(), name='ai-analyze'),
+    path('ai/batch-parse/', AIBatchParseView.as_view(), name='ai-batch-parse'),
     path('ai/configs/', AIConfigsListView.as_view(), name='ai-configs'),
     path('ai/test-connection/', AIConnectionTestView.as_view(), name='ai-test-connection'),
     path('migrate/legacy/', LegacyImportView.as_view(), name='migrate-legacy'),
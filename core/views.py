@@ -1,21 +1,27 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.views import APIView
+import json
 import time
+import uuid
 import os
 import subprocess
 import sys
-from django.http import FileResponse
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, Value
+from django.db import transaction
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 from .models import Opportunity, PerformanceTarget, UserProfile, OpportunityLog, TodoTask, Announcement, SocialMediaStats, Competition, MarketActivity, Customer, DepartmentModel, DailyReport, ApprovalRequest, Notification, Project, ProjectCard, ProjectDeleteLog, ProjectChangeLog
 from .serializers import (
-    OpportunitySerializer, PerformanceTargetSerializer, OpportunityLogSerializer, 
+    OpportunitySerializer, OpportunityListSerializer, PerformanceTargetSerializer, OpportunityLogSerializer, 
     OpportunityTeamMemberSerializer, UserSerializer, CompetitionSerializer, 
     MarketActivitySerializer, CustomerSerializer, ContactSerializer, 
     CustomerTagSerializer, ExternalIdMapSerializer, CustomerCohortSerializer, 
@@ -24,7 +30,7 @@ from .serializers import (
 )
 from .serializers import (
     ActivityLogSerializer, ApprovalRequestSerializer, SocialMediaStatsSerializer, 
-    SocialMediaAccountSerializer, UserManagementSerializer, NotificationSerializer
+    SocialMediaAccountSerializer, UserManagementSerializer, NotificationSerializer, NotificationFeedSerializer
 )
 from .models import Contact, CustomerTag, OpportunityTeamMember, ExternalIdMap, CustomerCohort, ContactDeleteLog
 from django.contrib.contenttypes.models import ContentType
@@ -32,11 +38,18 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from .models import Competition, MarketActivity, SocialMediaAccount
 from .services.ai_service import AIService
+from .services import dashboard_stats
+from .services.performance_report import PerformanceReport
+from .services import activity_log_store, agent_router, ai_batch, background, notification_fanout, notification_summary
+from .services import backup as backup_service
+from .services import export as export_service
+from .services import restore as restore_service
+from .services.target_rollup import TargetRollup, natural_key, summarize, upsert_targets
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models.functions import TruncMonth
+from django.db.models.functions import Coalesce, Concat, NullIf, TruncMonth
 from django_filters.rest_framework import DjangoFilterBackend
 import re
 from rest_framework.permissions import IsAdminUser
@@ -45,7 +58,7 @@ from .models import SubmissionLog
 from .serializers import AIConfigurationSerializer
 from .models import AIConfiguration
 from .models import ApprovalStatus
-from .models import ActivityLog, JobTitle
+from .models import ActivityLog, BackupRecord, JobTitle
 from .serializers import JobTitleSerializer
 
 from rest_framework import viewsets, permissions, status, filters
@@ -162,7 +175,9 @@ class AIAnalysisView(APIView):
         if not text:
             return Response({'error': 'No text provided'}, status=400)
             
-        service = AIService(config_id=config_id)
+        # no_cache=true 时绕过响应缓存，强制重新调用模型
+        use_cache = str(request.data.get('no_cache', '')).lower() not in ('1', 'true', 'yes')
+        service = AIService(config_id=config_id, use_cache=use_cache)
         result = None
         # Pass user for logging if authenticated
         user = request.user if request.user.is_authenticated else None
@@ -194,65 +209,11 @@ class DashboardViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'], url_path='stats')
     def get_stats(self, request):
+        """
+        核心统计数据 (读取缓存快照，见 services/dashboard_stats.py)
+        """
         try:
-            # 1. Pipeline Stats (Opportunity)
-            total_opps = Opportunity.objects.count()
-            total_amount = Opportunity.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-            
-            # 2. Project Stats
-            from .models import Project, DailyReport, Customer, Notification
-            total_projects = Project.objects.count()
-            active_projects = Project.objects.exclude(status='COMPLETED').count()
-            
-            # 3. Monthly New Opps
-            from django.utils import timezone
-            now = timezone.now()
-            start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            monthly_opps = Opportunity.objects.filter(created_at__gte=start_of_month).count()
-            
-            # 4. Personal Center Stats (Frontend compatibility)
-            from .models import PerformanceTarget
-            
-            # 计算部门已完成
-            dept_achieved = Opportunity.objects.filter(stage='CLOSED_WON').aggregate(Sum('amount'))['amount__sum'] or 0
-            # 获取部门目标
-            dept_target = PerformanceTarget.objects.filter(
-                year=now.year, month=now.month, target_type='SALES'
-            ).aggregate(Sum('target_revenue'))['target_revenue__sum'] or 0
-            
-            # 个人统计
-            personal_achieved = 0
-            personal_target = 0
-            todo_count = 0
-            daily_report_count = 0
-            
-            if request.user.is_authenticated:
-                personal_achieved = Opportunity.objects.filter(
-                    sales_manager=request.user, stage='CLOSED_WON'
-                ).aggregate(Sum('amount'))['amount__sum'] or 0
-                personal_target = PerformanceTarget.objects.filter(
-                    user=request.user, year=now.year, month=now.month, target_type='SALES'
-                ).aggregate(Sum('target_revenue'))['target_revenue__sum'] or 0
-                todo_count = Notification.objects.filter(user=request.user, is_read=False).count()
-                daily_report_count = DailyReport.objects.filter(creator=request.user).count()
-
-            return Response({
-                'total_opportunities': total_opps,
-                'total_budget': total_amount,
-                'total_projects': total_projects,
-                'active_projects': active_projects,
-                'monthly_new_opportunities': monthly_opps,
-                'update_time': now.isoformat(),
-                
-                'deptTarget': dept_target,
-                'deptAchieved': dept_achieved,
-                'personalTarget': personal_target,
-                'personalAchieved': personal_achieved,
-                'todoCount': todo_count,
-                'ongoingProjects': active_projects,
-                'dailyReportCount': daily_report_count,
-                'totalCustomers': Customer.objects.count()
-            })
+            return Response(dashboard_stats.get_dashboard_stats(request.user))
         except Exception as e:
             # 即使报错也要返回 0，确保前端不崩溃
             return Response({
@@ -288,10 +249,17 @@ class OpportunityViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'customer_company', 'customer__name', 'description']
     ordering_fields = ['created_at', 'amount']
 
-    def list(self, request, *args, **kwargs):
-        print(f"DEBUG: Request Headers: {request.headers}")
-        print(f"DEBUG: Auth Header: {request.headers.get('Authorization')}")
-        return super().list(request, *args, **kwargs)
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OpportunityListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
 
     def create(self, request, *args, **kwargs):
         print(f"DEBUG: OpportunityViewSet.create data: {request.data}")
@@ -324,60 +292,45 @@ class OpportunityViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': '保存失败', 'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+TARGET_AMOUNT_FIELDS = ('target_contract_amount', 'target_gross_profit', 'target_revenue')
+# 目标金额字段 max_digits=14, decimal_places=2
+TARGET_AMOUNT_LIMIT = Decimal('1e12')
+
+
+def _decimal_amount(value):
+    """
+    金额参数转为两位小数；不是有限数字 (如 "abc"、true、NaN) 或超出字段范围时抛出 ValueError
+    """
+    if isinstance(value, bool):
+        raise ValueError(value)
+    try:
+        amount = Decimal(str(value or 0))
+    except InvalidOperation:
+        raise ValueError(value)
+    if not amount.is_finite() or abs(amount) >= TARGET_AMOUNT_LIMIT:
+        raise ValueError(value)
+    return amount.quantize(Decimal('0.01'))
+
+
+def _int_param(value):
+    """
+    请求中的整数参数 (允许数字字符串)；不是整数时返回 None
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    return None
+
+
 class PerformanceTargetViewSet(viewsets.ModelViewSet):
     queryset = PerformanceTarget.objects.all().order_by('-year', '-month')
     serializer_class = PerformanceTargetSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_fields = ['user', 'year', 'month', 'department', 'quarter', 'target_type', 'period']
 
-    @action(detail=False, methods=['post'], url_path='copy_year_targets')
-    def copy_year_targets(self, request):
-        """
-        跨年份复制业绩目标副本
-        {
-          "from_year": 2025,
-          "to_year": 2026,
-          "department": 1, (optional)
-          "user_id": 1 (optional)
-        }
-        """
-        from_year = request.data.get('from_year')
-        to_year = request.data.get('to_year')
-        dept_id = request.data.get('department')
-        user_id = request.data.get('user_id')
-
-        if not from_year or not to_year:
-            return Response({'error': '源年份和目标年份必填'}, status=400)
-
-        filters = {'year': from_year}
-        if dept_id: filters['department_id'] = dept_id
-        if user_id: filters['user_id'] = user_id
-
-        source_targets = PerformanceTarget.objects.filter(**filters)
-        if not source_targets.exists():
-            return Response({'error': '未找到源年份的数据'}, status=404)
-
-        copied_count = 0
-        for st in source_targets:
-            # 仅复制基础属性，生成新主键
-            PerformanceTarget.objects.update_or_create(
-                year=to_year,
-                period=st.period,
-                month=st.month,
-                quarter=st.quarter,
-                department=st.department,
-                user=st.user,
-                target_type=st.target_type,
-                defaults={
-                    'target_contract_amount': st.target_contract_amount,
-                    'target_gross_profit': st.target_gross_profit,
-                    'target_revenue': st.target_revenue
-                }
-            )
-            copied_count += 1
-
-        return Response({'status': 'success', 'copied': copied_count})
-
     @action(detail=False, methods=['post'], url_path='bulk_delete')
     def bulk_delete(self, request):
         """
@@ -447,26 +400,27 @@ class PerformanceTargetViewSet(viewsets.ModelViewSet):
         if not update_data:
             return Response({'error': '未提供修改内容'}, status=400)
 
-        targets = PerformanceTarget.objects.filter(id__in=ids)
-        updated_count = 0
+        # 仅允许批量修改月度目标，因为季度和年度是由月度汇总的
+        targets = list(PerformanceTarget.objects.filter(id__in=ids, period=PerformanceTarget.Period.MONTH))
+        now = timezone.now()
+        rollup = TargetRollup()
         for t in targets:
-            # 仅允许批量修改月度目标，因为季度和年度是由月度汇总的
-            if t.period != PerformanceTarget.Period.MONTH:
-                continue
-            
             for key, value in update_data.items():
                 setattr(t, key, value)
-            t.save()
-            updated_count += 1
-            # 触发汇总逻辑
-            self._trigger_aggregation(t)
+            t.updated_at = now
+            rollup.touch(t)
+
+        with transaction.atomic():
+            PerformanceTarget.objects.bulk_update(targets, list(update_data) + ['updated_at'])
+            # 触发汇总逻辑 (所有月份统一汇总一次)
+            rollup.flush()
 
-        return Response({'status': 'success', 'updated': updated_count})
+        return Response({'status': 'success', 'updated': len(targets)})
 
     @action(detail=False, methods=['post'], url_path='bulk_update_targets')
     def bulk_update_targets(self, request):
         """
-        批量更新月度业绩目标
+        批量更新月度业绩目标，并自动汇总季度 / 年度目标
         请求体：
         {
           "year": 2026,
@@ -474,175 +428,136 @@ class PerformanceTargetViewSet(viewsets.ModelViewSet):
           "user_id": 3,            # 为空表示部门总目标
           "targets": [{"month":1,"target_contract_amount":100000, ...}, ...]
         }
+        也可通过 items 一次提交多个人员 / 部门，未填写的字段沿用外层：
+        {
+          "year": 2026,
+          "items": [{"department": 1, "user_id": 3, "target_type": "INDIVIDUAL", "targets": [...]}, ...]
+        }
         """
-        year = request.data.get('year')
-        dept_id = request.data.get('department')
-        user_id = request.data.get('user_id')
-        targets = request.data.get('targets') or []
-        
-        if not year or not isinstance(targets, list):
+        from .permissions import can_manage_department
+
+        defaults = {k: request.data.get(k) for k in ('year', 'department', 'user_id', 'target_type', 'targets')}
+        items = request.data.get('items')
+        if items is None:
+            items = [{}]
+        if not isinstance(items, list) or not items:
             return Response({'error': '参数不完整'}, status=400)
-            
-        # 1. 权限校验（统一入口，支持助理同权）
-        try:
-            from .permissions import can_manage_department
-        except Exception:
-            can_manage_department = None
-        
-        dept_obj = None
-        if dept_id:
-            try:
-                dept_obj = DepartmentModel.objects.get(id=dept_id)
-            except DepartmentModel.DoesNotExist:
-                return Response({'error': '部门不存在'}, status=404)
-        
-        if can_manage_department:
-            if not can_manage_department(request.user, dept_obj):
-                return Response({'error': '仅部门负责人或管理员或授权助理可修改目标'}, status=403)
-        else:
-            # 回退：保持原有规则
-            if not request.user.is_staff:
-                if not dept_obj or dept_obj.manager != request.user:
-                    return Response({'error': '仅部门负责人或管理员可修改目标'}, status=403)
-        
-        # 助理代理：将有效用户解析为上级，用于后续聚合与下发
-        try:
-            from .permissions import resolve_effective_user
-            effective_user = resolve_effective_user(request.user)
-        except Exception:
-            effective_user = request.user
 
-        # 确定目标类型
-        target_type = request.data.get('target_type')
-        if not target_type:
-            target_type = PerformanceTarget.TargetType.INDIVIDUAL if user_id else PerformanceTarget.TargetType.DEPARTMENT
-        
-        user = None
-        department = None
-        
-        if dept_id:
+        specs = []
+        for item in items:
+            if not isinstance(item, dict):
+                return Response({'error': 'items 中的每一项必须是对象'}, status=400)
+            spec = {**defaults, **{k: v for k, v in item.items() if v is not None}}
             try:
-                if isinstance(dept_id, int) or (isinstance(dept_id, str) and dept_id.isdigit()):
-                    department = DepartmentModel.objects.filter(id=int(dept_id)).first()
-                else:
-                    department = DepartmentModel.objects.filter(name=dept_id).first()
-            except Exception:
-                pass
+                spec['year'] = int(spec.get('year'))
+            except (TypeError, ValueError):
+                return Response({'error': '参数不完整'}, status=400)
+            if spec.get('user_id') in (None, ''):
+                spec['user_id'] = None
+            else:
+                spec['user_id'] = _int_param(spec['user_id'])
+                if spec['user_id'] is None:
+                    return Response({'error': 'user_id 必须是整数'}, status=400)
+            targets = spec.get('targets') or []
+            if not isinstance(targets, list) or not all(isinstance(t, dict) for t in targets):
+                return Response({'error': 'targets 必须是对象列表'}, status=400)
+            # 月份必须为 1~12 的整数，同一人员 / 部门下不能重复
+            seen = set()
+            for target in targets:
+                if target.get('month') in (None, ''):
+                    continue
+                month = _int_param(target['month'])
+                if month is None or not 1 <= month <= 12:
+                    return Response({'error': f"月份无效: {target['month']}"}, status=400)
+                if month in seen:
+                    return Response({'error': f'月份 {month} 重复'}, status=400)
+                seen.add(month)
+                target['month'] = month
+                for field in TARGET_AMOUNT_FIELDS:
+                    try:
+                        target[field] = _decimal_amount(target.get(field))
+                    except ValueError:
+                        return Response({'error': f"{field} 金额无效: {target[field]}"}, status=400)
+            specs.append(spec)
+
+        # 1. 批量解析部门与用户 (部门支持 ID 或名称)
+        dept_refs = {str(s['department']) for s in specs if s.get('department')}
+        dept_ids = [int(r) for r in dept_refs if r.isdigit()]
+        dept_names = [r for r in dept_refs if not r.isdigit()]
+        departments = {}
+        for d in DepartmentModel.objects.filter(Q(id__in=dept_ids) | Q(name__in=dept_names)):
+            departments[str(d.id)] = d
+            departments.setdefault(d.name, d)
+
+        user_ids = {s['user_id'] for s in specs if s.get('user_id')}
+        users = User.objects.filter(id__in=user_ids).select_related('profile__department_link') if user_ids else []
+        users = {str(u.id): u for u in users}
+
+        # 2. 权限校验（统一入口，支持助理同权）
+        checked = set()
+        for ref in [str(s['department']) if s.get('department') else None for s in specs]:
+            if ref in checked:
+                continue
+            checked.add(ref)
+            if ref and ref not in departments:
+                return Response({'error': f'部门 {ref} 不存在'}, status=404)
+            if not can_manage_department(request.user, departments.get(ref)):
+                return Response({'error': '仅部门负责人或管理员或授权助理可修改目标'}, status=403)
 
-        # 强制逻辑：目标类型与归属关联
-        if target_type == PerformanceTarget.TargetType.COMPANY:
+        # 3. 构建月度目标
+        months = []
+        for spec in specs:
+            user_id = spec.get('user_id')
+            target_type = spec.get('target_type')
+            if not target_type:
+                target_type = PerformanceTarget.TargetType.INDIVIDUAL if user_id else PerformanceTarget.TargetType.DEPARTMENT
+            department = departments.get(str(spec['department'])) if spec.get('department') else None
             user = None
-            department = None
-        elif target_type == PerformanceTarget.TargetType.DEPARTMENT:
-            user = None
-            # 如果是部门目标但没找到部门，报错
-            if not department and dept_id:
-                return Response({'error': f'部门 {dept_id} 不存在'}, status=404)
-        elif user_id:
-            try:
-                user = User.objects.get(id=user_id)
-                # 如果是个人目标且没传部门，尝试从用户 Profile 获取
-                if not department and hasattr(user, 'profile') and user.profile.department_link:
-                    department = user.profile.department_link
-            except User.DoesNotExist:
-                return Response({'error': '用户不存在'}, status=404)
-        
-        updated = 0
-        errors = []
-        
-        # 使用事务确保数据一致性
-        from django.db import transaction
-        try:
-            with transaction.atomic():
-                # 1. 先清理该维度下已存在的旧数据，防止 get() 返回多条记录的冲突
-                PerformanceTarget.objects.filter(
-                    target_type=target_type,
-                    year=year,
-                    user=user,
-                    department=department
-                ).delete()
 
-                # 2. 重新创建 12 个月度目标
-                for item in targets:
-                    month = item.get('month')
-                    if not month: continue
-                    
-                    contract = item.get('target_contract_amount', 0) or 0
-                    profit = item.get('target_gross_profit', 0) or 0
-                    revenue = item.get('target_revenue', 0) or 0
-                    quarter = (month - 1) // 3 + 1
-                    
-                    PerformanceTarget.objects.create(
-                        target_type=target_type,
-                        period=PerformanceTarget.Period.MONTH,
-                        year=year,
-                        month=month,
-                        quarter=quarter,
-                        user=user,
-                        department=department,
-                        target_contract_amount=contract,
-                        target_gross_profit=profit,
-                        target_revenue=revenue
-                    )
-                    updated += 1
-
-                # 3. 自动汇总并创建 4 个季度目标和 1 个年度目标
-                all_months = PerformanceTarget.objects.filter(
+            # 强制逻辑：目标类型与归属关联
+            if target_type == PerformanceTarget.TargetType.COMPANY:
+                department = None
+            elif target_type == PerformanceTarget.TargetType.DEPARTMENT:
+                pass
+            elif user_id:
+                user = users.get(str(user_id))
+                if not user:
+                    return Response({'error': '用户不存在'}, status=404)
+                # 如果是个人目标且没传部门，尝试从用户 Profile 获取
+                profile = getattr(user, 'profile', None)
+                if not department and profile and profile.department_link_id:
+                    department = profile.department_link
+
+            for item in spec.get('targets') or []:
+                month = item.get('month')
+                if month in (None, ''):
+                    continue
+                months.append(PerformanceTarget(
                     target_type=target_type,
                     period=PerformanceTarget.Period.MONTH,
-                    year=year,
-                    user=user,
-                    department=department
-                )
-                
-                # 按季度汇总
-                for q in range(1, 5):
-                    q_months = all_months.filter(quarter=q)
-                    q_contract = sum(m.target_contract_amount for m in q_months)
-                    q_profit = sum(m.target_gross_profit for m in q_months)
-                    q_revenue = sum(m.target_revenue for m in q_months)
-                    
-                    if q_months.exists():
-                        PerformanceTarget.objects.update_or_create(
-                            target_type=target_type,
-                            period=PerformanceTarget.Period.QUARTER,
-                            year=year,
-                            month=None,      # 季度目标月份为空
-                            quarter=q,
-                            user=user,
-                            department=department,
-                            defaults={
-                                'target_contract_amount': q_contract,
-                                'target_gross_profit': q_profit,
-                                'target_revenue': q_revenue
-                            }
-                        )
-
-                # 年度汇总
-                y_contract = sum(m.target_contract_amount for m in all_months)
-                y_profit = sum(m.target_gross_profit for m in all_months)
-                y_revenue = sum(m.target_revenue for m in all_months)
-                
-                PerformanceTarget.objects.update_or_create(
-                    target_type=target_type,
-                    period=PerformanceTarget.Period.YEAR,
-                    year=year,
-                    month=None,      # 年度目标月份为空
-                    quarter=None,    # 年度目标季度为空
+                    year=spec['year'],
+                    month=month,
+                    quarter=(month - 1) // 3 + 1,
                     user=user,
                     department=department,
-                    defaults={
-                        'target_contract_amount': y_contract,
-                        'target_gross_profit': y_profit,
-                        'target_revenue': y_revenue
-                    }
-                )
+                    target_contract_amount=_decimal_amount(item.get('target_contract_amount')),
+                    target_gross_profit=_decimal_amount(item.get('target_gross_profit')),
+                    target_revenue=_decimal_amount(item.get('target_revenue')),
+                ))
+
+        if len({natural_key(t) for t in months}) != len(months):
+            return Response({'error': '同一人员 / 部门的月份在多个条目中重复'}, status=400)
+
+        # 4. 内存中汇总季度 / 年度目标，与月度目标一并写入；该维度下未提交的旧数据 (含重复记录) 一并清理
+        try:
+            upsert_targets(months + summarize(months), prune=True)
         except Exception as e:
             return Response({'error': f'批量更新失败: {str(e)}'}, status=500)
 
+        year = specs[0]['year']
         return Response({
             'status': 'success',
-            'updated_months': updated,
+            'updated_months': len(months),
             'message': f'已成功更新 {year} 年度的月度、季度及年度目标'
         })
 
@@ -650,195 +565,52 @@ class PerformanceTargetViewSet(viewsets.ModelViewSet):
     def copy_year_targets(self, request):
         """
         将某一年的目标复制到另一年
+        {
+          "from_year": 2025,
+          "to_year": 2026,
+          "department": 1,          (optional，多个部门使用 "departments": [1, 2])
+          "user_id": 1              (optional，多个人员使用 "user_ids": [1, 2])
+        }
         """
-        from_year = request.data.get('from_year')
-        to_year = request.data.get('to_year')
+        try:
+            from_year = int(request.data.get('from_year'))
+            to_year = int(request.data.get('to_year'))
+        except (TypeError, ValueError):
+            return Response({'error': '源年份和目标年份必填'}, status=400)
+
         dept_id = request.data.get('department')
         user_id = request.data.get('user_id')
-
-        if not from_year or not to_year:
-            return Response({'error': '源年份和目标年份必填'}, status=400)
+        dept_ids = request.data.get('departments') or ([dept_id] if dept_id else [])
+        user_ids = request.data.get('user_ids') or ([user_id] if user_id else [])
 
         filters = {'year': from_year}
-        if dept_id: filters['department_id'] = dept_id
-        if user_id: filters['user_id'] = user_id
+        if dept_ids: filters['department_id__in'] = dept_ids
+        if user_ids: filters['user_id__in'] = user_ids
 
-        source_targets = PerformanceTarget.objects.filter(**filters)
-        if not source_targets.exists():
+        source_targets = list(PerformanceTarget.objects.filter(**filters))
+        if not source_targets:
             return Response({'error': '未找到源年份的数据'}, status=404)
 
-        copied_count = 0
-        for st in source_targets:
-            PerformanceTarget.objects.update_or_create(
+        # 仅复制基础属性，按唯一键批量写入
+        copies = [
+            PerformanceTarget(
                 year=to_year,
                 period=st.period,
                 month=st.month,
                 quarter=st.quarter,
-                department=st.department,
-                user=st.user,
+                department_id=st.department_id,
+                user_id=st.user_id,
                 target_type=st.target_type,
-                defaults={
-                    'target_contract_amount': st.target_contract_amount,
-                    'target_gross_profit': st.target_gross_profit,
-                    'target_revenue': st.target_revenue
-                }
+                target_contract_amount=st.target_contract_amount,
+                target_gross_profit=st.target_gross_profit,
+                target_revenue=st.target_revenue
             )
-            copied_count += 1
+            for st in source_targets
+        ]
+        copied_count = upsert_targets(copies)
 
         return Response({'status': 'success', 'copied': copied_count})
 
-    def _trigger_aggregation(self, instance):
-        """
-        自动汇总逻辑：
-        1. 维度聚合：如果更新了个人目标，汇总到部门目标 (由业务规则决定：部门总目标 >= 个人总和)
-        2. 时间聚合：月度 -> 季度 -> 年度
-        3. 经理规则：如果更新了部门目标或非经理个人目标，自动调整该部门经理的个人目标
-        """
-        if instance.period != PerformanceTarget.Period.MONTH:
-            return
-
-        # 1. 自动调整经理目标 (如果适用)
-        self._apply_manager_rule(instance)
-
-        # 2. 时间维度聚合 (当前更新的对象)
-        self._update_time_aggregation(instance)
-        
-        # 3. 如果变动的是个人目标，触发部门的时间维度汇总更新
-        if instance.target_type == PerformanceTarget.TargetType.INDIVIDUAL and instance.department:
-            dept_target = PerformanceTarget.objects.filter(
-                target_type=PerformanceTarget.TargetType.DEPARTMENT,
-                period=PerformanceTarget.Period.MONTH,
-                year=instance.year,
-                month=instance.month,
-                department=instance.department
-            ).first()
-            if dept_target:
-                self._update_time_aggregation(dept_target)
-
-    def _apply_manager_rule(self, instance):
-        """
-        部门经理的个人目标 = 部门总目标数 - 部门其他人总目标数
-        """
-        if not instance.department:
-            return
-
-        dept_manager = instance.department.manager
-        if not dept_manager:
-            return
-
-        # 获取该部门、同年、同月的部门总目标
-        dept_target = PerformanceTarget.objects.filter(
-            target_type=PerformanceTarget.TargetType.DEPARTMENT,
-            period=PerformanceTarget.Period.MONTH,
-            year=instance.year,
-            month=instance.month,
-            department=instance.department
-        ).first()
-
-        if not dept_target:
-            return
-
-        # 汇总除经理以外的所有个人目标
-        others_totals = PerformanceTarget.objects.filter(
-            target_type=PerformanceTarget.TargetType.INDIVIDUAL,
-            period=PerformanceTarget.Period.MONTH,
-            year=instance.year,
-            month=instance.month,
-            department=instance.department
-        ).exclude(user=dept_manager).aggregate(
-            t_contract=Sum('target_contract_amount'),
-            t_profit=Sum('target_gross_profit'),
-            t_revenue=Sum('target_revenue')
-        )
-
-        # 经理个人目标 = 部门总目标 - 其他人总和 (不小于0)
-        quarter = (instance.month - 1) // 3 + 1
-        manager_target, created = PerformanceTarget.objects.update_or_create(
-            target_type=PerformanceTarget.TargetType.INDIVIDUAL,
-            period=PerformanceTarget.Period.MONTH,
-            year=instance.year,
-            month=instance.month,
-            quarter=quarter,
-            user=dept_manager,
-            department=instance.department,
-            defaults={
-                'target_contract_amount': max(0, dept_target.target_contract_amount - (others_totals['t_contract'] or 0)),
-                'target_gross_profit': max(0, dept_target.target_gross_profit - (others_totals['t_profit'] or 0)),
-                'target_revenue': max(0, dept_target.target_revenue - (others_totals['t_revenue'] or 0))
-            }
-        )
-        
-        # 经理目标变动，触发经理的时间维度汇总
-        self._update_time_aggregation(manager_target)
-
-    def _update_time_aggregation(self, instance):
-        """
-        汇总月度到季度和年度
-        """
-        from django.db.models import Sum
-        if instance.period != PerformanceTarget.Period.MONTH:
-            return
-
-        # 汇总到季度
-        q_start = (instance.quarter - 1) * 3 + 1
-        q_end = instance.quarter * 3
-        q_totals = PerformanceTarget.objects.filter(
-            target_type=instance.target_type,
-            period=PerformanceTarget.Period.MONTH,
-            year=instance.year,
-            month__gte=q_start,
-            month__lte=q_end,
-            user=instance.user,
-            department=instance.department
-        ).aggregate(
-            t_contract=Sum('target_contract_amount'),
-            t_profit=Sum('target_gross_profit'),
-            t_revenue=Sum('target_revenue')
-        )
-        
-        PerformanceTarget.objects.update_or_create(
-            target_type=instance.target_type,
-            period=PerformanceTarget.Period.QUARTER,
-            year=instance.year,
-            quarter=instance.quarter,
-            month=None,
-            user=instance.user,
-            department=instance.department,
-            defaults={
-                'target_contract_amount': q_totals['t_contract'] or 0,
-                'target_gross_profit': q_totals['t_profit'] or 0,
-                'target_revenue': q_totals['t_revenue'] or 0
-            }
-        )
-
-        # 汇总到年度
-        y_totals = PerformanceTarget.objects.filter(
-            target_type=instance.target_type,
-            period=PerformanceTarget.Period.MONTH,
-            year=instance.year,
-            user=instance.user,
-            department=instance.department
-        ).aggregate(
-            t_contract=Sum('target_contract_amount'),
-            t_profit=Sum('target_gross_profit'),
-            t_revenue=Sum('target_revenue')
-        )
-        
-        PerformanceTarget.objects.update_or_create(
-            target_type=instance.target_type,
-            period=PerformanceTarget.Period.YEAR,
-            year=instance.year,
-            month=None,
-            quarter=None,
-            user=instance.user,
-            department=instance.department,
-            defaults={
-                'target_contract_amount': y_totals['t_contract'] or 0,
-                'target_gross_profit': y_totals['t_profit'] or 0,
-                'target_revenue': y_totals['t_revenue'] or 0
-            }
-        )
-        
     def destroy(self, request, *args, **kwargs):
         """
         重写删除方法，实现级联删除
@@ -944,6 +716,7 @@ class ContactViewSet(viewsets.ModelViewSet):
             customer_name=customer_name,
             deleted_by=self.request.user,
             original_data={
+                'id': instance.pk,
                 'name': instance.name,
                 'phone': instance.phone,
                 'email': instance.email,
@@ -1134,6 +907,43 @@ class AIConfigsListView(APIView):
         serializer = AIConfigurationSerializer(configs, many=True)
         return Response({'results': serializer.data})
 
+class AIBatchParseView(APIView):
+    """
+    批量 AI 解析：同一实体类型的多条文本并发解析，结果以 NDJSON 逐行返回
+    请求：{"entity": "opportunity", "texts": [...], "pack": false, "config_id": null}
+    每行：{"index": 0, "result": {...}}，最后一行 {"done": true, "total": n, "failed": k}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        entity = request.data.get('entity')
+        texts = request.data.get('texts')
+        if entity not in ai_batch.PARSERS:
+            return Response({'error': f'不支持的实体类型: {entity}'}, status=400)
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) and t.strip() for t in texts):
+            return Response({'error': 'texts 必须为非空文本列表'}, status=400)
+        max_items = getattr(settings, 'AI_BATCH_MAX_ITEMS', 500)
+        if len(texts) > max_items:
+            return Response({'error': f'单次最多解析 {max_items} 条'}, status=400)
+
+        pack = str(request.data.get('pack', '')).lower() in ('1', 'true', 'yes')
+        use_cache = str(request.data.get('no_cache', '')).lower() not in ('1', 'true', 'yes')
+        results = ai_batch.parse_many(
+            entity, texts, user=request.user, config_id=request.data.get('config_id'), pack=pack, use_cache=use_cache,
+        )
+
+        def lines():
+            failed = 0
+            for index, result in results:
+                if not isinstance(result, dict) or 'error' in result:
+                    failed += 1
+                yield json.dumps({'index': index, 'result': result}, ensure_ascii=False, default=str) + '\n'
+            yield json.dumps({'done': True, 'total': len(texts), 'failed': failed}) + '\n'
+
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson; charset=utf-8')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class AIConnectionTestView(APIView):
     """
     测试AI连接
@@ -1156,9 +966,27 @@ class AIConnectionTestView(APIView):
         except Exception as e:
             return Response({'status': 'error', 'message': f'连接失败: {str(e)}'}, status=500)
 
+def _sse_event(data, event=None):
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
+
+
+def _sse_chat_stream(service, message, history):
+    """
+    将模型增量包装为 SSE：data: {"delta": "..."}，结束时发送 done 事件，出错时发送 error 事件
+    """
+    try:
+        for delta in service.stream_chat("You are a helpful assistant.", message, history=history):
+            yield _sse_event({'delta': delta})
+        yield _sse_event({}, event='done')
+    except Exception as e:
+        yield _sse_event({'error': f"Error calling LLM: {str(e)}"}, event='error')
+
+
 class ChatView(APIView):
     """
     智能对话接口
+    stream=true 时以 SSE (text/event-stream) 逐段返回，避免整段生成期间前端无响应
     """
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1171,6 +999,16 @@ class ChatView(APIView):
             return Response({'error': '请输入消息'}, status=400)
             
         service = AIService(config_id=config_id)
+        if str(request.data.get('stream', '')).lower() in ('1', 'true', 'yes'):
+            if not service.config:
+                return Response({'error': 'No active AI configuration found.'}, status=400)
+            response = StreamingHttpResponse(
+                _sse_chat_stream(service, message, history), content_type='text/event-stream; charset=utf-8'
+            )
+            response['Cache-Control'] = 'no-cache'
+            # 关闭 nginx 代理缓冲，保证增量即时下发
+            response['X-Accel-Buffering'] = 'no'
+            return response
         try:
             # Simple wrapper for chat
             response = service._call_llm("You are a helpful assistant.", message, history=history)
@@ -1191,101 +1029,23 @@ class PerformanceReportView(APIView):
         - status_distribution: 每阶段数量与金额
         - groups: 按部门或销售分组聚合
         - monthly: 最近6个月趋势，键包含 count/signed/revenue/gross
+        支持 year / quarter / month 任意统计窗口 (month 优先)
         """
         now = timezone.now()
-        year = int(request.query_params.get('year', now.year))
-        month = request.query_params.get('month')
-        month = int(month) if month else None
+        try:
+            year = int(request.query_params.get('year') or now.year)
+            month = request.query_params.get('month')
+            month = int(month) if month else None
+            quarter = request.query_params.get('quarter')
+            quarter = int(quarter) if quarter else None
+        except ValueError:
+            return Response({'error': '年份/季度/月份参数无效'}, status=400)
+        if (month and not 1 <= month <= 12) or (quarter and not 1 <= quarter <= 4):
+            return Response({'error': '年份/季度/月份参数无效'}, status=400)
         group_by = request.query_params.get('group_by', 'department')
-        
-        # 时间范围：仅当前年，若有月份则限定到该月
-        base_qs = Opportunity.objects.filter(created_at__year=year)
-        if month:
-            base_qs = base_qs.filter(created_at__month=month)
-        
-        # totals
-        pipeline = float(base_qs.aggregate(total=Sum('amount'))['total'] or 0)
-        signed_stages = ['SIGNED', 'DELIVERY', 'AFTER_SALES', 'WON', 'COMPLETED']
-        signed = float(base_qs.filter(stage__in=signed_stages).aggregate(total=Sum('amount'))['total'] or 0)
-        revenue = float(base_qs.aggregate(total=Sum('collected_amount'))['total'] or 0)
-        gross = float(base_qs.aggregate(total=Sum('profit'))['total'] or 0)
-        
-        # targets
-        targets_qs = PerformanceTarget.objects.filter(year=year)
-        if month:
-            targets_qs = targets_qs.filter(month=month, period=PerformanceTarget.Period.MONTH)
-        else:
-            targets_qs = targets_qs.filter(period=PerformanceTarget.Period.YEAR)
-        
-        target_stats = targets_qs.filter(target_type=PerformanceTarget.TargetType.DEPARTMENT).aggregate(
-            t_contract=Sum('target_contract_amount'),
-            t_revenue=Sum('target_revenue'),
-            t_gross=Sum('target_gross_profit')
-        )
-        t_contract = float(target_stats['t_contract'] or 0)
-        t_revenue = float(target_stats['t_revenue'] or 0)
-        t_gross = float(target_stats['t_gross'] or 0)
-        
-        # status_distribution
-        status_distribution = []
-        for s in base_qs.values('stage').annotate(count=Count('id'), total=Sum('amount')):
-            status_distribution.append({
-                'status': dict(Opportunity.Stage.choices).get(s['stage'], s['stage']),
-                'count': s['count'],
-                'total': float(s['total'] or 0)
-            })
-        
-        # groups
-        if group_by == 'user':
-            groups = list(
-                base_qs.values('sales_manager__username')
-                .annotate(
-                    count=Count('id'),
-                    signed=Sum('amount', filter=Q(stage__in=signed_stages))
-                )
-            )
-        else:
-            # 优先使用新部门字段 department_link__name
-            groups = list(
-                base_qs.values('sales_manager__profile__department_link__name')
-                .annotate(
-                    count=Count('id'),
-                    signed=Sum('amount', filter=Q(stage__in=signed_stages))
-                )
-            )
-            # 兼容旧字段：如果没有新部门字段，则尝试旧字段 (此逻辑在 values 中较难直接表达，此处先取新字段)
-        
-        # monthly trend: 最近6个月
-        monthly = []
-        for i in range(5, -1, -1):
-            d = now - timedelta(days=i * 30)
-            y, m = d.year, d.month
-            m_qs = Opportunity.objects.filter(created_at__year=y, created_at__month=m)
-            monthly.append({
-                'month': f"{y}-{m:02d}",
-                'count': m_qs.count(),
-                'signed': float(m_qs.filter(stage__in=signed_stages).aggregate(total=Sum('amount'))['total'] or 0),
-                'revenue': float(m_qs.aggregate(total=Sum('collected_amount'))['total'] or 0),
-                'gross': float(m_qs.aggregate(total=Sum('profit'))['total'] or 0),
-            })
-        
-        return Response({
-            'totals': {
-                'pipeline': pipeline,
-                'signed': signed,
-                'revenue': revenue,
-                'gross': gross,
-                'opp_count': base_qs.count(),
-            },
-            'targets': {
-                't_signed': t_contract,
-                't_revenue': t_revenue,
-                't_gross': t_gross,
-            },
-            'status_distribution': status_distribution,
-            'groups': groups,
-            'monthly': monthly,
-        })
+
+        report = PerformanceReport(year, month=month, quarter=quarter, group_by=group_by, now=now)
+        return Response(report.build())
 
 class CompetitionViewSet(viewsets.ModelViewSet):
     queryset = Competition.objects.all().order_by('-created_at')
@@ -1369,66 +1129,14 @@ class AgentRouterView(APIView):
         if not task:
             return Response({'error': 'Task description is required'}, status=400)
             
-        service = AIService(config_id=config_id)
+        use_cache = str(request.data.get('no_cache', '')).lower() not in ('1', 'true', 'yes')
+        service = AIService(config_id=config_id, use_cache=use_cache)
         user = request.user
         
         print(f"--- [AgentRouter] Processing Task: {task} ---")
         
-        # 1. Analyze Intent
-        try:
-            task_analysis = service.parse_task(task, user=user)
-            intent_raw = task_analysis.get('intent', 'other')
-            print(f"--- [AgentRouter] Intent Analysis Result: {task_analysis} ---")
-        except Exception as e:
-            print(f"--- [AgentRouter] Intent Analysis Failed: {e} ---")
-            intent_raw = 'other'
-        
-        response_data = {
-            'intent': '',
-            'entity': '',
-            'fields': {},
-            'filters': {},
-            'alternatives': [],
-            'warnings': []
-        }
-        
-        # Map intents
-        if intent_raw == 'create_customer':
-            response_data['intent'] = 'create'
-            response_data['entity'] = 'customer'
-            response_data['fields'] = service.parse_customer(task, user=user)
-            
-        elif intent_raw == 'create_opportunity':
-            response_data['intent'] = 'create'
-            response_data['entity'] = 'opportunity'
-            response_data['fields'] = service.parse_opportunity(task, user=user)
-            
-        elif intent_raw == 'create_todo':
-            response_data['intent'] = 'create'
-            response_data['entity'] = 'todo'
-            response_data['fields'] = service.parse_todo_task(task, user=user)
-        
-        # Fallback/Extended Logic for Competition and Activity
-        if not response_data['intent']:
-            print("--- [AgentRouter] Using Fallback Regex Logic ---")
-            import re
-            if re.search(r'(?:新建|创建|新增|录入).*(?:赛事|比赛)', task):
-                 response_data['intent'] = 'create'
-                 response_data['entity'] = 'competition'
-                 response_data['fields'] = service.parse_competition(task, user=user)
-            elif re.search(r'(?:新建|创建|新增|录入).*(?:活动)', task):
-                 response_data['intent'] = 'create'
-                 response_data['entity'] = 'activity'
-                 response_data['fields'] = service.parse_market_activity(task, user=user)
-            # Fallback for customer if parse_task failed but regex matches
-            elif re.search(r'(?:新建|创建|新增|录入).*(?:客户|公司|企业)', task):
-                 response_data['intent'] = 'create'
-                 response_data['entity'] = 'customer'
-                 response_data['fields'] = service.parse_customer(task, user=user)
-            elif re.search(r'(?:新建|创建|新增|录入).*(?:商机|机会)', task):
-                 response_data['intent'] = 'create'
-                 response_data['entity'] = 'opportunity'
-                 response_data['fields'] = service.parse_opportunity(task, user=user)
+        # 本地预分类 + 并发抽取，见 services/agent_router
+        response_data = agent_router.route(service, task, user=user)
 
         print(f"--- [AgentRouter] Final Response: {response_data} ---")
         return Response(response_data)
@@ -1438,6 +1146,49 @@ class SubmissionLogViewSet(viewsets.ModelViewSet):
     serializer_class = SubmissionLogSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    @action(detail=False, methods=['get'])
+    def telemetry(self, request):
+        """
+        模型调用遥测汇总：按 group_by (默认 intent,entity,provider) 分组的 p50/p95/p99 耗时、耗时分布、Token 与费用
+        可选参数：start_date / end_date (YYYY-MM-DD，默认最近 7 天)、intent、entity、provider
+        cache (命中计数) 与 providers (熔断状态) 是处理本次请求的 worker 进程内的状态，放在 worker 下并标明主机与进程号
+        """
+        import socket
+        from django.utils.dateparse import parse_date
+        from .services import llm_cache, llm_router, llm_telemetry
+
+        params = request.query_params
+        dates = {}
+        for name in ('start_date', 'end_date'):
+            if params.get(name):
+                try:
+                    dates[name] = parse_date(params[name])
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    return Response({'error': f'{name} 格式应为 YYYY-MM-DD'}, status=400)
+        qs = SubmissionLog.objects.all()
+        if dates.get('start_date'):
+            qs = qs.filter(created_at__date__gte=dates['start_date'])
+        else:
+            qs = qs.filter(created_at__gte=timezone.now() - timedelta(days=7))
+        if dates.get('end_date'):
+            qs = qs.filter(created_at__date__lte=dates['end_date'])
+        for field in ('intent', 'entity', 'provider'):
+            if params.get(field):
+                qs = qs.filter(**{field: params[field]})
+        group_by = [f.strip() for f in params.get('group_by', 'intent,entity,provider').split(',') if f.strip()]
+        return Response({
+            'group_by': [f for f in group_by if f in llm_telemetry.GROUP_FIELDS],
+            'groups': llm_telemetry.summarize(qs, group_by),
+            'worker': {
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'cache': llm_cache.stats(),
+                'providers': llm_router.snapshot(),
+            },
+        })
+
 class ActivityLogViewSet(viewsets.ModelViewSet):
     """
     管理员日志查询：支持按时间、部门、用户、类型筛选
@@ -1456,10 +1207,8 @@ class ActivityLogViewSet(viewsets.ModelViewSet):
         end_date = self.request.query_params.get('end_date')
         actor_name = self.request.query_params.get('actor_name')
 
-        if start_date:
-            qs = qs.filter(created_at__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(created_at__date__lte=end_date)
+        # 日期转换为 created_at 范围条件，可使用 (created_at, type) 索引
+        qs = activity_log_store.filter_dates(qs, start_date, end_date)
         if actor_name:
             from django.db.models import Q
             qs = qs.filter(
@@ -1472,53 +1221,36 @@ class ActivityLogViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
-        简单统计：按类型与部门聚合计数
+        简单统计：按类型与部门聚合计数 (读取按天汇总，见 services/activity_log_store)
         """
-        from django.db.models import Count
-        type_stats = ActivityLog.objects.values('type').annotate(count=Count('id')).order_by('-count')
-        # 优先使用冗余字段统计部门
-        dept_stats = ActivityLog.objects.exclude(department='').values('department').annotate(count=Count('id')).order_by('-count')
-        
-        # 如果冗余字段统计为空，尝试使用关联表统计 (兼容旧数据)
-        if not dept_stats.exists():
-            dept_stats = ActivityLog.objects.filter(actor__profile__department_link__isnull=False).values('actor__profile__department_link__name').annotate(count=Count('id')).order_by('-count')
-            
-        return Response({'type_stats': list(type_stats), 'dept_stats': list(dept_stats)})
+        return Response(activity_log_store.stats())
 
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
         """
-        导出日志为 CSV
+        导出日志 (流式，见 services/export)：参数 file_format 为 csv (默认) / csv.gz / xlsx
         """
-        import csv
-        from django.http import HttpResponse
-        
-        # 获取筛选后的 queryset
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="system_logs.csv"'
-        response.write('\ufeff'.encode('utf8')) # BOM for Excel
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', '类型', '动作', '内容', '操作人', '部门', '时间'])
-        
-        for log in queryset:
-            actor_name = f"{log.actor.last_name}{log.actor.first_name}" if log.actor else "系统"
-            if not actor_name.strip() and log.actor:
-                actor_name = log.actor.username
-                
-            writer.writerow([
-                log.id,
-                log.get_type_display(),
-                log.action,
-                log.content,
-                actor_name,
-                log.department,
-                log.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-            
-        return response
+        fmt = request.query_params.get('file_format') or export_service.CSV
+        if fmt not in export_service.FORMATS:
+            return Response({'error': f"不支持的导出格式: {fmt}", 'formats': list(export_service.FORMATS)}, status=400)
+
+        # 获取筛选后的 queryset；操作人显示为 姓名，无姓名时为用户名，无操作人时为“系统” (在 SQL 中计算)
+        queryset = self.filter_queryset(self.get_queryset()).annotate(
+            actor_name=Coalesce(
+                NullIf(Concat('actor__last_name', 'actor__first_name'), Value('')),
+                'actor__username', Value('系统'),
+            ),
+        )
+        return export_service.response(queryset, [
+            ('ID', 'id', None),
+            ('类型', 'type', export_service.choices(ActivityLog.Type.choices)),
+            ('动作', 'action', None),
+            ('内容', 'content', None),
+            ('操作人', 'actor_name', None),
+            ('部门', 'department', None),
+            ('时间', 'created_at', None),
+        ], 'system_logs', fmt)
+
 class AIConfigurationViewSet(viewsets.ModelViewSet):
     queryset = AIConfiguration.objects.all().order_by('-is_active', '-created_at')
     serializer_class = AIConfigurationSerializer
@@ -1554,7 +1286,7 @@ class AIConfigurationViewSet(viewsets.ModelViewSet):
         """
         config = self.get_object()
         # 仅将当前用户的配置设为非激活
-        AIConfiguration.objects.filter(user=self.request.user).update(is_active=False)
+        AIConfiguration.objects.filter(user=self.request.user).update(is_active=False, updated_at=timezone.now())
         config.is_active = True
         config.save()
         return Response({'status': 'success', 'message': f'已将 {config.name} 设为默认配置'})
@@ -1801,108 +1533,79 @@ class DataManagementViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['post'])
     def backup(self, request):
-        """执行全量数据库备份"""
-        timestamp = time.strftime('%Y%m%d_%H%M%S')
-        
-        try:
-            # 优先尝试 django dumpdata，因为它不依赖外部 pg_dump 工具，在容器内更可靠
-            backup_filename = f"db_backup_{timestamp}.json"
-            backup_path = f"/tmp/{backup_filename}"
-            
-            # 使用 subprocess 调用 manage.py dumpdata
-            # 排除不必要的系统表，这些表在导入时容易发生冲突
-            exclude_args = [
-                "--exclude", "contenttypes", 
-                "--exclude", "auth.Permission", 
-                "--exclude", "admin.logentry",
-                "--exclude", "sessions.session",
-                "--exclude", "core.SubmissionLog", # 提交日志通常较大且不重要
-                "--exclude", "core.ActivityLog"    # 活动日志也较大
-            ]
-            
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                # 使用 sys.executable 确保使用当前环境的 Python 解释器
-                result = subprocess.run(
-                    [sys.executable, "manage.py", "dumpdata", "--indent", "2"] + exclude_args,
-                    stdout=f,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-            
-            if result.returncode != 0:
-                return Response({
-                    'error': '数据导出失败',
-                    'detail': result.stderr
-                }, status=500)
-
-            # 检查文件是否生成且非空
-            if not os.path.exists(backup_path) or os.path.getsize(backup_path) == 0:
-                return Response({'error': '生成的备份文件为空，请检查数据库连接'}, status=500)
-
-            response = FileResponse(
-                open(backup_path, 'rb'), 
-                as_attachment=True, 
-                filename=backup_filename,
-                content_type='application/json'
-            )
-            return response
-        except Exception as e:
-            import traceback
-            return Response({
-                'error': f'备份执行异常: {str(e)}',
-                'traceback': traceback.format_exc()
-            }, status=500)
+        """
+        全量数据库备份：进程内流式导出 (见 services/backup)，不再启动 dumpdata 子进程
+        参数 format: json.gz (默认，gzip 压缩的 JSON 数组) 或 jsonl；两者均可用 restore 导入 (全量备份也可用 loaddata)
+        参数 mode: full (默认) 或 incremental (只导出上一次备份之后的变更与删除标记)
+        响应头 X-Job-Id 对应 /api/jobs/<id>/ 中的导出进度
+        """
+        fmt = request.data.get('format') or backup_service.DEFAULT_FORMAT
+        if fmt not in backup_service.FORMATS:
+            return Response({'error': f"不支持的备份格式: {fmt}", 'formats': list(backup_service.FORMATS)}, status=400)
+        mode = str(request.data.get('mode') or 'full').upper()
+        if mode not in BackupRecord.Kind.values:
+            return Response({'error': f"不支持的备份方式: {mode}"}, status=400)
+
+        record = backup_service.start(mode, user=request.user)
+        if record is None:
+            return Response({'error': '尚无成功的备份记录，请先执行一次全量备份'}, status=400)
+        job_id = background.track('backup', user=request.user)
+        response = StreamingHttpResponse(
+            backup_service.stream(fmt, job_id=job_id, record=record),
+            content_type=backup_service.FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{backup_service.filename(fmt, record=record)}"'
+        response['X-Job-Id'] = job_id
+        response['X-Backup-Id'] = str(record.pk)
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
     @action(detail=False, methods=['post'])
     def restore(self, request):
-        """恢复数据库备份"""
+        """
+        恢复数据库备份：上传文件写入 BACKUP_UPLOAD_DIR 后由后台任务流式恢复 (见 services/restore)，返回任务 ID
+        支持 .json / .jsonl 及其 gzip 压缩文件；进度与结果见 /api/jobs/<id>/
+        """
         if 'file' not in request.FILES:
             return Response({'error': '请上传备份文件 (.json)'}, status=400)
         
         backup_file = request.FILES['file']
-        if not backup_file.name.endswith('.json'):
-            return Response({'error': '仅支持 .json 格式的备份文件'}, status=400)
+        suffix = next((s for s in ('.json.gz', '.jsonl.gz', '.jsonl', '.json') if backup_file.name.endswith(s)), None)
+        if not suffix:
+            return Response({'error': '仅支持 .json / .jsonl / .json.gz 格式的备份文件'}, status=400)
         
-        temp_path = f"/tmp/restore_{int(time.time())}.json"
+        # 由 job_worker 进程执行恢复，上传文件须写入 web 与 job_worker 共享的目录
+        os.makedirs(settings.BACKUP_UPLOAD_DIR, exist_ok=True)
+        temp_path = os.path.join(settings.BACKUP_UPLOAD_DIR, f"restore_{int(time.time())}_{uuid.uuid4().hex}{suffix}")
         
         try:
-            # 保存上传的文件到临时目录
+            # 保存上传的文件到共享目录
             with open(temp_path, 'wb+') as destination:
                 for chunk in backup_file.chunks():
                     destination.write(chunk)
-            
-            # 执行 loaddata
-            result = subprocess.run(
-                [sys.executable, "manage.py", "loaddata", temp_path],
-                capture_output=True,
-                text=True
-            )
-            
-            # 删除临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
-            if result.returncode != 0:
-                return Response({
-                    'error': '数据恢复失败',
-                    'detail': result.stderr
-                }, status=500)
-            
-            return Response({
-                'message': '数据恢复成功',
-                'detail': result.stdout
-            })
-            
         except Exception as e:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
             return Response({'error': f'恢复执行异常: {str(e)}'}, status=500)
 
+        job_id = background.submit('restore', restore_service.restore_file, temp_path, remove=True, user=request.user)
+        return Response({'message': '数据恢复已开始', 'job_id': job_id}, status=202)
+
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """获取备份历史 (简化版)"""
+        """获取备份历史 (最近 50 次)"""
+        records = BackupRecord.objects.select_related('created_by')[:50]
         return Response([
-            { 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'type': '备份', 'operator': request.user.username, 'status': '成功', 'remark': '手动触发全量备份' }
+            {
+                'id': r.pk,
+                'time': timezone.localtime(r.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'type': r.get_kind_display(),
+                'operator': r.created_by.username if r.created_by else '',
+                'status': r.get_status_display(),
+                'remark': f"{r.records} 条记录" + (f"，{r.tombstones} 个删除标记" if r.tombstones else '')
+                          + (f"，基于备份 #{r.parent_id}" if r.parent_id else ''),
+            }
+            for r in records
         ])
 
 class DailyReportViewSet(viewsets.ModelViewSet):
@@ -1983,6 +1686,12 @@ class DailyReportViewSet(viewsets.ModelViewSet):
             error_msg = result.get('error')
         return Response({'error': error_msg or "AI 润色失败，请稍后重试"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class NotificationCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
 class NotificationViewSet(viewsets.ModelViewSet):
     """
     系统通知 视图
@@ -1992,25 +1701,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # 自动清理当前用户的无效通知（关联对象已删除的）
-        user = self.request.user
-        qs = Notification.objects.filter(recipient=user).order_by('-created_at')
-        
-        # 仅在列表查询时进行轻量级清理（只检查前 50 条，避免性能问题）
-        check_qs = qs[:50]
-        invalid_ids = []
-        for notice in check_qs:
-            if notice.content_type and notice.object_id:
-                model_class = notice.content_type.model_class()
-                if not model_class or not model_class.objects.filter(pk=notice.object_id).exists():
-                    invalid_ids.append(notice.id)
-        
-        if invalid_ids:
-            Notification.objects.filter(id__in=invalid_ids).delete()
-            # 重新获取干净的 queryset
-            qs = Notification.objects.filter(recipient=user).order_by('-created_at')
-            
-        return qs
+        # 无效通知 (关联对象已删除) 由 signals 与 clean_notifications 命令清理，读取时不再逐条校验
+        return Notification.objects.filter(recipient=self.request.user).prefetch_related('content_object').order_by('-created_at')
 
     def create(self, request, *args, **kwargs):
         """
@@ -2022,8 +1714,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
           "targetUsers": [3,4],        # 仅当 target=user_specific
           "type": "normal" | "system",
           "title": "消息标题",
-          "content": "消息正文"
+          "content": "消息正文",
+          "async": true                # 可选，强制后台下发 (默认按接收人数量自动判断)
         }
+        接收人较多时返回 202 与 job_id，可通过 jobs/<job_id>/ 查询进度
         """
         target = request.data.get('target', 'all')
         title = request.data.get('title', '')
@@ -2033,40 +1727,29 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if not title or not content:
             return Response({'error': '标题和正文不能为空'}, status=400)
         
-        # 解析接收人
-        recipients = []
-        from django.contrib.auth.models import User
-        if target == 'all':
-            recipients = list(User.objects.all())
-        elif target == 'dept_specific':
-            dept_ids = request.data.get('targetDepts') or []
-            from .models import DepartmentModel
-            depts = DepartmentModel.objects.filter(id__in=dept_ids)
-            user_ids = list(
-                User.objects.filter(profile__department_link__in=depts).values_list('id', flat=True)
+        # 解析接收人 (仅 ID)
+        try:
+            recipient_ids = notification_fanout.resolve_recipient_ids(
+                target,
+                dept_ids=request.data.get('targetDepts'),
+                user_ids=request.data.get('targetUsers'),
             )
-            recipients = list(User.objects.filter(id__in=user_ids))
-        elif target == 'user_specific':
-            user_ids = request.data.get('targetUsers') or []
-            recipients = list(User.objects.filter(id__in=user_ids))
-        else:
-            return Response({'error': '无效的发送对象'}, status=400)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         
         # 类型映射
         ntype = Notification.Type.NORMAL if msg_type == 'normal' else Notification.Type.SYSTEM
         
-        # 批量创建通知
-        created = 0
-        for u in recipients:
-            Notification.objects.create(
-                recipient=u,
-                title=title,
-                content=content,
-                type=ntype
-            )
-            created += 1
-        
-        return Response({'status': 'success', 'created': created})
+        # 批量创建通知；接收人较多或指定 async 时转入后台任务
+        defer = request.data.get('async')
+        result = notification_fanout.dispatch(
+            recipient_ids, title, content, ntype,
+            defer=str(defer).lower() in ('1', 'true', 'yes') if defer is not None else None,
+            user=request.user,
+        )
+        if 'job_id' in result:
+            return Response({'status': 'accepted', **result}, status=status.HTTP_202_ACCEPTED)
+        return Response({'status': 'success', **result})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -2078,8 +1761,40 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         self.get_queryset().update(is_read=True)
+        notification_summary.invalidate(request.user.id)
         return Response({'status': 'success'})
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        通知摘要：未读数与最新一条的 ID / 时间，供轮询使用 (缓存命中时不查询数据库)
+        """
+        return Response(notification_summary.get_summary(request.user.id))
+
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        轻量通知流：游标分页 (?cursor=...)，仅返回展示字段；?unread=1 时只返回未读
+        """
+        qs = Notification.objects.filter(recipient=request.user)
+        if request.query_params.get('unread') in ('1', 'true'):
+            qs = qs.filter(is_read=False)
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(NotificationFeedSerializer(page, many=True).data)
+
+class BackgroundJobView(APIView):
+    """
+    后台任务状态查询 (仅任务提交人或管理员可见)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = background.get_job(job_id)
+        if not job or (job.get('user_id') != request.user.id and not request.user.is_staff):
+            return Response({'error': '任务不存在或已过期'}, status=404)
+        return Response(job)
+
 class AnnouncementViewSet(viewsets.ModelViewSet):
     """
     公告视图：支持创建、查询与发布